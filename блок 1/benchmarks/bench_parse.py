@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Allocations and time per query of the response parsing (the
+    protocol classes and the decoders), on canned CAN answers.
+
+        python benchmarks/bench_parse.py [-n 5000]
+
+    The buffers are counted with tracemalloc, as the blocks allocated by
+    obd/protocols/ that are still referenced by the parsed messages.
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import obd
+from obd.protocols import ISO_15765_4_11bit_500k
+
+QUERIES = [
+    (obd.commands.RPM, ["7E8 04 41 0C 1A F8", "7E9 04 41 0C 1A F0", "7EA 04 41 0C 00 10"]),
+    (obd.commands.VIN, ["7E8 10 14 49 02 01 31 44 34", "7E8 21 47 50 30 30 52 35 35",
+                        "7E8 22 42 31 32 33 34 35 36"]),
+    (obd.commands.PIDS_A, ["7E8 06 41 00 BE 3F B8 13"]),
+    (obd.commands.GET_DTC, ["7E8 06 43 01 33 02 17 00"]),
+]
+
+
+def in_protocols(stat):
+    return os.path.join("obd", "protocols") in stat.traceback[0].filename
+
+
+def bench(protocol, cmd, lines, n):
+    for _ in range(200):
+        cmd(protocol(lines))  # warm up
+
+    gc.collect()
+    tracemalloc.start()
+    kept = [protocol(lines) for _ in range(n)]
+    stats = [s for s in tracemalloc.take_snapshot().statistics("filename") if in_protocols(s)]
+    tracemalloc.stop()
+    del kept
+
+    start = time.perf_counter()
+    for _ in range(n):
+        cmd(protocol(lines))
+    elapsed = time.perf_counter() - start
+
+    return (sum(s.count for s in stats) / float(n),
+            sum(s.size for s in stats) / float(n),
+            elapsed / n * 1e6)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", type=int, default=5000, help="queries per command (default: 5000)")
+    args = parser.parse_args()
+
+    # the parsers print their progress, keep it out of the results
+    with contextlib.redirect_stdout(io.StringIO()):
+        protocol = ISO_15765_4_11bit_500k(["7E8 06 41 00 BE 3F B8 13"])
+
+    print("%-8s %8s %10s %10s" % ("command", "blocks", "bytes", "us/query"))
+    for cmd, lines in QUERIES:
+        with contextlib.redirect_stdout(io.StringIO()):
+            blocks, size, us = bench(protocol, cmd, lines, args.n)
+        print("%-8s %8.1f %10.0f %10.1f" % (cmd.name, blocks, size, us))
+
+
+if __name__ == "__main__":
+    main()
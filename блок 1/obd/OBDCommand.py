@@ -40,6 +40,11 @@ logger = logging.getLogger(__name__)
 
 
 class OBDCommand:
+    """
+        Commands are immutable: use clone() to derive a new command.
+        The mode, PID and lookup keys are computed once, here.
+    """
+
     def __init__(self,
                  name,
                  desc,
@@ -48,7 +53,8 @@ class OBDCommand:
                  decoder,
                  ecu=ECU.ALL,
                  fast=False,
-                 header=ECU_HEADER.ENGINE):
+                 header=ECU_HEADER.ENGINE,
+                 ttl=None):
         self.name = name  # human readable name (also used as key in commands dict)
         self.desc = desc  # human readable description
         self.command = command  # command string
@@ -57,36 +63,73 @@ class OBDCommand:
         self.ecu = ecu  # ECU ID from which this command expects messages from
         self.fast = fast  # can an extra digit be added to the end of the command? (to make the ELM return early)
         self.header = header  # ECU header used for the queries
+        self.ttl = ttl  # seconds a response may be served from the cache (None = never cached)
 
-    def clone(self):
-        return OBDCommand(self.name,
-                          self.desc,
-                          self.command,
-                          self.bytes,
-                          self.decode,
-                          self.ecu,
-                          self.fast,
-                          self.header)
-
-    @property
-    def mode(self):
-        if len(self.command) >= 2 and isHex(self.command.decode()):
-            return int(self.command[:2], 16)
-        else:
-            return None
-
-    @property
-    def pid(self):
-        if len(self.command) > 2 and isHex(self.command.decode()):
-            return int(self.command[2:], 16)
+        if len(command) >= 2 and isHex(command.decode()):
+            self.mode = int(command[:2], 16)
+            self.pid = int(command[2:], 16) if len(command) > 2 else None
         else:
-            return None
+            self.mode = None
+            self.pid = None
+
+        # integer identity of the command (header and command string), used for
+        # equality, and hashed once for the dicts of Async, OBD, etc...
+        self.key = int.from_bytes(header + b" " + command, "big")
+        self.__hash = hash(self.key)
+        self.__frozen = True
+
+    def __setattr__(self, name, value):
+        if self.__dict__.get("_OBDCommand__frozen", False):
+            raise AttributeError("OBDCommands are immutable, use clone() to change '%s'" % name)
+        self.__dict__[name] = value
+
+    def clone(self, **overrides):
+        """
+            returns a copy of this command, with some of its attributes
+            replaced (ie. cmd.clone(command=b"0201", name="DTC_STATUS"))
+        """
+        args = {
+            "name": self.name,
+            "desc": self.desc,
+            "command": self.command,
+            "_bytes": self.bytes,
+            "decoder": self.decode,
+            "ecu": self.ecu,
+            "fast": self.fast,
+            "header": self.header,
+            "ttl": self.ttl,
+        }
+        args.update(overrides)
+        return OBDCommand(**args)
 
     def __call__(self, messages):
 
         # filter for applicable messages (from the right ECU(s))
         messages = [m for m in messages if (self.ecu & m.ecu) > 0]
 
+        return self.__decode(messages)
+
+    def decode_per_ecu(self, messages):
+        """
+            Decodes the messages of every responding ECU separately.
+
+            Unlike __call__(), this ignores the ECU filter of the command,
+            so that one bus exchange yields an answer for each ECU.
+
+            Returns a dict of {tx_id: OBDResponse}
+        """
+
+        # group the parsed messages by transmitter
+        # (non-OBD lines from the ELM have no tx_id, and are skipped)
+        messages_by_tx_id = {}
+        for m in messages:
+            if m.parsed() and m.tx_id is not None:
+                messages_by_tx_id.setdefault(m.tx_id, []).append(m)
+
+        return {tx_id: self.__decode(ms) for tx_id, ms in messages_by_tx_id.items()}
+
+    def __decode(self, messages):
+
         # guarantee data size for the decoder
         for m in messages:
             self.__constrain_message_data(m)
@@ -102,23 +145,30 @@ class OBDCommand:
         return r
 
     def __constrain_message_data(self, message):
-        """ pads or chops the data field to the size specified by this command """
+        """
+            pads or chops the data field to the size specified by this command
+
+            Chopping only narrows the view over the receive buffer. Padding
+            is the only case that copies, and only happens for short
+            (malformed) responses.
+        """
         len_msg_data = len(message.data)
         if self.bytes > 0:
             if len_msg_data > self.bytes:
                 # chop off the right side
                 message.data = message.data[:self.bytes]
-                logger.debug(
-                    "Message was longer than expected (%s>%s). " +
-                    "Trimmed message: %s", len_msg_data, self.bytes,
-                    repr(message.data))
+                if logger.isEnabledFor(logging.DEBUG):  # don't copy the view for nothing
+                    logger.debug(
+                        "Message was longer than expected (%s>%s). " +
+                        "Trimmed message: %s", len_msg_data, self.bytes,
+                        repr(bytes(message.data)))
             elif len_msg_data < self.bytes:
                 # pad the right with zeros
-                message.data += (b'\x00' * (self.bytes - len_msg_data))
+                message.data = memoryview(bytes(message.data) + (b'\x00' * (self.bytes - len_msg_data)))
                 logger.debug(
                     "Message was shorter than expected (%s<%s). " +
                     "Padded message: %s", len_msg_data, self.bytes,
-                    repr(message.data))
+                    repr(bytes(message.data)))
 
     def __str__(self):
         if self.header != ECU_HEADER.ENGINE:
@@ -133,6 +183,8 @@ class OBDCommand:
             e = "ECU.ENGINE"
         if self.ecu == ECU.TRANSMISSION:
             e = "ECU.TRANSMISSION"
+        if self.ecu == ECU.HYBRID:
+            e = "ECU.HYBRID"
         if self.header == ECU_HEADER.ENGINE:
             return ("OBDCommand(%s, %s, %s, %s, raw_string, ecu=%s, fast=%s)"
                     ) % (repr(self.name), repr(self.desc), repr(self.command),
@@ -144,10 +196,10 @@ class OBDCommand:
 
     def __hash__(self):
         # needed for using commands as keys in a dict (see async.py)
-        return hash(self.header + self.command)
+        return self.__hash
 
     def __eq__(self, other):
         if isinstance(other, OBDCommand):
-            return self.command == other.command and self.header == other.header
+            return self.key == other.key
         else:
             return False
@@ -58,7 +58,8 @@ class OBDResponse:
     def unit(self):
         # for backwards compatibility
         from obd import Unit  # local import to avoid cyclic-dependency
-        if isinstance(self.value, Unit.Quantity):
+        # without a registry, there can't be any Quantity (and no need to build one)
+        if Unit.loaded() and isinstance(self.value, Unit.Quantity):
             return str(self.value.u)
         elif self.value is None:
             return None
@@ -72,6 +73,20 @@ class OBDResponse:
         return str(self.value)
 
 
+class TimeoutResponse(OBDResponse):
+    """
+        Null response of a query that was abandoned at its
+        deadline, or cancelled (see cancel.py)
+    """
+
+    def __init__(self, command=None, cancelled=False):
+        OBDResponse.__init__(self, command)
+        self.cancelled = cancelled
+
+    def __str__(self):
+        return "Cancelled" if self.cancelled else "Timed out"
+
+
 """
     Special value types used in OBDResponses
     instantiated in decoders.py
@@ -79,18 +94,64 @@ class OBDResponse:
 
 
 class Status:
-    def __init__(self):
-        self.MIL = False
-        self.DTC_count = 0
-        self.ignition_type = ""
+    """
+        Readiness status (PID 0x01), decoded from the raw 4 byte word
+        when its attributes are read. Every test of BASE_TESTS,
+        SPARK_TESTS and COMPRESSION_TESTS is available by name; the
+        tests of the other ignition type are null StatusTests.
+    """
+
+    __slots__ = ("_Status__word",)
+
+    __layouts = None  # ignition type : {name: (available bit, not complete bit)}
+
+    def __init__(self, word=None):
+        self.__word = word  # the 4 data bytes, as a big-endian int (None = no data)
+
+    @classmethod
+    def __layout(cls, compression):
+        if cls.__layouts is None:
+            base = {name: (13 + i, 9 + i) for i, name in enumerate(BASE_TESTS[::-1])}
+            layouts = []
+            # reverse to correct for bit vs. indexing order
+            for tests in (SPARK_TESTS, COMPRESSION_TESTS):
+                layout = dict(base)
+                layout.update({name: (16 + i, 24 + i) for i, name in enumerate(tests[::-1]) if name})
+                layouts.append(layout)
+            cls.__layouts = layouts
+        return cls.__layouts[compression]
+
+    def __bit(self, n):
+        # bits are numbered from the MSB, like the BitArray of decoders.py
+        return bool((self.__word >> (31 - n)) & 1)
 
-        # make sure each test is available by name
-        # until real data comes it. This also prevents things from
-        # breaking when the user looks up a standard test that's null.
-        null_test = StatusTest()
-        for name in BASE_TESTS + SPARK_TESTS + COMPRESSION_TESTS:
-            if name:  # filter out None/reserved tests
-                self.__dict__[name] = null_test
+    @property
+    def MIL(self):
+        return self.__word is not None and self.__bit(0)
+
+    @property
+    def DTC_count(self):
+        return 0 if self.__word is None else (self.__word >> 24) & 0x7F
+
+    @property
+    def ignition_type(self):
+        return "" if self.__word is None else IGNITION_TYPE[self.__bit(12)]
+
+    def __getattr__(self, name):
+        # only called for the test names, and for the protocol lookups of
+        # copy/pickle (ie. __setstate__), which may come before __init__
+        if name.startswith("__") or name.startswith("_Status__"):
+            raise AttributeError(name)
+        compression = self.__word is not None and self.__bit(12)
+        bits = self.__layout(compression).get(name)
+        if bits is not None and self.__word is not None:
+            return StatusTest(name, self.__bit(bits[0]), not self.__bit(bits[1]))
+        if bits is not None or name in self.__layout(not compression):
+            # make sure each test is available by name, even without
+            # data. This prevents things from breaking when the user
+            # looks up a standard test that's null.
+            return StatusTest()
+        raise AttributeError(name)
 
 
 class StatusTest():
@@ -106,23 +167,69 @@ class StatusTest():
 
 
 class Monitor:
-    def __init__(self):
-        self._tests = {}  # tid : MonitorTest
+    """
+        Mode 06 test results. The 9 byte blocks of the response are only
+        decoded into MonitorTests when the results are first read.
+    """
+
+    __slots__ = ("_Monitor__data", "_Monitor__tests", "_Monitor__by_name")
+
+    def __init__(self, data=None):
+        # 9 byte blocks (MID, TID, UAS ID, value, min, max), copied out of
+        # the receive buffer, so that it can be freed, and the monitor pickled
+        self.__data = None if data is None else bytes(data)
+        self.__tests = None  # tid : MonitorTest
+        self.__by_name = None  # name : MonitorTest
+
+    def __load(self):
+        if self.__tests is not None:
+            return
+        from .codes import TEST_IDS  # local import, the table is only loaded when needed
+        from .decoders import parse_monitor_test  # local import to avoid cyclic-dependency
+        self.__tests = {}
+        self.__by_name = {}
+        data = self.__data if self.__data is not None else b""
+        tests = {}
+        for n in range(0, len(data) - 8, 9):
+            test = parse_monitor_test(data[n:n + 9], self)
+            if test is not None:
+                tests[test.tid] = test
+        # standard TIDs come first, in the order of the table
+        for tid in sorted(tests, key=lambda tid: (tid not in TEST_IDS, tid in TEST_IDS and tid)):
+            self.__add(tests[tid])
+        self.__data = None
+
+    def __add(self, test):
+        self.__tests[test.tid] = test
+        if test.name is not None:
+            self.__by_name[test.name] = test
+
+    def add_test(self, test):
+        self.__load()
+        self.__add(test)
+
+    @property
+    def _tests(self):
+        self.__load()
+        return self.__tests
+
+    def __getattr__(self, name):
+        # only called for the test names, and for the protocol lookups of
+        # copy/pickle (ie. __setstate__), which may come before __init__
+        if name.startswith("__") or name.startswith("_Monitor__"):
+            raise AttributeError(name)
+        self.__load()
+        test = self.__by_name.get(name)
+        if test is not None:
+            return test
 
         # make the standard TIDs available as null monitor tests
         # until real data comes it. This also prevents things from
         # breaking when the user looks up a standard test that's null.
-        null_test = MonitorTest()
-
-        for tid in TEST_IDS:
-            name = TEST_IDS[tid][0]
-            self.__dict__[name] = null_test
-            self._tests[tid] = null_test
-
-    def add_test(self, test):
-        self._tests[test.tid] = test
-        if test.name is not None:
-            self.__dict__[test.name] = test
+        from .codes import TEST_IDS  # local import, the table is only loaded when needed
+        if name in [n for n, _ in TEST_IDS.values()]:
+            return MonitorTest()
+        raise AttributeError(name)
 
     @property
     def tests(self):
@@ -141,7 +248,10 @@ class Monitor:
         if isinstance(key, int):
             return self._tests.get(key, MonitorTest())
         elif isinstance(key, string_types):
-            return self.__dict__.get(key, MonitorTest())
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                return MonitorTest()
         else:
             logger.warning("Monitor test results can only be retrieved by TID value or property name")
 
@@ -172,3 +282,31 @@ class MonitorTest:
         return "%s : %s [%s]" % (self.desc,
                                  str(self.value),
                                  "PASSED" if self.passed else "FAILED")
+
+
+class DTCReport:
+    """
+        The DTCs of one ECU, as read by OBD.read_all_dtcs().
+        Codes are (code, description) tuples, like the dtc decoder's.
+    """
+
+    def __init__(self):
+        self.stored = []  # mode 03, confirmed codes
+        self.pending = []  # mode 07, current/last driving cycle
+        self.permanent = []  # mode 0A, only erased by the ECU itself
+        self.freeze = None  # DTC that triggered the freeze frame (mode 01 PID 02)
+
+    def __len__(self):
+        """ number of distinct codes """
+        codes = [c for c, _ in self.stored + self.pending + self.permanent]
+        if self.freeze is not None:
+            codes.append(self.freeze[0])
+        return len(set(codes))
+
+    def __str__(self):
+        lines = []
+        for status, codes in (("stored", self.stored), ("pending", self.pending), ("permanent", self.permanent)):
+            lines += ["%s (%s): %s" % (code, status, desc) for code, desc in codes]
+        if self.freeze is not None:
+            lines.append("%s (freeze frame): %s" % self.freeze)
+        return "\n".join(lines) if lines else "No DTCs to report"
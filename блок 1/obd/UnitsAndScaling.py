@@ -30,17 +30,52 @@
 #                                                                      #
 ########################################################################
 
-import pint
+import threading
 
 from .utils import *
 
+
+class LazyRegistry:
+    """
+    Stand-in for the pint UnitRegistry, which is only imported and
+    built (the slowest part of importing python-OBD) on first use.
+    Everything else is forwarded to the real registry.
+    """
+
+    def __init__(self):
+        self.__registry = None
+        self.__lock = threading.Lock()
+
+    def __load(self):
+        with self.__lock:
+            if self.__registry is None:
+                import pint
+                registry = pint.UnitRegistry()
+                registry.define("ratio = []")
+                registry.define("percent = 1e-2 ratio = %")
+                registry.define("gps = gram / second = GPS = grams_per_second")
+                registry.define("lph = liter / hour = LPH = liters_per_hour")
+                registry.define("ppm = count / 1000000 = PPM = parts_per_million")
+                self.__registry = registry
+        return self.__registry
+
+    def loaded(self):
+        """ returns whether the registry was built """
+        return self.__registry is not None
+
+    def __getattr__(self, name):
+        # only called for names that aren't attributes of the stand-in
+        return getattr(self.__registry or self.__load(), name)
+
+    def __getitem__(self, key):
+        return (self.__registry or self.__load())[key]
+
+    def __call__(self, *args, **kwargs):
+        return (self.__registry or self.__load())(*args, **kwargs)
+
+
 # export the unit registry
-Unit = pint.UnitRegistry()
-Unit.define("ratio = []")
-Unit.define("percent = 1e-2 ratio = %")
-Unit.define("gps = gram / second = GPS = grams_per_second")
-Unit.define("lph = liter / hour = LPH = liters_per_hour")
-Unit.define("ppm = count / 1000000 = PPM = parts_per_million")
+Unit = LazyRegistry()
 
 
 class UAS:
@@ -66,109 +101,119 @@ class UAS:
         return Unit.Quantity(value, self.unit)
 
 
-# dict for looking up standardized UAS IDs with conversion objects
-UAS_IDS = {
-    # unsigned -----------------------------------------
-    0x01: UAS(False, 1, Unit.count),
-    0x02: UAS(False, 0.1, Unit.count),
-    0x03: UAS(False, 0.01, Unit.count),
-    0x04: UAS(False, 0.001, Unit.count),
-    0x05: UAS(False, 0.0000305, Unit.count),
-    0x06: UAS(False, 0.000305, Unit.count),
-    0x07: UAS(False, 0.25, Unit.rpm),
-    0x08: UAS(False, 0.01, Unit.kph),
-    0x09: UAS(False, 1, Unit.kph),
-    0x0A: UAS(False, 0.122, Unit.millivolt),
-    0x0B: UAS(False, 0.001, Unit.volt),
-    0x0C: UAS(False, 0.01, Unit.volt),
-    0x0D: UAS(False, 0.00390625, Unit.milliampere),
-    0x0E: UAS(False, 0.001, Unit.ampere),
-    0x0F: UAS(False, 0.01, Unit.ampere),
-    0x10: UAS(False, 1, Unit.millisecond),
-    0x11: UAS(False, 100, Unit.millisecond),
-    0x12: UAS(False, 1, Unit.second),
-    0x13: UAS(False, 1, Unit.milliohm),
-    0x14: UAS(False, 1, Unit.ohm),
-    0x15: UAS(False, 1, Unit.kiloohm),
-    0x16: UAS(False, 0.1, Unit.celsius, offset=-40.0),
-    0x17: UAS(False, 0.01, Unit.kilopascal),
-    0x18: UAS(False, 0.0117, Unit.kilopascal),
-    0x19: UAS(False, 0.079, Unit.kilopascal),
-    0x1A: UAS(False, 1, Unit.kilopascal),
-    0x1B: UAS(False, 10, Unit.kilopascal),
-    0x1C: UAS(False, 0.01, Unit.degree),
-    0x1D: UAS(False, 0.5, Unit.degree),
-    0x1E: UAS(False, 0.0000305, Unit.ratio),
-    0x1F: UAS(False, 0.05, Unit.ratio),
-    0x20: UAS(False, 0.00390625, Unit.ratio),
-    0x21: UAS(False, 1, Unit.millihertz),
-    0x22: UAS(False, 1, Unit.hertz),
-    0x23: UAS(False, 1, Unit.kilohertz),
-    0x24: UAS(False, 1, Unit.count),
-    0x25: UAS(False, 1, Unit.kilometer),
-    0x26: UAS(False, 0.1, Unit.millivolt / Unit.millisecond),
-    0x27: UAS(False, 0.01, Unit.grams_per_second),
-    0x28: UAS(False, 1, Unit.grams_per_second),
-    0x29: UAS(False, 0.25, Unit.pascal / Unit.second),
-    0x2A: UAS(False, 0.001, Unit.kilogram / Unit.hour),
-    0x2B: UAS(False, 1, Unit.count),
-    0x2C: UAS(False, 0.01, Unit.gram),  # per-cylinder
-    0x2D: UAS(False, 0.01, Unit.milligram),  # per-stroke
-    0x2E: lambda _bytes: any([bool(x) for x in _bytes]),
-    0x2F: UAS(False, 0.01, Unit.percent),
-    0x30: UAS(False, 0.001526, Unit.percent),
-    0x31: UAS(False, 0.001, Unit.liter),
-    0x32: UAS(False, 0.0000305, Unit.inch),
-    0x33: UAS(False, 0.00024414, Unit.ratio),
-    0x34: UAS(False, 1, Unit.minute),
-    0x35: UAS(False, 10, Unit.millisecond),
-    0x36: UAS(False, 0.01, Unit.gram),
-    0x37: UAS(False, 0.1, Unit.gram),
-    0x38: UAS(False, 1, Unit.gram),
-    0x39: UAS(False, 0.01, Unit.percent, offset=-327.68),
-    0x3A: UAS(False, 0.001, Unit.gram),
-    0x3B: UAS(False, 0.0001, Unit.gram),
-    0x3C: UAS(False, 0.1, Unit.microsecond),
-    0x3D: UAS(False, 0.01, Unit.milliampere),
-    0x3E: UAS(False, 0.00006103516, Unit.millimeter ** 2),
-    0x3F: UAS(False, 0.01, Unit.liter),
-    0x40: UAS(False, 1, Unit.ppm),
-    0x41: UAS(False, 0.01, Unit.microampere),
-
-    # signed -----------------------------------------
-    0x81: UAS(True, 1, Unit.count),
-    0x82: UAS(True, 0.1, Unit.count),
-    0x83: UAS(True, 0.01, Unit.count),
-    0x84: UAS(True, 0.001, Unit.count),
-    0x85: UAS(True, 0.0000305, Unit.count),
-    0x86: UAS(True, 0.000305, Unit.count),
-    0x87: UAS(True, 1, Unit.ppm),
-    #
-    0x8A: UAS(True, 0.122, Unit.millivolt),
-    0x8B: UAS(True, 0.001, Unit.volt),
-    0x8C: UAS(True, 0.01, Unit.volt),
-    0x8D: UAS(True, 0.00390625, Unit.milliampere),
-    0x8E: UAS(True, 0.001, Unit.ampere),
-    #
-    0x90: UAS(True, 1, Unit.millisecond),
-    #
-    0x96: UAS(True, 0.1, Unit.celsius),
-    #
-    0x99: UAS(True, 0.1, Unit.kilopascal),
-    #
-    0x9C: UAS(True, 0.01, Unit.degree),
-    0x9D: UAS(True, 0.5, Unit.degree),
-    #
-    0xA8: UAS(True, 1, Unit.grams_per_second),
-    0xA9: UAS(True, 0.25, Unit.pascal / Unit.second),
-    #
-    0xAD: UAS(True, 0.01, Unit.milligram),  # per-stroke
-    0xAE: UAS(True, 0.1, Unit.milligram),  # per-stroke
-    0xAF: UAS(True, 0.01, Unit.percent),
-    0xB0: UAS(True, 0.003052, Unit.percent),
-    0xB1: UAS(True, 2, Unit.millivolt / Unit.second),
-    #
-    0xFC: UAS(True, 0.01, Unit.kilopascal),
-    0xFD: UAS(True, 0.001, Unit.kilopascal),
-    0xFE: UAS(True, 0.25, Unit.pascal),
-}
+def _uas_ids():
+    # dict for looking up standardized UAS IDs with conversion objects
+    return {
+        # unsigned -----------------------------------------
+        0x01: UAS(False, 1, Unit.count),
+        0x02: UAS(False, 0.1, Unit.count),
+        0x03: UAS(False, 0.01, Unit.count),
+        0x04: UAS(False, 0.001, Unit.count),
+        0x05: UAS(False, 0.0000305, Unit.count),
+        0x06: UAS(False, 0.000305, Unit.count),
+        0x07: UAS(False, 0.25, Unit.rpm),
+        0x08: UAS(False, 0.01, Unit.kph),
+        0x09: UAS(False, 1, Unit.kph),
+        0x0A: UAS(False, 0.122, Unit.millivolt),
+        0x0B: UAS(False, 0.001, Unit.volt),
+        0x0C: UAS(False, 0.01, Unit.volt),
+        0x0D: UAS(False, 0.00390625, Unit.milliampere),
+        0x0E: UAS(False, 0.001, Unit.ampere),
+        0x0F: UAS(False, 0.01, Unit.ampere),
+        0x10: UAS(False, 1, Unit.millisecond),
+        0x11: UAS(False, 100, Unit.millisecond),
+        0x12: UAS(False, 1, Unit.second),
+        0x13: UAS(False, 1, Unit.milliohm),
+        0x14: UAS(False, 1, Unit.ohm),
+        0x15: UAS(False, 1, Unit.kiloohm),
+        0x16: UAS(False, 0.1, Unit.celsius, offset=-40.0),
+        0x17: UAS(False, 0.01, Unit.kilopascal),
+        0x18: UAS(False, 0.0117, Unit.kilopascal),
+        0x19: UAS(False, 0.079, Unit.kilopascal),
+        0x1A: UAS(False, 1, Unit.kilopascal),
+        0x1B: UAS(False, 10, Unit.kilopascal),
+        0x1C: UAS(False, 0.01, Unit.degree),
+        0x1D: UAS(False, 0.5, Unit.degree),
+        0x1E: UAS(False, 0.0000305, Unit.ratio),
+        0x1F: UAS(False, 0.05, Unit.ratio),
+        0x20: UAS(False, 0.00390625, Unit.ratio),
+        0x21: UAS(False, 1, Unit.millihertz),
+        0x22: UAS(False, 1, Unit.hertz),
+        0x23: UAS(False, 1, Unit.kilohertz),
+        0x24: UAS(False, 1, Unit.count),
+        0x25: UAS(False, 1, Unit.kilometer),
+        0x26: UAS(False, 0.1, Unit.millivolt / Unit.millisecond),
+        0x27: UAS(False, 0.01, Unit.grams_per_second),
+        0x28: UAS(False, 1, Unit.grams_per_second),
+        0x29: UAS(False, 0.25, Unit.pascal / Unit.second),
+        0x2A: UAS(False, 0.001, Unit.kilogram / Unit.hour),
+        0x2B: UAS(False, 1, Unit.count),
+        0x2C: UAS(False, 0.01, Unit.gram),  # per-cylinder
+        0x2D: UAS(False, 0.01, Unit.milligram),  # per-stroke
+        0x2E: lambda _bytes: any([bool(x) for x in _bytes]),
+        0x2F: UAS(False, 0.01, Unit.percent),
+        0x30: UAS(False, 0.001526, Unit.percent),
+        0x31: UAS(False, 0.001, Unit.liter),
+        0x32: UAS(False, 0.0000305, Unit.inch),
+        0x33: UAS(False, 0.00024414, Unit.ratio),
+        0x34: UAS(False, 1, Unit.minute),
+        0x35: UAS(False, 10, Unit.millisecond),
+        0x36: UAS(False, 0.01, Unit.gram),
+        0x37: UAS(False, 0.1, Unit.gram),
+        0x38: UAS(False, 1, Unit.gram),
+        0x39: UAS(False, 0.01, Unit.percent, offset=-327.68),
+        0x3A: UAS(False, 0.001, Unit.gram),
+        0x3B: UAS(False, 0.0001, Unit.gram),
+        0x3C: UAS(False, 0.1, Unit.microsecond),
+        0x3D: UAS(False, 0.01, Unit.milliampere),
+        0x3E: UAS(False, 0.00006103516, Unit.millimeter ** 2),
+        0x3F: UAS(False, 0.01, Unit.liter),
+        0x40: UAS(False, 1, Unit.ppm),
+        0x41: UAS(False, 0.01, Unit.microampere),
+
+        # signed -----------------------------------------
+        0x81: UAS(True, 1, Unit.count),
+        0x82: UAS(True, 0.1, Unit.count),
+        0x83: UAS(True, 0.01, Unit.count),
+        0x84: UAS(True, 0.001, Unit.count),
+        0x85: UAS(True, 0.0000305, Unit.count),
+        0x86: UAS(True, 0.000305, Unit.count),
+        0x87: UAS(True, 1, Unit.ppm),
+        #
+        0x8A: UAS(True, 0.122, Unit.millivolt),
+        0x8B: UAS(True, 0.001, Unit.volt),
+        0x8C: UAS(True, 0.01, Unit.volt),
+        0x8D: UAS(True, 0.00390625, Unit.milliampere),
+        0x8E: UAS(True, 0.001, Unit.ampere),
+        #
+        0x90: UAS(True, 1, Unit.millisecond),
+        #
+        0x96: UAS(True, 0.1, Unit.celsius),
+        #
+        0x99: UAS(True, 0.1, Unit.kilopascal),
+        #
+        0x9C: UAS(True, 0.01, Unit.degree),
+        0x9D: UAS(True, 0.5, Unit.degree),
+        #
+        0xA8: UAS(True, 1, Unit.grams_per_second),
+        0xA9: UAS(True, 0.25, Unit.pascal / Unit.second),
+        #
+        0xAD: UAS(True, 0.01, Unit.milligram),  # per-stroke
+        0xAE: UAS(True, 0.1, Unit.milligram),  # per-stroke
+        0xAF: UAS(True, 0.01, Unit.percent),
+        0xB0: UAS(True, 0.003052, Unit.percent),
+        0xB1: UAS(True, 2, Unit.millivolt / Unit.second),
+        #
+        0xFC: UAS(True, 0.01, Unit.kilopascal),
+        0xFD: UAS(True, 0.001, Unit.kilopascal),
+        0xFE: UAS(True, 0.25, Unit.pascal),
+    }
+
+
+def __getattr__(name):
+    # UAS_IDS is only built on first use, since it needs the unit registry
+    if name == "UAS_IDS":
+        global UAS_IDS
+        UAS_IDS = _uas_ids()
+        return UAS_IDS
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
@@ -42,9 +42,14 @@ from .obd import OBD
 from .asynchronous import Async
 from .commands import commands
 from .OBDCommand import OBDCommand
-from .OBDResponse import OBDResponse
+from .OBDResponse import OBDResponse, TimeoutResponse
+from .uds import dids, DIDCommand
+from .j1939 import pgns, PGNCommand, PGNMonitor
+from .multiplexer import Multiplexer
+from .cancel import CancelToken
+from .supervisor import Supervisor, LinkState
 from .protocols import ECU
-from .utils import scan_serial, OBDStatus
+from .utils import scan_serial, probe_serial, OBDStatus
 from .UnitsAndScaling import Unit
 
 import logging
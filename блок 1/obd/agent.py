@@ -0,0 +1,850 @@
+# -*- coding: utf-8 -*-
+
+########################################################################
+#                                                                      #
+# python-OBD: A python OBD-II serial module derived from pyobd         #
+#                                                                      #
+# Copyright 2004 Donour Sizemore (donour@uchicago.edu)                 #
+# Copyright 2009 Secons Ltd. (www.obdtester.com)                       #
+# Copyright 2009 Peter J. Creath                                       #
+# Copyright 2016 Brendan Whitfield (brendan-w.com)                     #
+#                                                                      #
+########################################################################
+#                                                                      #
+# agent.py                                                             #
+#                                                                      #
+# This file is part of python-OBD (a derivative of pyOBD)              #
+#                                                                      #
+# python-OBD is free software: you can redistribute it and/or modify   #
+# it under the terms of the GNU General Public License as published by #
+# the Free Software Foundation, either version 2 of the License, or    #
+# (at your option) any later version.                                  #
+#                                                                      #
+# python-OBD is distributed in the hope that it will be useful,        #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of       #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the        #
+# GNU General Public License for more details.                         #
+#                                                                      #
+# You should have received a copy of the GNU General Public License    #
+# along with python-OBD.  If not, see <http://www.gnu.org/licenses/>.  #
+#                                                                      #
+########################################################################
+
+
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+
+from . import monitors, uds
+from .OBDCommand import OBDCommand
+from .OBDResponse import OBDResponse, TimeoutResponse, DTCReport
+from .cancel import expired, remaining
+from .multiplexer import Multiplexer
+from .protocols import ECU
+from .protocols.protocol import Frame, Message
+from .utils import OBDStatus
+
+logger = logging.getLogger(__name__)
+
+"""
+    Local agent, sharing one adapter between processes
+
+    The Agent owns the OBD connection, and serves clients over a Unix
+    domain socket. Clients send commands as (header, command string)
+    pairs and receive the raw parsed messages, which are decoded in the
+    client process by its own OBDCommand objects. Values never need to
+    be serialized, and custom commands work without the agent knowing
+    about them.
+
+    Every packet is a 9 byte header followed by its payload:
+
+        [ length (4) ] [ op (1) ] [ request/subscription id (4) ] [ payload ]
+
+    Clients connect with a "obd+unix://" URL in place of the port:
+
+        connection = obd.OBD("obd+unix:///tmp/python-obd.sock")
+        connection = obd.Async("obd+unix:///tmp/python-obd.sock")
+
+    and the agent is started with:
+
+        python -m obd.agent --port /dev/ttyUSB0 --socket /tmp/python-obd.sock
+"""
+
+URL_SCHEME = "obd+unix://"
+DEFAULT_SOCKET = "/tmp/python-obd.sock"
+
+HEADER = struct.Struct(">IBI")
+
+# [ ecu ] [ can ] [ frame count ] [ tx id ] [ pgn ] [ data length ], before
+# the data and the raw lines of each message
+MESSAGE = struct.Struct(">BBHHIH")
+
+# client -> agent
+OP_QUERY = 0x01  # payload: command
+OP_WATCH = 0x02  # payload: command, id: subscription
+OP_UNWATCH = 0x03  # id: subscription
+OP_STATUS = 0x04
+
+# agent -> client
+OP_RESPONSE = 0x81  # payload: messages
+OP_UPDATE = 0x82  # payload: messages, id: subscription
+OP_STATUS_REPLY = 0x84  # payload: status
+
+NO_TX_ID = 0xFFFF
+NO_PGN = 0xFFFFFFFF
+
+# flags of a command
+FLAG_FORCE = 0x01  # skip the support checks
+FLAG_FAST = 0x02  # the command's fast flag (see OBDCommand)
+
+
+# ------------------------------- encoding -------------------------------
+
+def pack(op, id_, payload=b""):
+    return HEADER.pack(len(payload), op, id_) + payload
+
+
+def recv_exactly(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise EOFError("connection closed")
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def recv_packet(sock):
+    """ returns (op, id, payload) """
+    length, op, id_ = HEADER.unpack(recv_exactly(sock, HEADER.size))
+    return op, id_, recv_exactly(sock, length)
+
+
+def encode_command(cmd, force=False):
+    # [flags] [header length] [header] [command]
+    flags = (FLAG_FORCE if force else 0) | (FLAG_FAST if cmd.fast else 0)
+    return struct.pack(">BB", flags, len(cmd.header)) + cmd.header + cmd.command
+
+
+def decode_command(payload):
+    """ returns (header, command string, force, fast) """
+    flags, n = struct.unpack(">BB", payload[:2])
+    return payload[2:2 + n], payload[2 + n:], bool(flags & FLAG_FORCE), bool(flags & FLAG_FAST)
+
+
+def encode_messages(messages):
+    out = bytearray(struct.pack(">B", len(messages)))
+    for m in messages:
+        raw = m.raw().encode("utf-8")
+        out += MESSAGE.pack(m.ecu, m.can, m.num_frames,
+                            NO_TX_ID if m.tx_id is None else m.tx_id,
+                            NO_PGN if m.pgn is None else m.pgn,
+                            len(m.data))
+        out += m.data
+        out += struct.pack(">H", len(raw)) + raw
+    return bytes(out)
+
+
+def decode_messages(payload):
+    messages = []
+    n = payload[0]
+    i = 1
+    for _ in range(n):
+        ecu, can, num_frames, tx_id, pgn, length = MESSAGE.unpack(payload[i:i + MESSAGE.size])
+        i += MESSAGE.size
+        data = bytearray(payload[i:i + length])
+        i += length
+        (raw_length,) = struct.unpack(">H", payload[i:i + 2])
+        i += 2
+        raw = payload[i:i + raw_length].decode("utf-8")
+        i += raw_length
+
+        frames = [Frame(line) for line in raw.split("\n")]
+        for f in frames:
+            f.tx_id = None if tx_id == NO_TX_ID else tx_id
+        m = Message(frames)
+        m.ecu = ecu
+        m.can = bool(can)
+        m.num_frames = num_frames
+        m.data = data
+        m.pgn = None if pgn == NO_PGN else pgn
+        messages.append(m)
+    return messages
+
+
+def encode_str(s):
+    s = s.encode("utf-8")
+    return struct.pack(">B", len(s)) + s
+
+
+def decode_str(payload, i):
+    n = payload[i]
+    return payload[i + 1:i + 1 + n].decode("utf-8"), i + 1 + n
+
+
+# --------------------------------- agent --------------------------------
+
+class AgentCommand(OBDCommand):
+    """
+        Stand-in for a client's command. Equal (and hashing) to the
+        original, so support checks and coalescing work, but decoding
+        is left to the client.
+    """
+
+    def __init__(self, header, command, fast):
+        OBDCommand.__init__(self, "AGENT_" + command.decode(), "", command, 0,
+                            lambda messages: None, ECU.ALL, fast, header)
+
+
+def proxy_command(header, command, fast):
+    """
+        Returns the command to run for a client's request: the command
+        table's own when it's known, so that its TTL and the VIN hook of
+        OBD.query() apply, or an AgentCommand. Either way, the messages
+        of every ECU are kept, since they are all sent to the client.
+    """
+    from .commands import commands
+
+    cmd = AgentCommand(header, command, fast)
+    if cmd.mode is not None:
+        known = commands.lookup(cmd.mode, cmd.pid, header)
+    else:
+        known = next((c for c in commands.base_commands() if c == cmd), None)
+
+    if known is None or known != cmd:
+        return cmd
+    return known.clone(ecu=ECU.ALL, fast=fast)
+
+
+class Session:
+    """
+        One connected client.
+
+        Replies are sent in order, but subscription updates are
+        conflated: a client that doesn't keep up only receives the
+        latest update of each subscription, so a slow reader can't
+        make the agent's memory grow, nor slow down other clients.
+    """
+
+    def __init__(self, agent, sock):
+        self.agent = agent
+        self.sock = sock
+        self.subscriptions = {}  # key = subscription id, value = command (see proxy_command())
+        self.dropped = 0  # number of updates superseded before being sent
+        self.__cond = threading.Condition()
+        self.__replies = []
+        self.__updates = {}  # key = subscription id, value = latest packet
+        self.__open = True
+        self.__writer = threading.Thread(target=self.__write_loop)
+        self.__writer.daemon = True
+        self.__writer.start()
+
+    def send(self, packet):
+        with self.__cond:
+            self.__replies.append(packet)
+            self.__cond.notify()
+
+    def update(self, sub_id, payload):
+        with self.__cond:
+            if sub_id in self.__updates:
+                self.dropped += 1
+            self.__updates[sub_id] = pack(OP_UPDATE, sub_id, payload)
+            self.__cond.notify()
+
+    def close(self):
+        with self.__cond:
+            self.__open = False
+            self.__cond.notify()
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+    def __write_loop(self):
+        while True:
+            with self.__cond:
+                while self.__open and not self.__replies and not self.__updates:
+                    self.__cond.wait()
+                if not self.__open:
+                    return
+                packets = self.__replies + list(self.__updates.values())
+                self.__replies = []
+                self.__updates = {}
+            try:
+                self.sock.sendall(b"".join(packets))
+            except OSError:
+                self.agent.drop(self)
+                return
+
+    def serve(self):
+        mux = self.agent.multiplexer
+        client = id(self)
+        try:
+            while True:
+                op, id_, payload = recv_packet(self.sock)
+
+                if op == OP_QUERY:
+                    header, command, force, fast = decode_command(payload)
+                    r = mux.query(self.agent.command(header, command, fast), force, client)
+                    self.send(pack(OP_RESPONSE, id_, encode_messages(r.messages)))
+
+                elif op == OP_WATCH:
+                    header, command, force, fast = decode_command(payload)
+                    cmd = self.agent.command(header, command, fast)
+                    if force or mux.call(mux.connection.test_cmd, cmd, client=client):
+                        self.subscriptions[id_] = cmd
+                        self.agent.watch(self, id_, cmd)
+
+                elif op == OP_UNWATCH:
+                    self.subscriptions.pop(id_, None)
+                    self.agent.unwatch(self, id_)
+
+                elif op == OP_STATUS:
+                    self.send(pack(OP_STATUS_REPLY, id_, self.agent.status_payload()))
+
+                else:
+                    logger.warning("Unknown agent op 0x%02X" % op)
+        except (EOFError, OSError, struct.error):
+            pass
+        finally:
+            self.agent.drop(self)
+
+
+class Agent:
+    """
+        Serves one OBD connection to many processes, over a Unix socket.
+
+        Queries go through a Multiplexer (coalescing identical ones).
+        Watched commands are polled once for all subscribers, and fanned
+        out to every client watching them.
+    """
+
+    # longest pause between polling rounds while the car isn't connected
+    MAX_BACKOFF = 5.0
+
+    def __init__(self, connection, path=DEFAULT_SOCKET, fair=True, delay_cmds=0.25):
+        self.connection = connection
+        self.path = path
+        self.delay_cmds = delay_cmds  # pause between polling rounds
+        self.multiplexer = Multiplexer(connection, fair)
+        self.__commands = {}  # key = (header, command, fast), value = command (see proxy_command())
+        self.__sessions = set()
+        self.__watchers = {}  # key = command, value = set of (Session, subscription id)
+        self.__lock = threading.Condition()
+        self.__server = None
+        self.__running = False
+        self.__threads = []
+
+    def command(self, header, command, fast):
+        key = (header, command, fast)
+        if key not in self.__commands:
+            self.__commands[key] = proxy_command(header, command, fast)
+        return self.__commands[key]
+
+    def status_payload(self):
+        c = self.connection
+        supported = [encode_str(cmd.header.decode()) + encode_str(cmd.command.decode())
+                     for cmd in c.supported_commands]
+        return (encode_str(c.status()) +
+                encode_str(c.protocol_id()) +
+                encode_str(c.protocol_name()) +
+                struct.pack(">H", len(supported)) + b"".join(supported))
+
+    def watch(self, session, sub_id, cmd):
+        with self.__lock:
+            self.__watchers.setdefault(cmd, set()).add((session, sub_id))
+            self.__lock.notify()
+
+    def unwatch(self, session, sub_id):
+        with self.__lock:
+            for cmd, watchers in list(self.__watchers.items()):
+                watchers.discard((session, sub_id))
+                if not watchers:
+                    del self.__watchers[cmd]
+
+    def drop(self, session):
+        with self.__lock:
+            if session not in self.__sessions:
+                return
+            self.__sessions.discard(session)
+        for sub_id in list(session.subscriptions):
+            self.unwatch(session, sub_id)
+        session.close()
+
+    def start(self):
+        """ starts serving in background threads """
+        if self.__running:
+            return
+
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # stale socket of a previous agent
+
+        self.__server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.__server.bind(self.path)
+        os.chmod(self.path, 0o660)  # same user/group only
+        self.__server.listen(8)
+        self.__server.settimeout(0.5)  # closing doesn't wake up accept(), so poll __running
+        self.__running = True
+        self.multiplexer.start()
+
+        for target in [self.__accept_loop, self.__poll_loop]:
+            t = threading.Thread(target=target)
+            t.daemon = True
+            t.start()
+            self.__threads.append(t)
+
+        logger.info("Agent listening on %s" % self.path)
+
+    def serve_forever(self):
+        self.start()
+        try:
+            while self.__running:
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        if not self.__running:
+            return
+        self.__running = False
+        with self.__lock:
+            self.__lock.notify_all()
+        try:
+            self.__server.close()
+        except OSError:
+            pass
+        for session in list(self.__sessions):
+            self.drop(session)
+        for t in self.__threads:
+            t.join()
+        self.__threads = []
+        self.multiplexer.stop()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def __accept_loop(self):
+        while self.__running:
+            try:
+                sock, _ = self.__server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return  # server socket closed
+            sock.settimeout(None)
+            session = Session(self, sock)
+            with self.__lock:
+                self.__sessions.add(session)
+            t = threading.Thread(target=session.serve)
+            t.daemon = True
+            t.start()
+
+    def __poll_loop(self):
+        """ polls every watched command once per round, for all its watchers """
+        backoff = 0.0
+        while self.__running:
+            with self.__lock:
+                while self.__running and not self.__watchers:
+                    self.__lock.wait()
+                cmds = list(self.__watchers)
+
+            if self.connection.status() != OBDStatus.CAR_CONNECTED:
+                # every query would fail at once, wait longer and longer
+                # for the connection to come back (see supervisor.py)
+                backoff = min(self.MAX_BACKOFF, max(2 * backoff, self.delay_cmds, 0.25))
+                logger.debug("Car not connected, polling again in %.2fs" % backoff)
+                with self.__lock:
+                    if self.__running:
+                        self.__lock.wait(backoff)
+                continue
+            backoff = 0.0
+
+            for cmd in cmds:
+                # force, since commands are checked for support when watched
+                r = self.multiplexer.query(cmd, True, "agent")
+                payload = encode_messages(r.messages)
+                with self.__lock:
+                    watchers = list(self.__watchers.get(cmd, ()))
+                for session, sub_id in watchers:
+                    session.update(sub_id, payload)
+
+            if self.delay_cmds:
+                time.sleep(self.delay_cmds)
+
+
+# -------------------------------- clients -------------------------------
+
+class AgentOBD(object):
+    """
+        Client for an Agent, with the blocking API of OBD.
+
+        Returned by OBD("obd+unix://<socket path>").
+
+        query_all_ecus(), read_all_dtcs(), read_dids() and read_monitors()
+        are built on the agent's queries, with the batching done here.
+        The rest of the OBD API (query_many(), the TTL cache, timeouts,
+        CAN filters) belongs to the agent's own connection.
+    """
+
+    def __init__(self, url):
+        self.path = url[len(URL_SCHEME):] if url.startswith(URL_SCHEME) else url
+        self.supported_commands = set()
+        self.fast = True
+        self.__sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.__send_lock = threading.Lock()
+        self.__pending = {}  # key = request id, value = [Event, payload]
+        self.__next_id = 1
+        self.__status = ("", "", "")
+        self.__did_limits = {}  # max number of DIDs per request, by header (see uds.batches)
+        self.__mid_limits = {}  # max number of MIDs per request, by header (see monitors.batches)
+        self._subscriptions = {}  # key = subscription id, value = OBDCommand
+
+        try:
+            self.__sock.connect(self.path)
+        except OSError as e:
+            logger.error("Failed to connect to agent %s: %s" % (self.path, e))
+            self.__sock = None
+            return
+
+        self.__reader = threading.Thread(target=self.__read_loop)
+        self.__reader.daemon = True
+        self.__reader.start()
+        self.__refresh_status()
+
+    def __request(self, op, payload=b"", id_=None, wait=True, deadline=None, cancel=None):
+        if self.__sock is None:
+            return None
+        with self.__send_lock:
+            sock = self.__sock
+            if sock is None:
+                return None
+            if id_ is None:
+                id_ = self.__next_id
+                self.__next_id = (self.__next_id + 1) & 0xFFFFFFFF
+            slot = [threading.Event(), None]
+            if wait:
+                self.__pending[id_] = slot
+            try:
+                sock.sendall(pack(op, id_, payload))
+            except OSError:
+                self.__pending.pop(id_, None)
+                return None
+        if not wait:
+            return None
+        if deadline is None and cancel is None:
+            slot[0].wait()
+            return slot[1]
+        # give up at the deadline, a late reply is dropped by the read loop
+        while not slot[0].wait(0.05 if deadline is None else min(0.05, remaining(deadline))):
+            if expired(deadline, cancel):
+                self.__pending.pop(id_, None)
+                return None
+        return slot[1]
+
+    def __read_loop(self):
+        sock = self.__sock
+        try:
+            while True:
+                op, id_, payload = recv_packet(sock)
+                if op == OP_UPDATE:
+                    self._on_update(id_, payload)
+                else:
+                    slot = self.__pending.pop(id_, None)
+                    if slot is not None:
+                        slot[1] = payload
+                        slot[0].set()
+        except (EOFError, OSError, struct.error):
+            logger.info("Agent connection closed")
+        finally:
+            self.__sock = None
+            for slot in list(self.__pending.values()):
+                slot[0].set()
+            self.__pending = {}
+
+    def _on_update(self, sub_id, payload):
+        pass  # subscriptions are an AgentAsync feature
+
+    def _send(self, op, payload=b"", id_=None, wait=True):
+        return self.__request(op, payload, id_, wait)
+
+    def __refresh_status(self):
+        payload = self.__request(OP_STATUS)
+        if payload is None:
+            return
+
+        status, i = decode_str(payload, 0)
+        protocol_id, i = decode_str(payload, i)
+        protocol_name, i = decode_str(payload, i)
+        self.__status = (status, protocol_id, protocol_name)
+
+        # match the agent's supported commands with our own command objects
+        from .commands import commands
+        known = {(c.header, c.command): c for c in commands.base_commands()}
+        for mode in commands.modes:
+            for c in mode:
+                if c is not None:
+                    known[(c.header, c.command)] = c
+
+        (n,) = struct.unpack(">H", payload[i:i + 2])
+        i += 2
+        for _ in range(n):
+            header, i = decode_str(payload, i)
+            command, i = decode_str(payload, i)
+            c = known.get((header.encode(), command.encode()))
+            if c is not None:
+                self.supported_commands.add(c)
+
+    def __messages(self, cmd, force=False, deadline=None, cancel=None):
+        """ the messages received by the agent for a command, None if abandoned """
+        # the deadline only applies here, the agent answers every query
+        payload = self.__request(OP_QUERY, encode_command(cmd, force),
+                                 deadline=deadline, cancel=cancel)
+        return None if payload is None else decode_messages(payload)
+
+    def query(self, cmd, force=False, deadline=None, cancel=None):
+        messages = self.__messages(cmd, force, deadline, cancel)
+        if messages is None and expired(deadline, cancel):
+            return TimeoutResponse(cmd, cancel is not None and cancel.cancelled)
+        if not messages:
+            return OBDResponse()
+        return cmd(messages)
+
+    def query_all_ecus(self, cmd, force=False):
+        """ see OBD.query_all_ecus() """
+        messages = self.__messages(cmd, force)
+        if not messages:
+            return {}
+        return cmd.decode_per_ecu(messages)
+
+    def read_all_dtcs(self):
+        """ see OBD.read_all_dtcs() """
+        from .commands import commands
+        fields = [
+            (commands.GET_DTC, "stored"),
+            (commands.GET_CURRENT_DTC, "pending"),
+            (commands.GET_PERMANENT_DTC, "permanent"),
+            (commands.FREEZE_DTC, "freeze"),
+        ]
+
+        reports = {}
+        for cmd, field in fields:
+            if not self.supports(cmd):
+                continue
+            for tx_id, r in self.query_all_ecus(cmd).items():
+                if r.value is None:
+                    continue
+                # P0000 is a freeze frame without a DTC
+                if field == "freeze" and r.value[0] == "P0000":
+                    continue
+                setattr(reports.setdefault(tx_id, DTCReport()), field, r.value)
+        return reports
+
+    def read_dids(self, dids):
+        """ see OBD.read_dids() """
+        responses = {}
+        for batch in uds.batches(dids, self.__did_limits):
+            if len(batch) > 1:
+                cmd = uds.BatchDIDCommand(batch)
+                r = self.query(cmd, force=True)
+                if r.value is not None and len(r.value) == len(batch):
+                    for d in batch:
+                        response = OBDResponse(d, r.messages)
+                        response.value = r.value[d]
+                        responses[d] = response
+                    continue
+                if cmd.negative_response_code(r) in uds.NRC_BATCH_REJECTED:
+                    self.__did_limits[batch[0].header] = 1
+
+            for d in batch:
+                responses[d] = self.query(d, force=True)
+        return responses
+
+    def read_monitors(self, mids=None):
+        """ see OBD.read_monitors(), the agent's connection caches the results """
+        from .commands import commands
+        supported = [c for c in commands.monitors() if c in self.supported_commands]
+        if mids is None:
+            mids = supported
+        else:
+            mids = [m for m in mids if m in supported]
+
+        responses = {}
+        for batch in monitors.batches(mids, self.__mid_limits):
+            if len(batch) > 1:
+                cmd = monitors.BatchMonitorCommand(batch)
+                batch_responses = cmd.responses(self.query(cmd, force=True))
+                if batch_responses is not None:
+                    responses.update(batch_responses)
+                    continue
+                self.__mid_limits[batch[0].header] = 1
+
+            for m in batch:
+                responses[m] = self.query(m, force=True)
+        return responses
+
+    def status(self):
+        if self.__sock is None:
+            return OBDStatus.NOT_CONNECTED
+        self.__refresh_status()
+        return self.__status[0] or OBDStatus.NOT_CONNECTED
+
+    def is_connected(self):
+        return self.status() == OBDStatus.CAR_CONNECTED
+
+    def protocol_id(self):
+        return self.__status[1]
+
+    def protocol_name(self):
+        return self.__status[2]
+
+    def port_name(self):
+        return URL_SCHEME + self.path
+
+    def supports(self, cmd):
+        return cmd in self.supported_commands
+
+    def print_commands(self):
+        for c in self.supported_commands:
+            print(str(c))
+
+    def close(self):
+        sock, self.__sock = self.__sock, None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+                sock.close()
+            except OSError:
+                pass
+
+
+class AgentAsync(AgentOBD):
+    """
+        Client for an Agent, with the watch() API of Async.
+        The agent polls the watched commands, and pushes updates.
+
+        Returned by Async("obd+unix://<socket path>").
+    """
+
+    def __init__(self, url):
+        self.__commands = {}  # key = OBDCommand, value = Response
+        self.__callbacks = {}  # key = OBDCommand, value = list of Functions
+        self.__sub_ids = {}  # key = OBDCommand, value = subscription id
+        self.__running = False
+        self.__was_running = False
+        AgentOBD.__init__(self, url)
+
+    @property
+    def running(self):
+        return self.__running
+
+    def start(self):
+        if self.__running:
+            return
+        self.__running = True
+        for i, c in enumerate(self.__commands):
+            sub_id = i + 1
+            self.__sub_ids[c] = sub_id
+            self._subscriptions[sub_id] = c
+            self._send(OP_WATCH, encode_command(c, True), sub_id, wait=False)
+
+    def stop(self):
+        if not self.__running:
+            return
+        self.__running = False
+        for sub_id in self.__sub_ids.values():
+            self._send(OP_UNWATCH, b"", sub_id, wait=False)
+        self.__sub_ids = {}
+        self._subscriptions = {}
+
+    def paused(self):
+        return self
+
+    def __enter__(self):
+        self.__was_running = self.__running
+        self.stop()
+        return self.__was_running
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self.__running and self.__was_running:
+            self.start()
+        return False  # don't suppress any exceptions
+
+    def watch(self, c, callback=None, force=False):
+        if self.__running:
+            logger.warning("Can't watch() while running, please use stop()")
+            return
+        if not force and not self.supports(c):
+            logger.warning("'%s' is not supported" % str(c))
+            return
+        if c not in self.__commands:
+            self.__commands[c] = OBDResponse()
+            self.__callbacks[c] = []
+        if hasattr(callback, "__call__") and (callback not in self.__callbacks[c]):
+            self.__callbacks[c].append(callback)
+
+    def unwatch(self, c, callback=None):
+        if self.__running:
+            logger.warning("Can't unwatch() while running, please use stop()")
+            return
+        if c in self.__commands:
+            if hasattr(callback, "__call__") and (callback in self.__callbacks[c]):
+                self.__callbacks[c].remove(callback)
+                if len(self.__callbacks[c]) == 0:
+                    self.__commands.pop(c, None)
+            else:
+                self.__callbacks.pop(c, None)
+                self.__commands.pop(c, None)
+
+    def unwatch_all(self):
+        if self.__running:
+            logger.warning("Can't unwatch_all() while running, please use stop()")
+            return
+        self.__commands = {}
+        self.__callbacks = {}
+
+    def query(self, c, force=False, deadline=None, cancel=None):
+        """ Non-blocking, returns the latest value of a watched command """
+        return self.__commands.get(c, OBDResponse())
+
+    def _on_update(self, sub_id, payload):
+        c = self._subscriptions.get(sub_id)
+        if c is None:
+            return
+        messages = decode_messages(payload)
+        r = c(messages) if messages else OBDResponse()
+        self.__commands[c] = r
+
+        # fire the callbacks, if there are any
+        for callback in self.__callbacks.get(c, []):
+            callback(r)
+
+    def close(self):
+        self.stop()
+        AgentOBD.close(self)
+
+
+def main():
+    import argparse
+    from .obd import OBD
+
+    parser = argparse.ArgumentParser(description="Shares an OBD adapter over a Unix socket")
+    parser.add_argument("--port", default=None, help="serial port of the adapter (default: scan)")
+    parser.add_argument("--baudrate", type=int, default=None)
+    parser.add_argument("--protocol", default=None)
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="path of the Unix socket")
+    parser.add_argument("--fifo", action="store_true", help="serve requests in arrival order, instead of per client")
+    parser.add_argument("--delay", type=float, default=0.25,
+                        help="seconds between rounds of polling the watched commands (default: 0.25)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    connection = OBD(args.port, args.baudrate, args.protocol)
+    Agent(connection, args.socket, fair=not args.fifo, delay_cmds=args.delay).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -33,8 +33,11 @@
 import time
 import threading
 import logging
+from . import agent
 from .OBDResponse import OBDResponse
+from .cancel import CancelToken
 from .obd import OBD
+from .protocols import ECU_HEADER
 
 logger = logging.getLogger(__name__)
 
@@ -43,19 +46,34 @@ class Async(OBD):
     """
         Class representing an OBD-II connection with it's assorted commands/sensors
         Specialized for asynchronous value reporting.
+
+        With a query_timeout (in seconds), each watched command is
+        abandoned once it runs that long, and reported with a
+        TimeoutResponse. stop() abandons the command in progress.
     """
 
+    def __new__(cls, portstr=None, *args, **kwargs):
+        # "obd+unix://" ports connect to a local agent sharing its adapter
+        if isinstance(portstr, str) and portstr.startswith(agent.URL_SCHEME):
+            return agent.AgentAsync(portstr)
+        return super(OBD, cls).__new__(cls)
+
     def __init__(self, portstr=None, baudrate=None, protocol=None, fast=True,
                  timeout=0.1, check_voltage=True, start_low_power=False,
-                 delay_cmds=0.25):
+                 delay_cmds=0.25, adaptive_timeout=False, can_filter=False,
+                 query_timeout=None, baud_history=None):
         self.__thread = None
         super(Async, self).__init__(portstr, baudrate, protocol, fast,
-                                    timeout, check_voltage, start_low_power)
+                                    timeout, check_voltage, start_low_power,
+                                    adaptive_timeout, can_filter, baud_history)
         self.__commands = {}   # key = OBDCommand, value = Response
         self.__callbacks = {}  # key = OBDCommand, value = list of Functions
+        self.__keep_alives = {}  # key = ECU header, value = [interval, time of last TesterPresent]
         self.__running = False
         self.__was_running = False  # used with __enter__() and __exit__()
         self.__delay_cmds = delay_cmds
+        self.__query_timeout = query_timeout
+        self.__cancel = CancelToken()  # fired by stop(), abandoning the command in progress
 
     @property
     def running(self):
@@ -67,13 +85,21 @@ class Async(OBD):
             logger.info("Async thread not started because no connection was made")
             return
 
-        if len(self.__commands) == 0:
+        if len(self.__commands) == 0 and len(self.__keep_alives) == 0:
             logger.info("Async thread not started because no commands were registered")
             return
 
         if self.__thread is None:
+            # address every ECU of the watch set at once, so that the
+            # CAN filter isn't reprogrammed between the commands
+            ecus = 0
+            for c in self.__commands:
+                ecus |= c.ecu
+            self.use_ecus(ecus)
+
             logger.info("Starting async thread")
             self.__running = True
+            self.__cancel = CancelToken()
             self.__thread = threading.Thread(target=self.run)
             self.__thread.daemon = True
             self.__thread.start()
@@ -83,6 +109,7 @@ class Async(OBD):
         if self.__thread is not None:
             logger.info("Stopping async thread...")
             self.__running = False
+            self.__cancel.cancel()
             self.__thread.join()
             self.__thread = None
             logger.info("Async thread stopped")
@@ -121,6 +148,17 @@ class Async(OBD):
         self.stop()
         super(Async, self).close()
 
+    def invalidate(self, cmd=None):
+        """
+            Drops cached responses (see OBD.invalidate()), including
+            the last responses of the watched commands, which read as
+            null until the next loop.
+        """
+        super(Async, self).invalidate(cmd)
+        for c in list(self.__commands):
+            if c == cmd or (cmd is None and c.mode != 9 and not c.command.startswith(b"AT")):
+                self.__commands[c] = OBDResponse()
+
     def watch(self, c, callback=None, force=False):
         """
             Subscribes the given command for continuous updating. Once subscribed,
@@ -185,10 +223,49 @@ class Async(OBD):
             self.__commands = {}
             self.__callbacks = {}
 
-    def query(self, c, force=False):
+    def keep_alive(self, header=ECU_HEADER.ENGINE, interval=2.0):
+        """
+            Keeps the UDS diagnostic session of the given ECU open, by
+            sending a TesterPresent every `interval` seconds. These are
+            interleaved with the watched commands, so that a long list
+            of commands can't starve the session.
+        """
+
+        # the dict shouldn't be changed while the daemon thread is iterating
+        if self.__running:
+            logger.warning("Can't keep_alive() while running, please use stop()")
+        else:
+            logger.info("Keeping session alive for header: %s" % header)
+            self.__keep_alives[header] = [interval, 0.0]
+
+    def stop_keep_alive(self, header=None):
+        """
+            Stops sending TesterPresents for the given header
+            (or for all headers, if none is given)
+        """
+
+        # the dict shouldn't be changed while the daemon thread is iterating
+        if self.__running:
+            logger.warning("Can't stop_keep_alive() while running, please use stop()")
+        elif header is None:
+            self.__keep_alives = {}
+        else:
+            self.__keep_alives.pop(header, None)
+
+    def __send_keep_alives(self):
+        """ sends the TesterPresents that are due """
+        now = time.time()
+        for header, keep_alive in self.__keep_alives.items():
+            if now - keep_alive[1] >= keep_alive[0]:
+                if not self.tester_present(header):
+                    logger.info("TesterPresent was not acknowledged by ECU %s" % header)
+                keep_alive[1] = now
+
+    def query(self, c, force=False, deadline=None, cancel=None):
         """
             Non-blocking query().
             Only commands that have been watch()ed will return valid responses
+            (deadline and cancel are accepted for compatibility with OBD.query())
         """
 
         if c in self.__commands:
@@ -211,8 +288,19 @@ class Async(OBD):
                         self.__thread = None
                         return
 
+                    # send any TesterPresent that is due between commands
+                    self.__send_keep_alives()
+
+                    deadline = None
+                    if self.__query_timeout is not None:
+                        deadline = time.time() + self.__query_timeout
+
                     # force, since commands are checked for support in watch()
-                    r = super(Async, self).query(c, force=True)
+                    r = super(Async, self).query(c, force=True, deadline=deadline,
+                                                 cancel=self.__cancel)
+
+                    if self.__cancel.cancelled:
+                        break  # stopped, drop the abandoned response
 
                     # store the response
                     self.__commands[c] = r
@@ -223,4 +311,5 @@ class Async(OBD):
                 time.sleep(self.__delay_cmds)
 
             else:
+                self.__send_keep_alives()
                 time.sleep(0.25)  # idle
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+
+########################################################################
+#                                                                      #
+# python-OBD: A python OBD-II serial module derived from pyobd         #
+#                                                                      #
+# Copyright 2004 Donour Sizemore (donour@uchicago.edu)                 #
+# Copyright 2009 Secons Ltd. (www.obdtester.com)                       #
+# Copyright 2009 Peter J. Creath                                       #
+# Copyright 2016 Brendan Whitfield (brendan-w.com)                     #
+#                                                                      #
+########################################################################
+#                                                                      #
+# bulk.py                                                              #
+#                                                                      #
+# This file is part of python-OBD (a derivative of pyOBD)              #
+#                                                                      #
+# python-OBD is free software: you can redistribute it and/or modify   #
+# it under the terms of the GNU General Public License as published by #
+# the Free Software Foundation, either version 2 of the License, or    #
+# (at your option) any later version.                                  #
+#                                                                      #
+# python-OBD is distributed in the hope that it will be useful,        #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of       #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the        #
+# GNU General Public License for more details.                         #
+#                                                                      #
+# You should have received a copy of the GNU General Public License    #
+# along with python-OBD.  If not, see <http://www.gnu.org/licenses/>.  #
+#                                                                      #
+########################################################################
+
+
+import functools
+import logging
+
+import numpy as np
+
+from . import decoders
+from .protocols import ECU
+from .protocols.protocol import Message
+
+logger = logging.getLogger(__name__)
+
+"""
+    Offline bulk decoding
+
+    Decodes many recorded responses of one command into a NumPy array,
+    for analysing logs without building an OBDResponse (and a pint
+    Quantity) per value:
+
+        values, valid = obd.bulk.decode(obd.commands.RPM, rows)
+
+    Rows are the data of the responses (Message.data, starting with the
+    mode and PID bytes), as bytes-like objects or hex strings, or a 2D
+    uint8 array with one response per row.
+
+    Most sensor decoders are linear in a big-endian integer at a fixed
+    position (the UAS scalings, percentages, temperatures...). Those
+    are decoded in one vectorized operation. The other decoders (status,
+    DTCs, bit fields...) fall back to decoding each row.
+"""
+
+
+class Linear:
+    """ value = raw * scale + offset, raw being the big-endian integer data[start:start + width] """
+
+    def __init__(self, start, width, signed, scale, offset, unit):
+        self.start = start
+        self.width = width
+        self.signed = signed
+        self.scale = scale
+        self.offset = offset
+        self.unit = unit
+
+    def __repr__(self):
+        return "Linear(data[%d:%d]%s * %r + %r %s)" % (self.start, self.start + self.width,
+                                                      " signed" if self.signed else "",
+                                                      self.scale, self.offset, self.unit)
+
+
+# decoder : (offset into the PID's data, width (None = the rest), scale, offset, unit)
+# these mirror the arithmetic of the decoders of the same name
+LINEAR_DECODERS = {
+    decoders.count:              (0, None, 1,           0,      "count"),
+    decoders.percent:            (0, 1,    100 / 255.0, 0,      "percent"),
+    decoders.percent_centered:   (0, 1,    100 / 128.0, -100,   "percent"),
+    decoders.temp:               (0, None, 1,           -40,    "degree_Celsius"),
+    decoders.current_centered:   (2, 2,    1 / 256.0,   -128,   "milliampere"),
+    decoders.sensor_voltage:     (0, 1,    1 / 200.0,   0,      "volt"),
+    decoders.sensor_voltage_big: (2, 2,    8 / 65535.0, 0,      "volt"),
+    decoders.fuel_pressure:      (0, 1,    3,           0,      "kilopascal"),
+    decoders.pressure:           (0, 1,    1,           0,      "kilopascal"),
+    decoders.abs_evap_pressure:  (0, None, 1 / 200.0,   0,      "kilopascal"),
+    decoders.evap_pressure_alt:  (0, None, 1,           -32767, "pascal"),
+    decoders.timing_advance:     (0, 1,    0.5,         -64,    "degree"),
+    decoders.inject_timing:      (0, None, 1 / 128.0,   -210,   "degree"),
+    decoders.max_maf:            (0, 1,    10,          0,      "gps"),
+    decoders.fuel_rate:          (0, None, 0.05,        0,      "lph"),
+}
+
+
+def linear(cmd):
+    """
+        Returns the Linear decoding of a command, or None when its
+        decoder isn't linear (or its response size isn't known)
+    """
+
+    # commands start with the mode and PID bytes
+    header = len(cmd.command) // 2
+    if cmd.bytes <= header:
+        return None
+
+    signed = False
+    decode = cmd.decode
+    if isinstance(decode, functools.partial) and decode.func is decoders.decode_uas:
+        from .UnitsAndScaling import UAS, UAS_IDS  # local import, the table needs the unit registry
+        uas = UAS_IDS[decode.keywords["id_"]]
+        if not isinstance(uas, UAS):
+            return None
+        start, width, scale, offset, unit = 0, None, uas.scale, uas.offset, str(uas.unit)
+        signed = uas.signed
+    elif decode in LINEAR_DECODERS:
+        start, width, scale, offset, unit = LINEAR_DECODERS[decode]
+    else:
+        return None
+
+    if width is None:
+        width = cmd.bytes - header - start
+    return Linear(header + start, width, signed, scale, offset, unit)
+
+
+def as_rows(rows, size):
+    """
+        Packs response data into a 2D uint8 array of `size` columns
+        (short rows are padded with zeros), and returns it along with
+        the original length of each row
+    """
+
+    if isinstance(rows, np.ndarray):
+        rows = np.asarray(rows, dtype=np.uint8)
+        lengths = np.full(len(rows), rows.shape[1])
+        if rows.shape[1] < size:
+            rows = np.pad(rows, ((0, 0), (0, size - rows.shape[1])))
+        return rows[:, :size], lengths
+
+    rows = [bytes.fromhex(r) if isinstance(r, str) else r for r in rows]
+    lengths = np.fromiter(map(len, rows), dtype=np.int64, count=len(rows))
+    data = b"".join([bytes(r[:size]).ljust(size, b"\x00") for r in rows])
+    return np.frombuffer(data, dtype=np.uint8).reshape(len(rows), size), lengths
+
+
+def decode(cmd, rows):
+    """
+        Decodes the data of many responses to a command.
+
+        Returns a pair of arrays: the values (float64 for linear
+        decoders, objects otherwise) and a boolean validity mask.
+        Rows answering another mode/PID, or too short to contain the
+        value, are invalid (and decode to NaN or None).
+    """
+
+    header = bytes.fromhex(cmd.command.decode())
+    header = bytes([header[0] + 0x40]) + header[1:]  # positive response to the mode
+
+    spec = linear(cmd)
+    size = max(cmd.bytes, len(header))
+    data, lengths = as_rows(rows, size)
+
+    valid = np.ones(len(data), dtype=bool)
+    for i, b in enumerate(header):
+        valid &= data[:, i] == b
+
+    if spec is None:
+        return fallback(cmd, rows, valid), valid
+
+    valid &= lengths >= spec.start + spec.width
+
+    # accumulate the big-endian integer, one byte column at a time
+    raw = np.zeros(len(data), dtype=np.int64)
+    for i in range(spec.start, spec.start + spec.width):
+        raw = (raw << 8) | data[:, i]
+    if spec.signed:
+        bits = spec.width * 8
+        raw = np.where(raw >= (1 << (bits - 1)), raw - (1 << bits), raw)
+
+    values = raw * spec.scale + spec.offset
+    values = values.astype(np.float64)
+    values[~valid] = np.nan
+    return values, valid
+
+
+def fallback(cmd, rows, valid):
+    """ decodes the valid rows one at a time, with the command's own decoder """
+
+    if isinstance(rows, np.ndarray):
+        rows = [bytes(r) for r in rows]
+    else:
+        rows = [bytes.fromhex(r) if isinstance(r, str) else r for r in rows]
+
+    values = np.empty(len(rows), dtype=object)
+    for i in np.flatnonzero(valid):
+        m = Message([])
+        m.ecu = ECU.ALL
+        m.data = memoryview(rows[i])
+        try:
+            values[i] = cmd([m]).value
+        except Exception as e:
+            # some decoders don't survive arbitrary data, skip the row
+            logger.debug("Failed to decode row %d of %s: %r" % (i, cmd.name, e))
+        if values[i] is None:
+            valid[i] = False
+    return values
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+########################################################################
+#                                                                      #
+# python-OBD: A python OBD-II serial module derived from pyobd         #
+#                                                                      #
+# Copyright 2004 Donour Sizemore (donour@uchicago.edu)                 #
+# Copyright 2009 Secons Ltd. (www.obdtester.com)                       #
+# Copyright 2009 Peter J. Creath                                       #
+# Copyright 2016 Brendan Whitfield (brendan-w.com)                     #
+#                                                                      #
+########################################################################
+#                                                                      #
+# cancel.py                                                            #
+#                                                                      #
+# This file is part of python-OBD (a derivative of pyOBD)              #
+#                                                                      #
+# python-OBD is free software: you can redistribute it and/or modify   #
+# it under the terms of the GNU General Public License as published by #
+# the Free Software Foundation, either version 2 of the License, or    #
+# (at your option) any later version.                                  #
+#                                                                      #
+# python-OBD is distributed in the hope that it will be useful,        #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of       #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the        #
+# GNU General Public License for more details.                         #
+#                                                                      #
+# You should have received a copy of the GNU General Public License    #
+# along with python-OBD.  If not, see <http://www.gnu.org/licenses/>.  #
+#                                                                      #
+########################################################################
+
+
+
+import threading
+import time
+
+"""
+    Query deadlines and cancellation
+
+    A deadline is an absolute time.time() value, after which a query
+    is abandoned: the adapter is interrupted, and waited for until it
+    shows its prompt again, so that the next command starts from a
+    clean state. A CancelToken abandons a query from another thread,
+    regardless of its deadline.
+
+        token = obd.CancelToken()
+        r = connection.query(obd.commands.RPM, deadline=time.time() + 0.5, cancel=token)
+        if isinstance(r, obd.TimeoutResponse):
+            ...
+"""
+
+
+class CancelToken:
+    """
+        Cancels the queries it was handed to, from any thread.
+        A token stays cancelled once cancel() was called.
+    """
+
+    def __init__(self):
+        self.__event = threading.Event()
+
+    def cancel(self):
+        self.__event.set()
+
+    @property
+    def cancelled(self):
+        return self.__event.is_set()
+
+    def wait(self, timeout=None):
+        """ waits (at most `timeout` seconds) for the token to be cancelled """
+        return self.__event.wait(timeout)
+
+
+def expired(deadline=None, cancel=None):
+    """ returns whether a query with this deadline/token should be abandoned """
+    if cancel is not None and cancel.cancelled:
+        return True
+    return deadline is not None and time.time() >= deadline
+
+
+def remaining(deadline=None):
+    """ returns the seconds left before the deadline (None = no deadline) """
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.time())
+
+
+def latest(a, b):
+    """ returns the later of two deadlines (None being the latest) """
+    if a is None or b is None:
+        return None
+    return max(a, b)
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+########################################################################
+#                                                                      #
+# python-OBD: A python OBD-II serial module derived from pyobd         #
+#                                                                      #
+# Copyright 2004 Donour Sizemore (donour@uchicago.edu)                 #
+# Copyright 2009 Secons Ltd. (www.obdtester.com)                       #
+# Copyright 2009 Peter J. Creath                                       #
+# Copyright 2016 Brendan Whitfield (brendan-w.com)                     #
+#                                                                      #
+########################################################################
+#                                                                      #
+# code_tables.py                                                       #
+#                                                                      #
+# This file is part of python-OBD (a derivative of pyOBD)              #
+#                                                                      #
+# python-OBD is free software: you can redistribute it and/or modify   #
+# it under the terms of the GNU General Public License as published by #
+# the Free Software Foundation, either version 2 of the License, or    #
+# (at your option) any later version.                                  #
+#                                                                      #
+# python-OBD is distributed in the hope that it will be useful,        #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of       #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the        #
+# GNU General Public License for more details.                         #
+#                                                                      #
+# You should have received a copy of the GNU General Public License    #
+# along with python-OBD.  If not, see <http://www.gnu.org/licenses/>.  #
+#                                                                      #
+########################################################################
+
+
+TEST_IDS = {
+    # <TID>: (<name>, <description>)
+    # 0x0 is reserved
+    0x01: ("RTL_THRESHOLD_VOLTAGE", "Rich to lean sensor threshold voltage"),
+    0x02: ("LTR_THRESHOLD_VOLTAGE", "Lean to rich sensor threshold voltage"),
+    0x03: ("LOW_VOLTAGE_SWITCH_TIME", "Low sensor voltage for switch time calculation"),
+    0x04: ("HIGH_VOLTAGE_SWITCH_TIME", "High sensor voltage for switch time calculation"),
+    0x05: ("RTL_SWITCH_TIME", "Rich to lean sensor switch time"),
+    0x06: ("LTR_SWITCH_TIME", "Lean to rich sensor switch time"),
+    0x07: ("MIN_VOLTAGE", "Minimum sensor voltage for test cycle"),
+    0x08: ("MAX_VOLTAGE", "Maximum sensor voltage for test cycle"),
+    0x09: ("TRANSITION_TIME", "Time between sensor transitions"),
+    0x0A: ("SENSOR_PERIOD", "Sensor period"),
+    0x0B: ("MISFIRE_AVERAGE", "Average misfire counts for last ten driving cycles"),
+    0x0C: ("MISFIRE_COUNT", "Misfire counts for last/current driving cycles"),
+}
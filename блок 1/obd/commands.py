@@ -34,7 +34,7 @@ import logging
 
 from .OBDCommand import OBDCommand
 from .decoders import *
-from .protocols import ECU
+from .protocols import ECU, ECU_HEADER
 
 logger = logging.getLogger(__name__)
 
@@ -155,13 +155,13 @@ __mode1__ = [
 # mode 2 is the same as mode 1, but returns values from when the DTC occured
 __mode2__ = []
 for c in __mode1__:
-    c = c.clone()
-    c.command = b"02" + c.command[2:]  # change the mode: 0100 ---> 0200
-    c.name = "DTC_" + c.name
-    c.desc = "DTC " + c.desc
-    if c.decode == pid:
-        c.decode = drop  # Never send mode 02 pid requests (use mode 01 instead)
-    __mode2__.append(c)
+    __mode2__.append(c.clone(
+        command=b"02" + c.command[2:],  # change the mode: 0100 ---> 0200
+        name="DTC_" + c.name,
+        desc="DTC " + c.desc,
+        decoder=drop if c.decode == pid else c.decode,  # Never send mode 02 pid requests (use mode 01 instead)
+        ttl=None,
+    ))
 
 __mode3__ = [
     OBDCommand("GET_DTC", "Get DTCs", b"03", 100, dtc, ECU.ALL, False),
@@ -279,6 +279,9 @@ __mode7__ = [
     OBDCommand("GET_CURRENT_DTC", "Get DTCs from the current/last driving cycle", b"07", 0, dtc, ECU.ALL, False),
 ]
 
+__mode10__ = [
+    OBDCommand("GET_PERMANENT_DTC", "Get permanent DTCs (not erased by a clear)", b"0A", 0, dtc, ECU.ALL, False),
+]
 
 __mode9__ = [
     #                      name                             description                            cmd     bytes       decoder       ECU        fast
@@ -305,11 +308,66 @@ __misc__ = [
     OBDCommand("ELM_VOLTAGE", "Voltage detected by OBD-II adapter", b"ATRV", 0, elm_voltage, ECU.UNKNOWN, False),
 ]
 
+# how long (in seconds) a response can be reused by OBD.query()
+# commands not listed here always go to the bus
+STATIC = float("inf")  # for the whole connection
+MONITOR = 5  # mode 06 test results, which only change when a monitor runs
+
+__ttls__ = {
+    # PID support, and vehicle identification
+    "PIDS_A"                     : STATIC,
+    "PIDS_B"                     : STATIC,
+    "PIDS_C"                     : STATIC,
+    "MIDS_A"                     : STATIC,
+    "MIDS_B"                     : STATIC,
+    "MIDS_C"                     : STATIC,
+    "MIDS_D"                     : STATIC,
+    "MIDS_E"                     : STATIC,
+    "MIDS_F"                     : STATIC,
+    "PIDS_9A"                    : STATIC,
+    "VIN_MESSAGE_COUNT"          : STATIC,
+    "VIN"                        : STATIC,
+    "CALIBRATION_ID_MESSAGE_COUNT": STATIC,
+    "CALIBRATION_ID"             : STATIC,
+    "CVN_MESSAGE_COUNT"          : STATIC,
+    "CVN"                        : STATIC,
+    "ELM_VERSION"                : STATIC,
+    "FUEL_TYPE"                  : STATIC,
+    "OBD_COMPLIANCE"             : STATIC,
+    "O2_SENSORS"                 : STATIC,
+    "O2_SENSORS_ALT"             : STATIC,
+    "EMISSION_REQ"               : STATIC,
+
+    # slowly changing
+    "STATUS"                     : 1,
+    "ELM_VOLTAGE"                : 1,
+    "FUEL_LEVEL"                 : 10,
+    "ETHANOL_PERCENT"            : 60,
+    "BAROMETRIC_PRESSURE"        : 10,
+    "AMBIANT_AIR_TEMP"           : 10,
+    "DISTANCE_W_MIL"             : 10,
+    "DISTANCE_SINCE_DTC_CLEAR"   : 10,
+    "WARMUPS_SINCE_DTC_CLEAR"    : 10,
+    "RUN_TIME_MIL"               : 10,
+    "TIME_SINCE_DTC_CLEARED"     : 10,
+}
+
 """
 Assemble the command tables by mode, and allow access by name
 """
 
 
+def with_ttl(c):
+    """ applies the default cache lifetime (commands are immutable) """
+    if c is None:
+        return c
+    if c.name in __ttls__:
+        return c.clone(ttl=__ttls__[c.name])
+    if c.decode == monitor:
+        return c.clone(ttl=MONITOR)
+    return c
+
+
 class Commands():
     def __init__(self):
 
@@ -325,16 +383,28 @@ class Commands():
             __mode7__,
             [],
             __mode9__,
+            __mode10__,
         ]
+        self.modes = [[with_ttl(c) for c in m] for m in self.modes]
+
+        # allow commands to be accessed by (header, mode, pid)
+        self.__by_key = {}
+        self.__all = set()
 
         # allow commands to be accessed by name
         for m in self.modes:
             for c in m:
                 if c is not None:
-                    self.__dict__[c.name] = c
+                    self.__add(c)
 
         for c in __misc__:
-            self.__dict__[c.name] = c
+            self.__add(with_ttl(c))
+
+    def __add(self, c):
+        self.__dict__[c.name] = c
+        self.__all.add(c)
+        if c.mode is not None:
+            self.__by_key[(c.header, c.mode, c.pid)] = c
 
     def __getitem__(self, key):
         """
@@ -377,10 +447,15 @@ class Commands():
             self.GET_DTC,
             self.CLEAR_DTC,
             self.GET_CURRENT_DTC,
+            self.GET_PERMANENT_DTC,
             self.ELM_VERSION,
             self.ELM_VOLTAGE,
         ]
 
+    def monitors(self):
+        """ returns a list of the mode 06 test result commands """
+        return [cmd for cmd in self.modes[6] if (cmd and cmd.decode == monitor)]
+
     def pid_getters(self):
         """ returns a list of PID GET commands """
         getters = []
@@ -390,7 +465,16 @@ class Commands():
 
     def has_command(self, c):
         """ checks for existance of a command by OBDCommand object """
-        return c in self.__dict__.values()
+        return c in self.__all
+
+    def lookup(self, mode, pid, header=ECU_HEADER.ENGINE):
+        """
+            returns the command for an int mode and int pid (or None
+            for modes without PIDs), or None if there isn't any
+
+            obd.commands.lookup(1, 12) # RPM
+        """
+        return self.__by_key.get((header, mode, pid))
 
     def has_name(self, name):
         """ checks for existance of a command by name """
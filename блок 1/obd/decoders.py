@@ -35,8 +35,9 @@ import math
 import functools
 from .utils import *
 from .codes import *
+from . import UnitsAndScaling
 from .OBDResponse import Status, StatusTest, Monitor, MonitorTest
-from .UnitsAndScaling import Unit, UAS_IDS
+from .UnitsAndScaling import Unit
 
 import logging
 
@@ -59,7 +60,7 @@ def drop(_):
 
 # data in, data out
 def noop(messages):
-    return messages[0].data
+    return bytearray(messages[0].data)  # a copy, the data is a view into the receive buffer
 
 
 # hex in, bitstring out
@@ -87,7 +88,7 @@ def uas(id_):
 
 def decode_uas(messages, id_):
     d = messages[0].data[2:]  # chop off mode and PID bytes
-    return UAS_IDS[id_](d)
+    return UnitsAndScaling.UAS_IDS[id_](d)
 
 
 """
@@ -280,7 +281,6 @@ Return objects, lists, etc
 
 def status(messages):
     d = messages[0].data[2:]
-    bits = BitArray(d)
 
     #            ┌Components not ready
     #            |┌Fuel not ready
@@ -293,30 +293,7 @@ def status(messages):
     #  10000011 00000111 11111111 00000000
     #   [# DTC] X        [supprt] [~ready]
 
-    output = Status()
-    output.MIL = bits[0]
-    output.DTC_count = bits.value(1, 8)
-    output.ignition_type = IGNITION_TYPE[int(bits[12])]
-
-    # load the 3 base tests that are always present
-    for i, name in enumerate(BASE_TESTS[::-1]):
-        t = StatusTest(name, bits[13 + i], not bits[9 + i])
-        output.__dict__[name] = t
-
-    # different tests for different ignition types
-    if bits[12]:  # compression
-        for i, name in enumerate(COMPRESSION_TESTS[::-1]):  # reverse to correct for bit vs. indexing order
-            t = StatusTest(name, bits[(2 * 8) + i],
-                           not bits[(3 * 8) + i])
-            output.__dict__[name] = t
-
-    else:  # spark
-        for i, name in enumerate(SPARK_TESTS[::-1]):  # reverse to correct for bit vs. indexing order
-            t = StatusTest(name, bits[(2 * 8) + i],
-                           not bits[(3 * 8) + i])
-            output.__dict__[name] = t
-
-    return output
+    return Status(bytes_to_int(d[:4]))
 
 
 def fuel_status(messages):
@@ -408,7 +385,8 @@ def parse_dtc(_bytes):
     dtc += bytes_to_hex(_bytes)[1:4]
 
     # pull a description if we have one
-    return (dtc, DTC.get(dtc, ""))
+    from .dtc_index import describe  # local import, the index is only opened when needed
+    return (dtc, describe(dtc))
 
 
 def hex_to_int(str):
@@ -425,9 +403,7 @@ def dtc(messages):
     """ converts a frame of 2-byte DTCs into a list of DTCs """
     codes = []
     d = []
-    print("len messages == ",len(messages))
     for message in messages:
-        print("len data == ", len(message.data))
         #  # remove the mode and DTC_count bytes
         if message.can == False:
             d += message.data[2:]
@@ -435,8 +411,6 @@ def dtc(messages):
             d += message.data[1:]  # remove the mode and DTC_count bytes
         elif message.can and message.num_frames > 1:
             d += message.data[0:]  # remove the mode and DTC_count bytes
-    print(d)
-    print(len(d))
 
     # look at data in pairs of bytes
     # looping through ENDING indices to avoid odd (invalid) code lengths
@@ -444,7 +418,6 @@ def dtc(messages):
         # parse the code
         dtc = parse_dtc([d[n-1],d[n]])
         if (dtc is not None) and (dtc[0] != "P0000"):
-            print(dtc)
             codes.append(dtc)
 
     return codes
@@ -455,6 +428,7 @@ def parse_monitor_test(d, mon):
 
     tid = d[1]
 
+    from .codes import TEST_IDS  # local import, the table is only loaded when needed
     if tid in TEST_IDS:
         test.name = TEST_IDS[tid][0]  # lookup the name from the table
         test.desc = TEST_IDS[tid][1]  # lookup the description from the table
@@ -463,7 +437,7 @@ def parse_monitor_test(d, mon):
         test.name = "Unknown"
         test.desc = "Unknown"
 
-    uas = UAS_IDS.get(d[2], None)
+    uas = UnitsAndScaling.UAS_IDS.get(d[2], None)
 
     # if we can't decode the value, abort
     if uas is None:
@@ -485,7 +459,6 @@ def monitor(messages):
     # even though we never use the MID byte, it may
     # show up multiple times. Thus, keeping it make
     # for easier parsing.
-    mon = Monitor()
 
     # test that we got the right number of bytes
     extra_bytes = len(d) % 9
@@ -494,12 +467,9 @@ def monitor(messages):
         logger.debug("Encountered monitor message with non-multiple of 9 bytes. Truncating...")
         d = d[:len(d) - extra_bytes]
 
-    # look at data in blocks of 9 bytes (one test result)
-    for n in range(0, len(d), 9):
-        # extract the 9 byte block, and parse a new MonitorTest
-        test = parse_monitor_test(d[n:n + 9], mon)
-        if test is not None:
-            mon.add_test(test)
+    # the blocks of 9 bytes (one test result) are parsed
+    # by parse_monitor_test() when the Monitor is first read
+    mon = Monitor(d)
 
     return mon
 
@@ -519,7 +489,7 @@ def decode_encoded_string(messages, length):
     # Encoded strings come in bundles of messages with leading null values to
     # pad out the string to the next full message size. We strip off the
     # leading null characters here and return the resulting string.
-    return d.strip().strip(b'\x00' b'\x01' b'\x02' b'\\x00' b'\\x01' b'\\x02')
+    return bytearray(d).strip().strip(b'\x00' b'\x01' b'\x02' b'\\x00' b'\\x01' b'\\x02')
 
 
 def cvn(messages):
@@ -527,3 +497,13 @@ def cvn(messages):
     if d is None:
         return None
     return bytes_to_hex(d)
+
+
+def __getattr__(name):
+    # the tables that used to be imported here are loaded on first use
+    if name in ("DTC", "TEST_IDS"):
+        from . import codes
+        return getattr(codes, name)
+    if name == "UAS_IDS":
+        return UnitsAndScaling.UAS_IDS
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+
+########################################################################
+#                                                                      #
+# python-OBD: A python OBD-II serial module derived from pyobd         #
+#                                                                      #
+# Copyright 2004 Donour Sizemore (donour@uchicago.edu)                 #
+# Copyright 2009 Secons Ltd. (www.obdtester.com)                       #
+# Copyright 2009 Peter J. Creath                                       #
+# Copyright 2016 Brendan Whitfield (brendan-w.com)                     #
+#                                                                      #
+########################################################################
+#                                                                      #
+# dtc_index.py                                                         #
+#                                                                      #
+# This file is part of python-OBD (a derivative of pyOBD)              #
+#                                                                      #
+# python-OBD is free software: you can redistribute it and/or modify   #
+# it under the terms of the GNU General Public License as published by #
+# the Free Software Foundation, either version 2 of the License, or    #
+# (at your option) any later version.                                  #
+#                                                                      #
+# python-OBD is distributed in the hope that it will be useful,        #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of       #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the        #
+# GNU General Public License for more details.                         #
+#                                                                      #
+# You should have received a copy of the GNU General Public License    #
+# along with python-OBD.  If not, see <http://www.gnu.org/licenses/>.  #
+#                                                                      #
+########################################################################
+
+
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+from collections.abc import Mapping
+
+logger = logging.getLogger(__name__)
+
+"""
+    Compact, memory-mapped DTC description index
+
+    Descriptions are stored in a single binary file, which is mapped
+    into memory instead of being loaded into a dict. Only the pages
+    that are actually searched are read from disk:
+
+        header   "OBDDTC" version  count  width       (16 bytes)
+        codes    count * width ASCII bytes, sorted     ("P0133")
+        offsets  (count + 1) * uint32, into the blob
+        blob     UTF-8 descriptions, back to back
+
+    Codes are found with a binary search, and a prefix (ie. all the
+    "P03" codes) is a contiguous range of the code array. Indexes are
+    built from {code: description} JSON files:
+
+        python -m obd.dtc_index obd/dtc/generic.json obd/dtc/generic.idx
+
+    DTCTable layers manufacturer (brand) indexes over the generic one,
+    and a description provider (see resources.py) can be plugged in
+    front of both.
+"""
+
+MAGIC = b"OBDDTC"
+VERSION = 1
+HEADER = struct.Struct("<6sHII")  # magic, version, count, width
+OFFSET = struct.Struct("<I")
+OFFSET_PAIR = struct.Struct("<II")
+
+DTC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dtc")
+GENERIC_SOURCE = os.path.join(DTC_PATH, "generic.json")
+GENERIC_INDEX = os.path.join(DTC_PATH, "generic.idx")
+
+
+def build_index(descriptions, path=None):
+    """
+        Builds an index from a {code: description} dict. Returns the
+        bytes of the index, and writes them to `path` if one is given.
+    """
+
+    codes = sorted(descriptions)
+    width = max([len(c) for c in codes]) if codes else 5
+
+    blob = bytearray()
+    offsets = [0]
+    for c in codes:
+        blob += descriptions[c].encode("utf-8")
+        offsets.append(len(blob))
+
+    data = bytearray(HEADER.pack(MAGIC, VERSION, len(codes), width))
+    data += b"".join([c.encode("ascii").ljust(width) for c in codes])
+    data += struct.pack("<%dI" % len(offsets), *offsets)
+    data += blob
+
+    if path is not None:
+        # write next to the destination, and swap, so readers never map a partial file
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    return bytes(data)
+
+
+class DTCIndex(Mapping):
+    """
+        Read-only {code: description} mapping over an index file (or
+        the bytes returned by build_index())
+    """
+
+    def __init__(self, source, name=None):
+        self.name = name
+        self.__file = None
+
+        if isinstance(source, (bytes, bytearray)):
+            self.__buf = bytes(source)
+        else:
+            self.name = name or os.path.splitext(os.path.basename(source))[0]
+            self.__file = open(source, "rb")
+            try:
+                self.__buf = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty file
+                self.__buf = b""
+
+        if len(self.__buf) < HEADER.size:
+            self.close()
+            raise ValueError("Not a DTC index (too short)")
+
+        magic, version, self.__count, self.__width = HEADER.unpack_from(self.__buf, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError("Not a DTC index, or unsupported version")
+
+        self.__codes = HEADER.size
+        self.__offsets = self.__codes + self.__count * self.__width
+        self.__blob = self.__offsets + (self.__count + 1) * OFFSET.size
+
+        if len(self.__buf) < self.__blob:
+            self.close()
+            raise ValueError("Truncated DTC index")
+
+    def close(self):
+        if isinstance(self.__buf, mmap.mmap):
+            self.__buf.close()
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+    def code(self, i):
+        """ returns the i'th code, in sorted order """
+        start = self.__codes + i * self.__width
+        return self.__buf[start:start + self.__width].rstrip().decode("ascii")
+
+    def description(self, i):
+        """ returns the description of the i'th code """
+        start, end = OFFSET_PAIR.unpack_from(self.__buf, self.__offsets + i * OFFSET.size)
+        return self.__buf[self.__blob + start:self.__blob + end].decode("utf-8")
+
+    def __bisect(self, key, right):
+        """
+            returns the first index whose code (truncated to the length
+            of `key`) is >= key, or > key when `right` is set
+        """
+        key = key.encode("ascii")
+        n = len(key)
+        lo, hi = 0, self.__count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = self.__codes + mid * self.__width
+            code = self.__buf[start:start + n]
+            if code < key or (right and code == key):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def find(self, code):
+        """ returns the position of a code, or -1 """
+        if len(code) > self.__width or not code.isascii():
+            return -1
+        i = self.__bisect(code, False)
+        if i < self.__count and self.code(i) == code:
+            return i
+        return -1
+
+    def range(self, prefix):
+        """ returns the (start, stop) positions of the codes starting with `prefix` """
+        if not prefix.isascii():
+            return (0, 0)
+        return (self.__bisect(prefix, False), self.__bisect(prefix, True))
+
+    def prefix(self, prefix):
+        """ returns a sorted list of (code, description) for codes starting with `prefix` """
+        start, stop = self.range(prefix)
+        return [(self.code(i), self.description(i)) for i in range(start, stop)]
+
+    def __getitem__(self, code):
+        i = self.find(code)
+        if i < 0:
+            raise KeyError(code)
+        return self.description(i)
+
+    def __contains__(self, code):
+        return isinstance(code, str) and self.find(code) >= 0
+
+    def __iter__(self):
+        return (self.code(i) for i in range(self.__count))
+
+    def __len__(self):
+        return self.__count
+
+    def __repr__(self):
+        return "DTCIndex(%s, %d codes)" % (repr(self.name), self.__count)
+
+
+class DTCTable(Mapping):
+    """
+        The generic index, with manufacturer indexes layered over it.
+        Overlays are searched first, the most recently added first.
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.__overlays = []
+        self.__lock = threading.Lock()
+
+    def add_overlay(self, index):
+        """ layers an index (ie. the codes of one brand) over the table """
+        with self.__lock:
+            self.__overlays = [index] + [o for o in self.__overlays if o is not index]
+
+    def remove_overlay(self, index):
+        with self.__lock:
+            self.__overlays = [o for o in self.__overlays if o is not index]
+
+    def overlays(self):
+        return list(self.__overlays)
+
+    def get(self, code, default=None):
+        # the lookup behind decoders.parse_dtc(), keep it simple
+        for index in self.__overlays:
+            i = index.find(code)
+            if i >= 0:
+                return index.description(i)
+        i = self.base.find(code)
+        if i >= 0:
+            return self.base.description(i)
+        return default
+
+    def __getitem__(self, code):
+        v = self.get(code)
+        if v is None:
+            raise KeyError(code)
+        return v
+
+    def __contains__(self, code):
+        return self.get(code) is not None
+
+    def prefix(self, prefix):
+        """ returns a sorted list of (code, description) for codes starting with `prefix` """
+        codes = dict(self.base.prefix(prefix))
+        for index in reversed(self.__overlays):
+            codes.update(index.prefix(prefix))
+        return sorted(codes.items())
+
+    def __iter__(self):
+        return iter([code for code, _ in self.prefix("")])
+
+    def __len__(self):
+        return len(self.prefix(""))
+
+
+def load_generic():
+    """
+        opens the bundled generic index, falling back to building it
+        in memory from its JSON source (ie. in a fresh checkout)
+    """
+    try:
+        return DTCIndex(GENERIC_INDEX, "generic")
+    except (OSError, ValueError) as e:
+        logger.info("Failed to open the DTC index (%s), building it in memory" % e)
+
+    with open(GENERIC_SOURCE, "r", encoding="utf-8") as f:
+        return DTCIndex(build_index(json.load(f)), "generic")
+
+
+__table = None
+__table_lock = threading.Lock()
+
+
+def dtc_table():
+    """ returns the shared DTCTable, opening the generic index on first use """
+    global __table
+    if __table is None:
+        with __table_lock:
+            if __table is None:
+                __table = DTCTable(load_generic())
+    return __table
+
+
+__provider = None
+
+
+def set_description_provider(provider):
+    """
+        Plugs a description provider in front of the DTC table (ie. a
+        resources.ResourceProvider). A provider is a callable taking a
+        code, and returning its description, or None to fall back to the
+        table. Passing None removes the provider.
+    """
+    global __provider
+    __provider = provider
+
+
+def describe(code):
+    """ returns the description of a code, or "" """
+    provider = __provider
+    if provider is not None:
+        description = provider(code)
+        if description is not None:
+            return description
+    return dtc_table().get(code, "")
+
+
+def notify_vin(vin):
+    """ tells the provider which vehicle is connected """
+    set_vin = getattr(__provider, "set_vin", None)
+    if set_vin is not None:
+        if not isinstance(vin, str):
+            vin = bytes(vin).decode("ascii", "replace")
+        set_vin(vin)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Builds a DTC index from a {code: description} JSON file")
+    parser.add_argument("source", help="JSON file of {code: description}")
+    parser.add_argument("index", help="path of the index to write")
+    args = parser.parse_args()
+
+    with open(args.source, "r", encoding="utf-8") as f:
+        descriptions = json.load(f)
+    build_index(descriptions, args.index)
+    print("wrote %d codes to %s" % (len(descriptions), args.index))
+
+
+if __name__ == "__main__":
+    main()
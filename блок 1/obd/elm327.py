@@ -30,10 +30,14 @@
 #                                                                      #
 ########################################################################
 
+import json
+import os
 import re
 import serial
+import sys
 import time
 import logging
+from .cancel import expired
 from .protocols import *
 from .utils import OBDStatus
 
@@ -49,11 +53,21 @@ class ELM327:
         the following functions become available:
 
             send_and_parse()
+            send_and_parse_many()
+            format_command()
+            monitor()
             close()
             status()
             port_name()
             protocol_name()
             ecus()
+            ecu_map()
+            stn_id()
+            last_activity()
+            low_power()
+            normal_power()
+            in_low_power()
+            power_stats()
     """
 
     # chevron (ELM prompt character)
@@ -80,6 +94,9 @@ class ELM327:
         # "C" : None, # user defined 2
     }
 
+    # the OBD over CAN protocols, which can be addressed and filtered by CAN ID
+    _ISO_15765_4_IDS = ["6", "7", "8", "9"]
+
     # used as a fallback, when ATSP0 doesn't cut it
     _TRY_PROTOCOL_ORDER = [
         "6",  # ISO_15765_4_11bit_500k
@@ -96,18 +113,51 @@ class ELM327:
 
     # 38400, 9600 are the possible boot bauds (unless reprogrammed via
     # PP 0C).  19200, 38400, 57600, 115200, 230400, 500000 are listed on
-    # p.46 of the ELM327 datasheet.
-    #
-    # Once pyserial supports non-standard baud rates on platforms other
-    # than Linux, we'll add 500K to this list.
+    # p.46 of the ELM327 datasheet. The faster ones are used by STN
+    # based adapters.
     #
     # We check the two default baud rates first, then go fastest to
     # slowest, on the theory that anyone who's using a slow baud rate is
     # going to be less picky about the time required to detect it.
-    _TRY_BAUDS = [38400, 9600,  115200, 57600, 19200, 14400, 3000000, 2000000, 1000000, 250000, 230400, 128000, 500000, 460800, 500000, 576000, 921600, 1000000, 1152000, 1500000, 2000000, 2500000, 3000000, 3500000, 4000000]
+    # Rates that worked before on a port are tried first (see BAUD_HISTORY).
+    _TRY_BAUDS = [38400, 9600, 115200, 57600, 19200, 14400, 3000000, 2000000, 1000000, 250000,
+                  230400, 128000, 500000, 460800, 576000, 921600, 1152000, 1500000, 2500000,
+                  3500000, 4000000]
+
+    # file remembering which baud rates worked on which port, opt-in
+    # (ie. os.path.expanduser("~/.python-obd-bauds.json")), see also the
+    # baud_history argument
+    BAUD_HISTORY = None
+
+    # seconds to wait for the prompt at each baud rate. Bluetooth and
+    # network links add their own latency (tens of ms per round trip on
+    # RFCOMM), and get the longer timeout.
+    _BAUD_ATTEMPT_TIMEOUT = 0.1
+    _WIRELESS_BAUD_ATTEMPT_TIMEOUT = 0.3
+    _WIRELESS_PORTS = ("rfcomm", "bluetooth", "socket://", "rfc2217://")
+
+    # read timeout while a deadline or cancel token is polled
+    _POLL_INTERVAL = 0.05
+
+    # seconds to wait for the prompt after interrupting a command
+    _RESYNC_TIMEOUT = 1.0
+
+    # seconds to wait for the prompt after waking up from low power
+    _WAKE_TIMEOUT = 1.0
+    _WAKE_ATTEMPTS = 2
+
+    # supply current (in mA) of the ELM327, for power_stats(). These are
+    # the chip's typical figures from the datasheet, set measured values
+    # to account for the rest of a given adapter.
+    ACTIVE_CURRENT = 12.0
+    LOW_POWER_CURRENT = 0.15
+
+    # rates the platform/driver refused this session
+    _unsupported_bauds = set()
 
     def __init__(self, portname, baudrate, protocol, timeout,
-                 check_voltage=False, start_low_power=False):
+                 check_voltage=False, start_low_power=False, warm_start=True,
+                 baud_history=None):
         """Initializes port by resetting device and gettings supported PIDs. """
 
         logger.info("Initializing ELM327: PORT=%s BAUD=%s PROTOCOL=%s" %
@@ -126,7 +176,15 @@ class ELM327:
         self.__port = None
         self.__protocol = UnknownProtocol([])
         self.__low_power = False
+        self.__stn = None  # STN chip ID, for adapters supporting ST commands
+        self.__last_activity = 0.0  # time of the last complete answer from the adapter
+        self.__opened = time.time()
+        self.__low_power_since = None  # time at which low power was entered
+        self.__low_power_time = 0.0  # seconds spent in low power, not counting the current period
+        self.__wake_times = []  # seconds each wake up took, until ready
         self.timeout = timeout
+        if baud_history is not None:
+            self.BAUD_HISTORY = baud_history
 
 
         # ------------- open port -------------
@@ -160,45 +218,18 @@ class ELM327:
             return
         else:
             print('Baudrate set!')
-        # ---------------------------- ATZ (reset) ----------------------------
-
-        try:
-            r =self.__send(b"ATZ", delay=1)  # wait 1 second for ELM to initialize
-            if "elm" in str(r).lower():
-                print(str(r))
-                print('ATZ succesful')
-            else:
-                print('ELM not found on this port.')
-                return
-            # return data can be junk, so don't bother checking
-        except serial.SerialException as e:
-            self.__error(e)
-            print(e)
+        # -------------- warm start, or ATZ (reset) and full setup -------------
+        warm = warm_start and self.__warm_start()
+        if not warm and not self.__reset():
             return
 
-        # -------------------------- ATE0 (echo OFF) --------------------------
-        r = self.__send(b"ATE0", delay=1)
-        if not self.__isok(r, expectEcho=True):
-            self.__error("ATE0 did not return 'OK'")
-            return
-        else:
-            print('ATE0 OK')
-
-        # ------------------------- ATH1 (headers ON) -------------------------
-        r = self.__send(b"ATH1", delay=1)
-        if not self.__isok(r):
-            self.__error("ATH1 did not return 'OK', or echoing is still ON")
-            return
-        else:
-            print('ATH1 OK')
-
-        # ------------------------ ATL0 (linefeeds OFF) -----------------------
-        r = self.__send(b"ATL0")
-        if not self.__isok(r):
-            self.__error("ATL0 did not return 'OK'")
-            return
-        else:
-            print('ATL0 OK')
+        # ----------------------- STI (STN chip detection) ---------------------
+        # ELM327 chips (and their clones) don't know ST commands, and answer '?'
+        r = self.__send(b"STI")
+        if r and r[0].upper().startswith("STN"):
+            self.__stn = r[0]
+            r = self.__send(b"STDI")
+            logger.info("Detected STN chip: %s (%s)" % (self.__stn, r[0] if r else "unknown device"))
 
         # by now, we've successfuly communicated with the ELM, but not the car
         self.__status = OBDStatus.ELM_CONNECTED
@@ -223,8 +254,18 @@ class ELM327:
             self.__status = OBDStatus.OBD_CONNECTED
             print('OBD Connected')
         # try to communicate with the car, and load the correct protocol parser
-        if self.set_protocol(protocol):
+        # (a warm adapter may still be talking to the car)
+        if (warm and self.resume_protocol(protocol)) or self.set_protocol(protocol):
             self.__status = OBDStatus.CAR_CONNECTED
+
+            # ---------------- ATJHF0 (J1939 header formatting OFF) --------------
+            # print the raw 29-bit IDs, the PGN and source address are
+            # extracted by the protocol parser
+            if self.__protocol.ELM_ID == "A":
+                r = self.__send(b"ATJHF0")
+                if not self.__isok(r):
+                    logger.warning("ATJHF0 did not return 'OK'")
+
             logger.info("Connected Successfully: PORT=%s BAUD=%s PROTOCOL=%s" %
                         (
                             portname,
@@ -276,6 +317,38 @@ class ELM327:
             print('Failed to set protocol.')
         return False
 
+    def resume_protocol(self, protocol_=None):
+        """
+            Picks up the protocol the adapter is already using, when
+            it has one from a previous session. This skips the search,
+            and its delays.
+
+            Returns False if the protocol has to be set up again
+        """
+
+        r = self.__send(b"ATDPN")
+        if len(r) != 1:
+            return False
+
+        p = r[0]
+        # suppress any "automatic" prefix
+        p = p[1:] if (len(p) > 1 and p.startswith("A")) else p
+
+        if p not in self._SUPPORTED_PROTOCOLS:
+            return False  # "0", the adapter hasn't found a protocol yet
+
+        if protocol_ is not None and p != protocol_:
+            return False
+
+        r0100 = self.__send(b"0100")
+        for error in ["UNABLE TO CONNECT", "NO DATA", "BUS INIT: ...ERROR", "CAN ERROR"]:
+            if self.__has_message(r0100, error):
+                return False
+
+        logger.info("Resumed protocol %s" % p)
+        self.__protocol = self._SUPPORTED_PROTOCOLS[p](r0100)
+        return True
+
     def auto_protocol(self):
         """
             Attempts communication with the car.
@@ -354,30 +427,39 @@ class ELM327:
                 return False
             return True
 
-    def auto_baudrate(self):
+    def auto_baudrate(self, bit_timing=False):
         """
         Detect the baud rate at which a connected ELM32x interface is operating.
         Returns boolean for success.
+
+        With bit_timing=True, the amount of garbage received at a wrong
+        baud rate is used to skip rates that can't match it.
         """
 
         # before we change the timout, save the "normal" value
         timeout = self.__port.timeout
-        self.__port.timeout = 0.1  # we're only talking with the ELM, so things should go quickly
-        #print(self.__port.write_timeout)
-        self.__port.write_timeout = 0.1
-        #print(self.__port.write_timeout)
-        for baud in self._TRY_BAUDS:
-            print('Baudrate ' + str(baud))
+        attempt_timeout = self.__baud_attempt_timeout()
+        self.__port.timeout = attempt_timeout  # we're only talking with the ELM, so things should go quickly
+        self.__port.write_timeout = attempt_timeout
+
+        history = self.__load_baud_history()
+        candidates = self.__baud_candidates(history.get(self.port_name(), {}))
+        # the bounds of the real baud rate, narrowed down by bit_timing
+        low, high = 0, float("inf")
+
+        for baud in candidates:
+            if not (low <= baud <= high):
+                logger.debug("Skipping baud %d, outside of %d-%d" % (baud, low, high))
+                continue
+
             try:
                 self.__port.baudrate = baud
-            except serial.serialutil.SerialException:
-                print('This baudrate is not supported on this platform!')
+            except (serial.serialutil.SerialException, ValueError):
+                logger.debug("Baud %d is not supported on this platform" % baud)
+                self._unsupported_bauds.add(baud)
                 continue
 
-            print("Trying baudrate "+str(baud))
-            print('flushing input')
             self.__port.flushInput()
-            print('flushing output')
             self.__port.flushOutput()
 
             # Send a nonsense command to get a prompt back from the scanner
@@ -388,34 +470,39 @@ class ELM327:
 
             # All commands should be terminated with carriage return according
             # to ELM327 and STN11XX specifications
-            
-            print('writing \x7F\x7F\r')
             try:
                 self.__port.write(b"\x7F\x7F\r")
+                self.__port.flush()
             except serial.serialutil.SerialTimeoutException:
-                print('Timeout')
-            """
-            print('writing ATZ')
-            try:
-                self.__port.write(b"ATZ\r")
-            except serial.serialutil.SerialTimeoutException:
-                print('Timeout')
-            """
-            print('flushing')
-            self.__port.flush()
-            print('reading')
-            response = self.__port.read(1024)
+                logger.debug("Write timeout at baud %d" % baud)
+                continue
+
+            # read until the prompt, rather than waiting for a fixed size
+            response = bytearray()
+            end = time.time() + attempt_timeout
+            while not response.endswith(self.ELM_PROMPT) and time.time() < end:
+                response.extend(self.__port.read(self.__port.in_waiting or 1))
+
             logger.debug("Response from baud %d: %s" % (baud, repr(response)))
-            print("Response from baud %d: %s" % (baud, repr(response)))
+
             # watch for the prompt character
-            #if (response.endswith(b">")) or ("elm" in str(response).lower()) or (b'\x7f\x7f\r' in response):
-            if "elm" in str(response).lower() or ((b'\x7f\x7f\r' in response) and (response.endswith(b">"))):
+            if response.endswith(self.ELM_PROMPT):
                 logger.debug("Choosing baud %d" % baud)
                 print("Choosing baud %d" % baud)
                 self.__port.timeout = timeout  # reinstate our original timeout
                 self.__port.write_timeout = timeout
+                self.__save_baud_history(history, baud)
                 return True
 
+            if bit_timing and response:
+                # the answer is "?\r\r>", possibly preceded by the echo (4-7 bytes).
+                # Sampling too fast splits every real byte into several,
+                # sampling too slow merges them, so the byte count scales with
+                # the ratio of the rates. Allow a factor 2 for framing errors.
+                n = len(response)
+                low = max(low, baud * 4 / (n * 2.0))
+                high = min(high, baud * 7 * 2.0 / n)
+
         logger.debug("Failed to choose baud")
         print("Failed to choose baud")
         try:
@@ -425,6 +512,136 @@ class ELM327:
             return False
         return False
 
+    def __baud_attempt_timeout(self):
+        name = self.port_name().lower()
+        if any(w in name for w in self._WIRELESS_PORTS):
+            return self._WIRELESS_BAUD_ATTEMPT_TIMEOUT
+        return self._BAUD_ATTEMPT_TIMEOUT
+
+    def __baud_candidates(self, port_history):
+        """
+            Orders the baud rates to try: the ones that worked on this
+            port first (most successes first), then the default order.
+        """
+        bauds = [b for b in self._TRY_BAUDS if b not in self._unsupported_bauds]
+
+        # only Linux (and Windows drivers) accept arbitrary rates,
+        # other POSIX platforms are limited to the standard ones
+        if not (sys.platform.startswith("linux") or sys.platform.startswith("win")):
+            bauds = [b for b in bauds if b in serial.Serial.BAUDRATES]
+
+        learned = sorted(port_history, key=lambda b: -port_history[b])
+        learned = [int(b) for b in learned if int(b) in bauds]
+        return learned + [b for b in bauds if b not in learned]
+
+    def __load_baud_history(self):
+        if self.BAUD_HISTORY is None:
+            return {}
+        try:
+            with open(self.BAUD_HISTORY, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def __save_baud_history(self, history, baud):
+        if self.BAUD_HISTORY is None:
+            return
+        port_history = history.setdefault(self.port_name(), {})
+        port_history[str(baud)] = port_history.get(str(baud), 0) + 1
+        # write a temporary file and move it in place, so that a crash
+        # or a concurrent connection never leaves a truncated history
+        tmp = "%s.%d.tmp" % (self.BAUD_HISTORY, os.getpid())
+        try:
+            with open(tmp, "w") as f:
+                json.dump(history, f)
+            os.replace(tmp, self.BAUD_HISTORY)
+        except OSError as e:
+            logger.debug("Failed to save baud history: %s" % e)
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    def __warm_start(self):
+        """
+            Checks whether an ELM is still answering (after a previous
+            session, or a USB hiccup), and brings it back to its defaults
+            and our settings, without resetting it.
+
+            Returns False when a full reset is needed
+        """
+
+        # ATI answers without touching any setting
+        lines = self.__send(b"ATI")
+
+        if not self.__has_message([l.upper() for l in lines], "ELM"):
+            logger.debug("Warm start: no ELM identification, resetting")
+            return False
+
+        # AT D drops what the previous session (or another tool) left
+        # behind: custom headers (AT SH), CAN filters (AT CRA, AT CF/CM)
+        # and timeouts (AT ST). Unlike ATZ, it doesn't restart the chip,
+        # and keeps the stored protocol. Echo and linefeeds are back to
+        # their power up defaults, so our settings are applied again.
+        r = self.__send(b"ATD")
+        if not self.__isok(r, expectEcho=True):
+            return False
+
+        if not self.__restore_settings():
+            return False
+
+        logger.info("Warm start: adapter configured without a reset (%s)" % lines[-1])
+        return True
+
+    def __reset(self):
+        """
+            Resets the adapter (ATZ), and applies our settings from scratch.
+
+            Returns False on failure
+        """
+
+        # ---------------------------- ATZ (reset) ----------------------------
+
+        try:
+            r =self.__send(b"ATZ", delay=1)  # wait 1 second for ELM to initialize
+            if "elm" in str(r).lower():
+                print(str(r))
+                print('ATZ succesful')
+            else:
+                print('ELM not found on this port.')
+                return False
+            # return data can be junk, so don't bother checking
+        except serial.SerialException as e:
+            self.__error(e)
+            print(e)
+            return False
+
+        # -------------------------- ATE0 (echo OFF) --------------------------
+        r = self.__send(b"ATE0", delay=1)
+        if not self.__isok(r, expectEcho=True):
+            self.__error("ATE0 did not return 'OK'")
+            return False
+        else:
+            print('ATE0 OK')
+
+        # ------------------------- ATH1 (headers ON) -------------------------
+        r = self.__send(b"ATH1", delay=1)
+        if not self.__isok(r):
+            self.__error("ATH1 did not return 'OK', or echoing is still ON")
+            return False
+        else:
+            print('ATH1 OK')
+
+        # ------------------------ ATL0 (linefeeds OFF) -----------------------
+        r = self.__send(b"ATL0")
+        if not self.__isok(r):
+            self.__error("ATL0 did not return 'OK'")
+            return False
+        else:
+            print('ATL0 OK')
+
+        return True
+
     def __isok(self, lines, expectEcho=False):
         if not lines:
             return False
@@ -461,12 +678,108 @@ class ELM327:
     def ecus(self):
         return self.__protocol.ecu_map.values()
 
+    def ecu_map(self):
+        return dict(self.__protocol.ecu_map)
+
     def protocol_name(self):
         return self.__protocol.ELM_NAME
 
     def protocol_id(self):
         return self.__protocol.ELM_ID
 
+    def stn_id(self):
+        """ returns the STN chip ID (ie. 'STN1110 r4.2.0'), or None for ELM327s """
+        return self.__stn
+
+    def last_activity(self):
+        """ returns the time.time() at which the adapter last finished an answer """
+        return self.__last_activity
+
+    def format_command(self, cmd, responses=None, timeout=None):
+        """
+            Formats an OBD command string, telling the adapter
+            how many responses to wait for, when known.
+
+            STN chips take the response count and timeout (in seconds)
+            as STPX parameters, letting the adapter return as soon as
+            the last response arrives. ELM327s only take a response
+            count, appended as a single digit.
+        """
+
+        if self.__stn is None:
+            if responses is not None:
+                cmd += str(responses).encode()
+            return cmd
+
+        if not responses and timeout is None:
+            return cmd
+
+        # ie. STPX d:010C, r:1, t:100
+        stpx = b"STPX d:" + cmd
+        if responses:
+            stpx += b", r:" + str(responses).encode()
+        if timeout is not None:
+            stpx += b", t:" + str(max(1, int(timeout * 1000))).encode()
+        return stpx
+
+    def can_addressing(self, tx_ids=None):
+        """
+            Returns the (header, CAN IDs to receive) pair for reaching
+            the given ECUs (tx_ids) with ISO 15765-4 requests. A single
+            ECU is addressed physically, several (or None, for all of
+            them) functionally.
+
+            Returns None for the other protocols.
+        """
+
+        if self.__protocol.ELM_ID not in self._ISO_15765_4_IDS:
+            return None
+
+        if not tx_ids:
+            return (self.__protocol.functional_header(), None)
+
+        can_ids = tuple(self.__protocol.response_id(tx_id) for tx_id in sorted(tx_ids))
+        if len(tx_ids) == 1:
+            return (self.__protocol.physical_header(tx_ids[0]), can_ids)
+        return (self.__protocol.functional_header(), can_ids)
+
+    def set_can_filter(self, can_ids=None):
+        """
+            Programs the CAN receive filter of the adapter, so that the
+            frames of other CAN IDs never reach the serial line. A single
+            ID is set with AT CRA, several with the narrowest AT CF/AT CM
+            pair covering them. None restores the automatic receive
+            filter.
+
+            Returns whether the adapter accepted the filter
+        """
+
+        if self.__protocol.ELM_ID not in self._ISO_15765_4_IDS:
+            return False
+
+        digits = 3 if self.__protocol.id_bits == 11 else 8
+        full = 0x7FF if self.__protocol.id_bits == 11 else 0x1FFFFFFF
+
+        def hex_id(i):
+            return ("%0*X" % (digits, i)).encode()
+
+        if not can_ids:
+            cmds = [b"AT CRA"]
+        elif len(can_ids) == 1:
+            cmds = [b"AT CRA " + hex_id(can_ids[0])]
+        else:
+            # keep only the bits that all the IDs have in common
+            mask = full
+            for i in can_ids:
+                mask &= ~(i ^ can_ids[0])
+            cmds = [b"AT CF " + hex_id(can_ids[0] & mask), b"AT CM " + hex_id(mask)]
+
+        for cmd in cmds:
+            if not self.__isok(self.__send(cmd)):
+                logger.info("'%s' did not return 'OK'" % cmd.decode())
+                return False
+        return True
+
     def low_power(self):
         """
             Enter Low Power mode
@@ -494,6 +807,7 @@ class ELM327:
             logger.debug("Successfully entered low power mode")
             print("Successfully entered low power mode")
             self.__low_power = True
+            self.__low_power_since = time.time()
         else:
             logger.debug("Failed to enter low power mode")
             print("Failed to enter low power mode")
@@ -504,34 +818,132 @@ class ELM327:
         """
             Exit Low Power mode
 
-            Send a space to trigger the RS232 to wakeup.
+            Send a space to trigger the RS232 to wakeup, and wait (at
+            most _WAKE_TIMEOUT seconds) for the prompt, trying again
+            if it doesn't show up.
 
             This will send a space even if we aren't in low power mode as
             we want to ensure that we will be able to leave low power mode.
 
+            The ELM327 wakes up with a warm start, which restores its
+            default settings: echo, headers, linefeeds and the protocol
+            are set again (the OBD class resends the rest lazily).
+
             See the Power Control section in the ELM327 datasheet for details
             on other ways to wake up the chip.
 
-            Returns the status from the ELM327.
+            Returns the lines the adapter printed while waking up
+            (empty if it never showed its prompt)
         """
         if self.__status == OBDStatus.NOT_CONNECTED:
             logger.info("cannot exit low power when unconnected")
             print("cannot exit low power when unconnected")
             return None
 
-        lines = self.__send(b" ")
+        t = time.time()
+        raw = None
+        for attempt in range(self._WAKE_ATTEMPTS):
+            # unlike a CR, a space can't repeat the ATLP
+            try:
+                self.__port.flushInput()  # drop the prompt that followed ATLP
+                self.__port.write(b" ")
+                self.__port.flush()
+            except Exception:
+                self.__status = OBDStatus.NOT_CONNECTED
+                self.__port.close()
+                self.__port = None
+                logger.critical("Device disconnected while waking up")
+                return []
+            raw = self.__wait_prompt(self._WAKE_TIMEOUT)
+            if raw is not None:
+                break
+            logger.info("No prompt after wake up attempt %d" % (attempt + 1))
+
+        if self.__low_power_since is not None:
+            self.__low_power_time += t - self.__low_power_since
+            self.__low_power_since = None
+        self.__low_power = False
+
+        if raw is None:
+            logger.warning("Adapter didn't wake up from low power")
+            return []
+
+        lines = self.__split_lines(raw)
+        if not self.__restore_settings():
+            logger.warning("Failed to restore the settings after waking up")
+            return []
 
-        # Assume we woke up
-        logger.debug("Successfully exited low power mode")
+        self.__wake_times.append(time.time() - t)
+        logger.debug("Successfully exited low power mode (%.3f s)" % self.__wake_times[-1])
         print("Successfully exited low power mode")
-        self.__low_power = False
 
         return lines
 
-    def close(self):
+    def in_low_power(self):
+        return self.__low_power
+
+    def power_stats(self):
+        """
+            Returns the low power metrics of this connection, as a dict:
+
+            wakes                   : number of wake ups
+            wake_latency_last/mean/max : seconds from the wake character
+                                      until the settings were restored
+            low_power_time          : seconds spent in low power
+            active_time             : seconds spent awake
+            mean_current            : estimated mean supply current (mA),
+                                      from ACTIVE_CURRENT and LOW_POWER_CURRENT
+            charge                  : estimated charge drawn (mAh)
+        """
+
+        now = time.time()
+        low_power_time = self.__low_power_time
+        if self.__low_power_since is not None:
+            low_power_time += now - self.__low_power_since
+        active_time = max(0.0, now - self.__opened - low_power_time)
+
+        charge = (active_time * self.ACTIVE_CURRENT + low_power_time * self.LOW_POWER_CURRENT) / 3600.0
+        total = active_time + low_power_time
+        wakes = self.__wake_times
+
+        return {
+            "wakes": len(wakes),
+            "wake_latency_last": wakes[-1] if wakes else None,
+            "wake_latency_mean": sum(wakes) / len(wakes) if wakes else None,
+            "wake_latency_max": max(wakes) if wakes else None,
+            "low_power_time": low_power_time,
+            "active_time": active_time,
+            "mean_current": charge * 3600.0 / total if total > 0 else self.ACTIVE_CURRENT,
+            "charge": charge,
+        }
+
+    def __restore_settings(self):
+        """
+            Applies our settings again after a warm start,
+            without the delays of the initial __reset()
         """
-            Resets the device, and sets all
+
+        cmds = [b"ATE0", b"ATH1", b"ATL0"]
+        if self.__protocol.ELM_ID in self._SUPPORTED_PROTOCOLS:
+            # back to the known protocol, rather than a new search
+            cmds.append(b"ATTP" + self.__protocol.ELM_ID.encode())
+        if self.__protocol.ELM_ID == "A":
+            cmds.append(b"ATJHF0")
+
+        for cmd in cmds:
+            # the echo is still on for the ATE0
+            if not self.__isok(self.__send(cmd), expectEcho=(cmd == b"ATE0")):
+                logger.info("'%s' did not return 'OK'" % cmd.decode())
+                return False
+        return True
+
+    def close(self, reset=False):
+        """
+            Closes the port, and sets all
             attributes to unconnected states.
+
+            The adapter keeps its configuration, so that the next
+            connection can warm start. Use reset=True to send an ATZ.
         """
 
         self.__status = OBDStatus.NOT_CONNECTED
@@ -540,18 +952,19 @@ class ELM327:
         if self.__port is not None:
             logger.info("closing port")
             print("closing port")
-            try:
-                self.__port.write_timeout = 0.1
-                self.__write(b"ATZ")
-            except:
-                pass
+            if reset:
+                try:
+                    self.__port.write_timeout = 0.1
+                    self.__write(b"ATZ")
+                except:
+                    pass
             try:
                 self.__port.close()
                 self.__port = None
             except:
                 print("Port already closed.")
 
-    def send_and_parse(self, cmd):
+    def send_and_parse(self, cmd, deadline=None, cancel=None):
         """
             send() function used to service all OBDCommands
 
@@ -560,6 +973,9 @@ class ELM327:
 
             An empty command string will re-trigger the previous command
 
+            Once the deadline (a time.time() value) passes, or the cancel
+            token fires, the command is interrupted and None is returned.
+
             Returns a list of Message objects
         """
 
@@ -572,18 +988,141 @@ class ELM327:
         if self.__low_power == True:
             self.normal_power()
 
-        lines = self.__send(cmd)
+        lines = self.__send(cmd, deadline=deadline, cancel=cancel)
+        if lines is None:
+            return None  # abandoned
         messages = self.__protocol(lines)
         return messages
 
-    def __send(self, cmd, delay=None, end_marker=ELM_PROMPT):
+    def send_and_parse_many(self, cmds, deadline=None, cancel=None):
+        """
+            Sends several command strings, and parses their responses
+            (see send_and_parse()).
+
+            On STN chips the requests are pipelined: the next command
+            string is written as soon as the previous answer ends with
+            the prompt, and that answer is parsed while the adapter
+            works on the next request. ELM327s (and clones) get one
+            command at a time, like with send_and_parse().
+
+            Returns a list of (messages, seconds) tuples, in the order
+            of the commands, where seconds runs from writing a command
+            to its prompt. Commands that were abandoned at the deadline
+            (or never sent) get None messages.
+        """
+
+        results = []
+
+        if self.__stn is None:
+            for cmd in cmds:
+                if expired(deadline, cancel):
+                    break
+                t = time.time()
+                messages = self.send_and_parse(cmd, deadline, cancel)
+                results.append((messages, time.time() - t))
+                if messages is None:
+                    break
+        elif self.__status != OBDStatus.NOT_CONNECTED:
+            # Check if we are in low power
+            if self.__low_power == True:
+                self.normal_power()
+
+            lines = None  # answer of the previous command, not parsed yet
+            for cmd in cmds:
+                if self.__port is None or expired(deadline, cancel):
+                    break
+                t = time.time()
+                self.__write(cmd)
+                if lines is not None:
+                    results.append((self.__protocol(lines), elapsed))
+                lines = self.__read(deadline=deadline, cancel=cancel)
+                elapsed = time.time() - t
+                if lines is None:
+                    break  # abandoned
+            if lines is not None:
+                results.append((self.__protocol(lines), elapsed))
+
+        return results + [(None, 0.0)] * (len(cmds) - len(results))
+
+    def monitor(self, cmd, callback, running):
+        """
+            Streams the output of a monitoring command (ATMA, ATMP...)
+
+            Every non-empty line is handed to `callback` as a string,
+            for as long as `running()` returns True. Monitoring is then
+            stopped by sending a character, and the prompt is awaited
+            so that the adapter is ready for the next command.
+
+            Returns False if the monitor could not be started
+        """
+
+        if self.__status == OBDStatus.NOT_CONNECTED:
+            logger.info("cannot monitor() when unconnected")
+            return False
+
+        # Check if we are in low power
+        if self.__low_power == True:
+            self.normal_power()
+
+        self.__write(cmd)
+        if not self.__port:
+            return False
+
+        timeout = self.__port.timeout
+        self.__port.timeout = 0.1  # short reads, so that running() is polled
+        buffer = bytearray()
+
+        try:
+            while running():
+                data = self.__port.read(self.__port.in_waiting or 1)
+                if not data:
+                    continue
+
+                buffer.extend(data)
+                lines = re.split(b"[\r\n]", buffer)
+                buffer = bytearray(lines.pop())  # keep the unterminated part
+
+                for line in lines:
+                    line = line.replace(b"\x00", b"").strip()
+                    if line:
+                        callback(line.decode("utf-8", "ignore"))
+
+                # the ELM stops monitoring by itself on "BUFFER FULL"
+                if buffer.endswith(self.ELM_PROMPT):
+                    logger.warning("Monitoring stopped by the adapter")
+                    return True
+
+            # any character aborts monitoring
+            self.__port.write(b"\r")
+            self.__port.flush()
+
+            # wait (at most 1 second) for the prompt, and drop whatever
+            # was still in flight
+            buffer = bytearray()
+            end = time.time() + 1.0
+            while not buffer.endswith(self.ELM_PROMPT) and time.time() < end:
+                buffer.extend(self.__port.read(self.__port.in_waiting or 1))
+        except Exception:
+            self.__status = OBDStatus.NOT_CONNECTED
+            self.__port.close()
+            self.__port = None
+            logger.critical("Device disconnected while monitoring")
+            return False
+        finally:
+            if self.__port:
+                self.__port.timeout = timeout  # reinstate our original timeout
+
+        return True
+
+    def __send(self, cmd, delay=None, end_marker=ELM_PROMPT, deadline=None, cancel=None):
         """
             unprotected send() function
 
             will __write() the given string, no questions asked.
             returns result of __read() (a list of line strings)
             after an optional delay, until the end marker (by
-            default, the prompt) is seen
+            default, the prompt) is seen, or None if the deadline
+            or cancel token fired first
         """
         self.__write(cmd)
 
@@ -594,14 +1133,16 @@ class ELM327:
             time.sleep(delay)
             delayed += delay
 
-        r = self.__read(end_marker=end_marker)
-        while delayed < 1.0 and len(r) <= 0:
+        r = self.__read(end_marker=end_marker, deadline=deadline, cancel=cancel)
+        while r is not None and delayed < 1.0 and len(r) <= 0:
+            if expired(deadline, cancel):
+                return None
             d = 0.1
             logger.debug("no response; wait: %f seconds" % d)
             print("no response; wait: %f seconds" % d)
             time.sleep(d)
             delayed += d
-            r = self.__read(end_marker=end_marker)
+            r = self.__read(end_marker=end_marker, deadline=deadline, cancel=cancel)
         return r
 
     def __write(self, cmd):
@@ -627,47 +1168,83 @@ class ELM327:
         else:
             logger.info("cannot perform __write() when unconnected")
             print("cannot perform __write() when unconnected")
-    def __read(self, end_marker=ELM_PROMPT):
+    def __read(self, end_marker=ELM_PROMPT, deadline=None, cancel=None):
         """
             "low-level" read function
 
             accumulates characters until the end marker (by
             default, the prompt character) is seen
             returns a list of [/r/n] delimited strings
+            (None when abandoned)
+        """
+        buffer = self.__read_bytes(end_marker, deadline, cancel)
+        if buffer is None:
+            return None
+        return self.__split_lines(buffer)
+
+    def __read_bytes(self, end_marker=ELM_PROMPT, deadline=None, cancel=None):
+        """
+            reads until the end marker, and returns the raw bytes
+            (without null characters and the prompt)
+
+            With a deadline or cancel token, the port is read in short
+            slices, and the command is interrupted as soon as either
+            fires, in which case None is returned.
         """
         if not self.__port:
             logger.info("cannot perform __read() when unconnected")
             print("cannot perform __read() when unconnected")
-            return []
+            return bytearray()
 
         buffer = bytearray()
 
-        while True:
-            # retrieve as much data as possible
-            try:
-                data = self.__port.read(self.__port.in_waiting or 1)
-            except Exception:
-                self.__status = OBDStatus.NOT_CONNECTED
-                self.__port.close()
-                self.__port = None
-                logger.critical("Device disconnected while reading")
-                print("Device disconnected while reading")
-                return []
+        polled = deadline is not None or cancel is not None
+        if polled:
+            timeout = self.__port.timeout
+            self.__port.timeout = self._POLL_INTERVAL
+            last_data = time.time()
 
-            # if nothing was received
-            if not data:
-                logger.warning("Failed to read port")
-                print("Failed to read port")
-                self.__status = OBDStatus.NOT_CONNECTED
-                self.__port.close()
-                self.__port = None
-                break
-
-            buffer.extend(data)
-
-            # end on specified end-marker sequence
-            if end_marker in buffer:
-                break
+        try:
+            while True:
+                if polled and expired(deadline, cancel):
+                    self.__resync()
+                    return None
+
+                # retrieve as much data as possible
+                try:
+                    data = self.__port.read(self.__port.in_waiting or 1)
+                except Exception:
+                    self.__status = OBDStatus.NOT_CONNECTED
+                    self.__port.close()
+                    self.__port = None
+                    logger.critical("Device disconnected while reading")
+                    print("Device disconnected while reading")
+                    return bytearray()
+
+                # short reads only fail once the port timeout is reached
+                if not data and polled and (timeout is None or time.time() - last_data < timeout):
+                    continue
+
+                # if nothing was received
+                if not data:
+                    logger.warning("Failed to read port")
+                    print("Failed to read port")
+                    self.__status = OBDStatus.NOT_CONNECTED
+                    self.__port.close()
+                    self.__port = None
+                    break
+
+                buffer.extend(data)
+                if polled:
+                    last_data = time.time()
+
+                # end on specified end-marker sequence
+                if end_marker in buffer:
+                    self.__last_activity = time.time()
+                    break
+        finally:
+            if polled and self.__port:
+                self.__port.timeout = timeout  # reinstate our original timeout
 
         # log, and remove the "bytearray(   ...   )" part
         logger.debug("read: " + repr(buffer)[10:-1])
@@ -679,6 +1256,64 @@ class ELM327:
         if buffer.endswith(self.ELM_PROMPT):
             buffer = buffer[:-1]
 
+        return buffer
+
+    def __resync(self):
+        """
+            Interrupts the command in progress, and waits (at most
+            _RESYNC_TIMEOUT seconds) for the prompt, dropping whatever
+            the adapter was still sending.
+        """
+
+        logger.info("Abandoning command, waiting for the prompt")
+
+        try:
+            # any character stops the ELM. Unlike a CR, a space that
+            # arrives after the prompt is ignored (and doesn't repeat
+            # the command)
+            self.__port.write(b" ")
+            self.__port.flush()
+        except Exception:
+            self.__status = OBDStatus.NOT_CONNECTED
+            self.__port.close()
+            self.__port = None
+            logger.critical("Device disconnected while resynchronizing")
+            return
+
+        if self.__wait_prompt(self._RESYNC_TIMEOUT) is None:
+            logger.warning("No prompt after interrupting the adapter")
+
+    def __wait_prompt(self, timeout):
+        """
+            Reads until the prompt, for at most `timeout` seconds.
+            Returns the bytes read before the prompt, or None if
+            it didn't show up.
+        """
+
+        port_timeout = self.__port.timeout
+        self.__port.timeout = self._POLL_INTERVAL
+        buffer = bytearray()
+        end = time.time() + timeout
+        try:
+            while not buffer.endswith(self.ELM_PROMPT) and time.time() < end:
+                buffer.extend(self.__port.read(self.__port.in_waiting or 1))
+        except Exception:
+            self.__status = OBDStatus.NOT_CONNECTED
+            self.__port.close()
+            self.__port = None
+            logger.critical("Device disconnected while waiting for the prompt")
+            return None
+        finally:
+            if self.__port:
+                self.__port.timeout = port_timeout
+
+        logger.debug("read: " + repr(buffer)[10:-1])
+        if not buffer.endswith(self.ELM_PROMPT):
+            return None
+        self.__last_activity = time.time()
+        return re.sub(b"\x00", b"", buffer[:-1])
+
+    def __split_lines(self, buffer):
         # convert bytes into a standard string
         string = buffer.decode("utf-8", "ignore")
 
@@ -0,0 +1,368 @@
+# -*- coding: utf-8 -*-
+
+########################################################################
+#                                                                      #
+# python-OBD: A python OBD-II serial module derived from pyobd         #
+#                                                                      #
+# Copyright 2004 Donour Sizemore (donour@uchicago.edu)                 #
+# Copyright 2009 Secons Ltd. (www.obdtester.com)                       #
+# Copyright 2009 Peter J. Creath                                       #
+# Copyright 2016 Brendan Whitfield (brendan-w.com)                     #
+#                                                                      #
+########################################################################
+#                                                                      #
+# j1939.py                                                             #
+#                                                                      #
+# This file is part of python-OBD (a derivative of pyOBD)              #
+#                                                                      #
+# python-OBD is free software: you can redistribute it and/or modify   #
+# it under the terms of the GNU General Public License as published by #
+# the Free Software Foundation, either version 2 of the License, or    #
+# (at your option) any later version.                                  #
+#                                                                      #
+# python-OBD is distributed in the hope that it will be useful,        #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of       #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the        #
+# GNU General Public License for more details.                         #
+#                                                                      #
+# You should have received a copy of the GNU General Public License    #
+# along with python-OBD.  If not, see <http://www.gnu.org/licenses/>.  #
+#                                                                      #
+########################################################################
+
+
+import logging
+import threading
+
+from .OBDCommand import OBDCommand
+from .protocols import ECU, ECU_HEADER, SAE_J1939, J1939Reassembler
+from .protocols.protocol import Frame
+from .utils import isHex
+
+logger = logging.getLogger(__name__)
+
+"""
+    SAE J1939 (heavy duty CAN) support
+
+    J1939 data isn't addressed by mode/PID, but by Parameter Group
+    Numbers (PGNs). Each PGN carries several Suspect Parameters (SPNs),
+    described by their position in the payload, a resolution and an
+    offset. SPNs are declared in a table below, and compiled into
+    extractor functions when the PGN commands are built.
+
+    PGNs can either be requested (most engines only broadcast them),
+    or picked off the bus with a PGNMonitor.
+"""
+
+# J1939-71 reserves the top of every range for error/not-available
+# indicators. For parameters of 8 bits and more, anything above
+# 0xFA.. is not a valid value; for smaller ones the top 2 values
+# (ie. 10b error and 11b not available for 2 bit states).
+def not_available(raw, length):
+    if length >= 8:
+        return raw > (0xFB << (length - 8)) - 1
+    else:
+        return raw >= (1 << length) - 2
+
+
+class SPN:
+    """
+        Declarative definition of a Suspect Parameter Number
+
+        start_bit is counted from the first bit of the PGN payload
+        (byte 1, bit 1 in J1939 notation is start_bit 0). Multi-byte
+        values are little endian.
+    """
+
+    def __init__(self, spn, name, pgn, start_bit, length, resolution=1, offset=0, unit=None, decoder=None):
+        self.spn = spn
+        self.name = name
+        self.pgn = pgn
+        self.start_bit = start_bit
+        self.length = length
+        self.resolution = resolution
+        self.offset = offset
+        self.unit = unit
+        self.decoder = decoder  # replaces the linear scaling (ASCII, DM1, etc...)
+
+    def compile(self):
+        """ returns a function extracting the (scaled) value from a payload """
+
+        if self.decoder is not None:
+            return self.decoder
+
+        first = self.start_bit // 8
+        last = (self.start_bit + self.length - 1) // 8 + 1
+        shift = self.start_bit % 8
+        mask = (1 << self.length) - 1
+        length = self.length
+        resolution = self.resolution
+        offset = self.offset
+
+        def extract(data):
+            if len(data) < last:
+                return None
+            raw = (int.from_bytes(data[first:last], "little") >> shift) & mask
+            if not_available(raw, length):
+                return None
+            return raw * resolution + offset
+
+        if self.unit is None:
+            return extract
+
+        from .UnitsAndScaling import Unit  # local import, the registry is only needed for units
+        unit = self.unit
+
+        def extract_with_unit(data):
+            v = extract(data)
+            return None if v is None else Unit.Quantity(v, unit)
+
+        return extract_with_unit
+
+
+def decode_ascii(data):
+    """ J1939 strings are '*' delimited """
+    return bytes(data).split(b"*")[0].strip(b"\x00 ").decode("ascii", "replace")
+
+
+def decode_dm1(data):
+    """
+        Decodes the active DTCs of a DM1 message
+
+        Returns a list of (SPN, FMI, occurrence count) tuples
+    """
+
+    # the first 2 bytes are the lamp status
+    dtcs = []
+    for i in range(2, len(data) - 3, 4):
+        spn = data[i] | (data[i + 1] << 8) | ((data[i + 2] & 0xE0) << 11)
+        fmi = data[i + 2] & 0x1F
+        oc = data[i + 3] & 0x7F
+        if spn == 0 and fmi == 0:
+            continue  # "no active DTC" placeholder
+        dtcs.append((spn, fmi, oc))
+    return dtcs
+
+
+# J1939-71 parameters. Most of these are broadcast by the engine controller.
+__spns__ = [
+#       SPN   name                       PGN    start len  resolution  offset  unit
+    SPN(513,  "ACTUAL_ENGINE_TORQUE",    61444, 16,   8,   1,          -125,   "percent"),
+    SPN(190,  "ENGINE_SPEED",            61444, 24,   16,  0.125,      0,      "rpm"),
+    SPN(91,   "ACCELERATOR_PEDAL",       61443, 8,    8,   0.4,        0,      "percent"),
+    SPN(92,   "ENGINE_LOAD",             61443, 16,   8,   1,          0,      "percent"),
+    SPN(110,  "COOLANT_TEMP",            65262, 0,    8,   1,          -40,    "celsius"),
+    SPN(174,  "FUEL_TEMP",               65262, 8,    8,   1,          -40,    "celsius"),
+    SPN(175,  "OIL_TEMP",                65262, 16,   16,  0.03125,    -273,   "celsius"),
+    SPN(94,   "FUEL_DELIVERY_PRESSURE",  65263, 0,    8,   4,          0,      "kilopascal"),
+    SPN(100,  "OIL_PRESSURE",            65263, 24,   8,   4,          0,      "kilopascal"),
+    SPN(111,  "COOLANT_LEVEL",           65263, 56,   8,   0.4,        0,      "percent"),
+    SPN(84,   "SPEED",                   65265, 8,    16,  1 / 256.0,  0,      "kph"),
+    SPN(183,  "FUEL_RATE",               65266, 0,    16,  0.05,       0,      "liter / hour"),
+    SPN(108,  "BAROMETRIC_PRESSURE",     65269, 0,    8,   0.5,        0,      "kilopascal"),
+    SPN(171,  "AMBIANT_AIR_TEMP",        65269, 24,   16,  0.03125,    -273,   "celsius"),
+    SPN(102,  "BOOST_PRESSURE",          65270, 8,    8,   2,          0,      "kilopascal"),
+    SPN(105,  "INTAKE_MANIFOLD_TEMP",    65270, 16,   8,   1,          -40,    "celsius"),
+    SPN(168,  "BATTERY_VOLTAGE",         65271, 32,   16,  0.05,       0,      "volt"),
+    SPN(96,   "FUEL_LEVEL",              65276, 8,    8,   0.4,        0,      "percent"),
+    SPN(247,  "ENGINE_HOURS",            65253, 0,    32,  0.05,       0,      "hour"),
+    SPN(250,  "TOTAL_FUEL_USED",         65257, 32,   32,  0.5,        0,      "liter"),
+    SPN(245,  "TOTAL_DISTANCE",          65248, 32,   32,  0.125,      0,      "kilometer"),
+    SPN(237,  "VIN",                     65260, 0,    0,   decoder=decode_ascii),
+    SPN(1214, "ACTIVE_DTCS",             65226, 0,    0,   decoder=decode_dm1),
+]
+
+# names of the parameter groups above
+__pgns__ = {
+    61443: ("EEC2", "Electronic Engine Controller 2"),
+    61444: ("EEC1", "Electronic Engine Controller 1"),
+    65226: ("DM1", "Active Diagnostic Trouble Codes"),
+    65248: ("VD", "Vehicle Distance"),
+    65253: ("HOURS", "Engine Hours, Revolutions"),
+    65257: ("LFC", "Fuel Consumption (Liquid)"),
+    65260: ("VI", "Vehicle Identification"),
+    65262: ("ET1", "Engine Temperature 1"),
+    65263: ("EFL_P1", "Engine Fluid Level/Pressure 1"),
+    65265: ("CCVS", "Cruise Control/Vehicle Speed"),
+    65266: ("LFE", "Fuel Economy (Liquid)"),
+    65269: ("AMB", "Ambient Conditions"),
+    65270: ("IC1", "Inlet/Exhaust Conditions 1"),
+    65271: ("VEP1", "Vehicle Electrical Power 1"),
+    65276: ("DD", "Dash Display"),
+}
+
+
+class PGNCommand(OBDCommand):
+    """
+        An OBDCommand requesting a J1939 Parameter Group.
+
+        The decoded value is a dict of {SPN name: value}, where
+        unavailable parameters are None.
+    """
+
+    def __init__(self, name, desc, pgn, spns):
+        self.pgn = pgn
+        self.spns = spns
+        self.extractors = [(s.name, s.compile()) for s in spns]
+        # the PGN, in the ELM's J1939 data format (AT JE)
+        command = ("%06X" % pgn).encode()
+        # the ELM addresses J1939 requests on its own, the
+        # default header prevents any AT SH from being sent
+        OBDCommand.__init__(self, name, desc, command, 0, self.__decode, ECU.ALL, False, ECU_HEADER.ENGINE)
+
+    def clone(self, **overrides):
+        args = {
+            "name": self.name,
+            "desc": self.desc,
+            "pgn": self.pgn,
+            "spns": self.spns,
+        }
+        args.update(overrides)
+        return PGNCommand(**args)
+
+    def decode_payload(self, data):
+        """ extracts every SPN of this group from a raw payload """
+        return {name: extract(data) for name, extract in self.extractors}
+
+    def __decode(self, messages):
+        for m in messages:
+            if m.pgn == self.pgn:
+                return self.decode_payload(m.data)
+        return None
+
+    def __repr__(self):
+        return "PGNCommand(%s, %s, %d)" % (repr(self.name), repr(self.desc), self.pgn)
+
+
+class PGNs():
+    """
+        Table of PGNCommands, accessible by name or PGN:
+
+            obd.pgns.EEC1
+            obd.pgns["EEC1"]
+            obd.pgns[61444]
+    """
+
+    def __init__(self):
+        self.__by_name = {}
+        self.__by_pgn = {}
+
+        spns_by_pgn = {}
+        for s in __spns__:
+            spns_by_pgn.setdefault(s.pgn, []).append(s)
+
+        for pgn, spns in spns_by_pgn.items():
+            name, desc = __pgns__.get(pgn, ("PGN_%d" % pgn, "PGN %d" % pgn))
+            self.add(PGNCommand(name, desc, pgn, spns))
+
+    def add(self, cmd):
+        """ registers a (custom) PGNCommand """
+        self.__by_name[cmd.name] = cmd
+        self.__by_pgn[cmd.pgn] = cmd
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self.__by_pgn[key]
+        return self.__by_name[key]
+
+    def __getattr__(self, name):
+        # only called for names that aren't regular attributes
+        if not name.isupper():
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __contains__(self, key):
+        return key in self.__by_name or key in self.__by_pgn
+
+    def __iter__(self):
+        return iter(list(self.__by_name.values()))
+
+    def __len__(self):
+        return len(self.__by_name)
+
+
+# export this object
+pgns = PGNs()
+
+
+class PGNMonitor:
+    """
+        Listens to broadcast PGNs without requesting them.
+
+        A single PGN is monitored by the adapter itself (AT MP),
+        otherwise all traffic is monitored (AT MA) and filtered
+        here. Multi-packet (BAM) groups are reassembled.
+
+            monitor = obd.PGNMonitor(connection, [obd.pgns.EEC1, obd.pgns.ET1])
+            monitor.start(callback)  # callback(PGNCommand, source address, values)
+            ...
+            monitor.stop()
+    """
+
+    def __init__(self, connection, cmds):
+        self.__connection = connection
+        self.__cmds = {c.pgn: c for c in cmds}
+        self.__parser = SAE_J1939([])
+        self.__reassembler = J1939Reassembler()
+        self.__running = False
+        self.__thread = None
+        self.__callback = None
+
+    def start(self, callback):
+        """ starts monitoring in a background thread """
+        if self.__thread is not None:
+            return
+        if self.__connection.protocol_id() != "A":
+            logger.warning("PGN monitoring is only supported over SAE J1939")
+            return
+
+        self.__callback = callback
+        self.__running = True
+        self.__thread = threading.Thread(target=self.run)
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def stop(self):
+        """ stops monitoring, and waits for the adapter to return to its prompt """
+        if self.__thread is not None:
+            self.__running = False
+            self.__thread.join()
+            self.__thread = None
+
+    @property
+    def running(self):
+        return self.__thread is not None
+
+    def run(self):
+        if len(self.__cmds) == 1:
+            cmd = b"ATMP" + ("%04X" % list(self.__cmds)[0]).encode()
+        else:
+            cmd = b"ATMA"
+
+        self.__connection.interface.monitor(cmd, self.feed, lambda: self.__running)
+
+    def feed(self, line):
+        """ parses a single monitored line, calling back for the watched PGNs """
+
+        raw = line.replace(" ", "")
+        if not isHex(raw):
+            return  # "BUFFER FULL", "CAN ERROR", etc...
+
+        frame = Frame(raw)
+        if not self.__parser.parse_frame(frame):
+            return
+
+        if J1939Reassembler.is_transport(frame):
+            payload = self.__reassembler.feed(frame)
+            if payload is None:
+                return
+            pgn, data = payload
+        else:
+            pgn, data = frame.pgn, frame.data
+
+        cmd = self.__cmds.get(pgn)
+        if cmd is not None:
+            self.__callback(cmd, frame.tx_id, cmd.decode_payload(data))
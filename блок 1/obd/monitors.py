@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+########################################################################
+#                                                                      #
+# python-OBD: A python OBD-II serial module derived from pyobd         #
+#                                                                      #
+# Copyright 2004 Donour Sizemore (donour@uchicago.edu)                 #
+# Copyright 2009 Secons Ltd. (www.obdtester.com)                       #
+# Copyright 2009 Peter J. Creath                                       #
+# Copyright 2016 Brendan Whitfield (brendan-w.com)                     #
+#                                                                      #
+########################################################################
+#                                                                      #
+# monitors.py                                                         #
+#                                                                      #
+# This file is part of python-OBD (a derivative of pyOBD)              #
+#                                                                      #
+# python-OBD is free software: you can redistribute it and/or modify   #
+# it under the terms of the GNU General Public License as published by #
+# the Free Software Foundation, either version 2 of the License, or    #
+# (at your option) any later version.                                  #
+#                                                                      #
+# python-OBD is distributed in the hope that it will be useful,        #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of       #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the        #
+# GNU General Public License for more details.                         #
+#                                                                      #
+# You should have received a copy of the GNU General Public License    #
+# along with python-OBD.  If not, see <http://www.gnu.org/licenses/>.  #
+#                                                                      #
+########################################################################
+
+
+import logging
+
+from .OBDCommand import OBDCommand
+from .OBDResponse import OBDResponse, Monitor
+from .protocols import ECU
+
+logger = logging.getLogger(__name__)
+
+"""
+    Mode 06 monitor sweeps
+
+    Reads the test results of several MIDs (Monitor IDs) with as few
+    requests as possible. Each 9 byte test result block starts with
+    its MID, which lets one response be split back into a Monitor
+    per MID.
+"""
+
+# the ELM can only send single frame requests, which leaves
+# room for 6 MIDs (7 data bytes - 1 mode byte) per request
+MAX_MIDS_PER_REQUEST = 6
+
+
+def split_response(data, mids):
+    """
+        Splits the data of a mode 06 response (including the mode
+        byte) into a dict of {mid: test result blocks}, for the
+        requested MIDs.
+    """
+
+    blocks = {}
+    for n in range(1, len(data) - 8, 9):
+        mid = data[n]
+        if mid in mids:
+            blocks.setdefault(mid, []).append(n)
+
+    # a MID's blocks are normally contiguous, and then sliced as a
+    # single view. Interleaved ones have to be copied together.
+    values = {}
+    for mid, starts in blocks.items():
+        if starts[-1] - starts[0] == 9 * (len(starts) - 1):
+            values[mid] = data[starts[0]:starts[-1] + 9]
+        else:
+            values[mid] = memoryview(b"".join([data[n:n + 9] for n in starts]))
+    return values
+
+
+class BatchMonitorCommand(OBDCommand):
+    """
+        Reads several MIDs in a single mode 06 request.
+
+        The decoded value is a dict of {mid: test result blocks}
+    """
+
+    def __init__(self, monitors):
+        self.monitors = monitors
+        command = b"06" + b"".join([b"%02X" % m.pid for m in monitors])
+        OBDCommand.__init__(self, "MID_BATCH", "Read %d MIDs" % len(monitors), command,
+                            0, self.__decode, ECU.ALL, False, monitors[0].header)
+
+    def __decode(self, messages):
+        return split_response(messages[0].data, set([m.pid for m in self.monitors]))
+
+    def responses(self, response):
+        """
+            Splits the response to this command into an OBDResponse per
+            MID. Returns None unless every requested MID answered.
+        """
+        if response.value is None or len(response.value) != len(self.monitors):
+            return None
+
+        responses = {}
+        for m in self.monitors:
+            r = OBDResponse(m, response.messages)
+            r.value = Monitor(response.value[m.pid])
+            r.time = response.time
+            responses[m] = r
+        return responses
+
+
+def batches(monitors, limits=None):
+    """
+        Groups MID commands into requests sharing the same header, with
+        at most limits[header] MIDs each (MAX_MIDS_PER_REQUEST by default).
+        The limits are read before each request, so that they can be
+        lowered while iterating.
+    """
+
+    limits = {} if limits is None else limits
+    by_header = {}
+    for m in monitors:
+        by_header.setdefault(m.header, []).append(m)
+
+    for header, header_monitors in by_header.items():
+        header_monitors = sorted(header_monitors, key=lambda m: m.pid)
+        while header_monitors:
+            size = limits.get(header, MAX_MIDS_PER_REQUEST)
+            yield header_monitors[:size]
+            header_monitors = header_monitors[size:]
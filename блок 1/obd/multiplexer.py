@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+
+########################################################################
+#                                                                      #
+# python-OBD: A python OBD-II serial module derived from pyobd         #
+#                                                                      #
+# Copyright 2004 Donour Sizemore (donour@uchicago.edu)                 #
+# Copyright 2009 Secons Ltd. (www.obdtester.com)                       #
+# Copyright 2009 Peter J. Creath                                       #
+# Copyright 2016 Brendan Whitfield (brendan-w.com)                     #
+#                                                                      #
+########################################################################
+#                                                                      #
+# multiplexer.py                                                       #
+#                                                                      #
+# This file is part of python-OBD (a derivative of pyOBD)              #
+#                                                                      #
+# python-OBD is free software: you can redistribute it and/or modify   #
+# it under the terms of the GNU General Public License as published by #
+# the Free Software Foundation, either version 2 of the License, or    #
+# (at your option) any later version.                                  #
+#                                                                      #
+# python-OBD is distributed in the hope that it will be useful,        #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of       #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the        #
+# GNU General Public License for more details.                         #
+#                                                                      #
+# You should have received a copy of the GNU General Public License    #
+# along with python-OBD.  If not, see <http://www.gnu.org/licenses/>.  #
+#                                                                      #
+########################################################################
+
+
+import logging
+import threading
+from collections import deque
+
+from .OBDResponse import OBDResponse, TimeoutResponse
+from .cancel import CancelToken, expired, latest, remaining
+
+logger = logging.getLogger(__name__)
+
+
+class Request:
+    """ a queued (or in-flight) call, shared by every client waiting on it """
+
+    def __init__(self, func, args, key=None, deadline=None, bounded=False):
+        self.func = func
+        self.args = args
+        self.key = key  # requests with equal keys are coalesced (None = never)
+        self.bounded = bounded  # whether func takes deadline and cancel arguments
+        self.deadline = deadline  # the latest deadline of the waiters
+        self.cancel = CancelToken()  # fired once every waiter gave up
+        self.sent = False  # in flight, with its deadline fixed
+        self.result = None
+        self.event = threading.Event()
+        self.waiters = 1
+
+
+class Multiplexer:
+    """
+        Shares one OBD connection among many threads.
+
+        Every request goes through a single queue, and is sent to the
+        adapter by one worker thread, so that the OBD object (and its
+        ELM327) is never used concurrently.
+
+        Identical queries that are queued or in flight at the same time
+        are coalesced: two clients asking for RPM in the same window
+        cause a single bus exchange, and both get the response.
+
+        With fair=True, each client has its own queue, and the worker
+        takes turns between them (weighted by `weights`, a dict of
+        {client: requests per turn}). With fair=False, requests are
+        served in arrival order.
+
+            mux = obd.Multiplexer(obd.OBD())
+            logger = mux.client("logger")
+            r = logger.query(obd.commands.RPM)
+
+        Queries take a deadline and cancel token (see OBD.query()),
+        covering the time spent in the queue. A client giving up gets a
+        TimeoutResponse; the exchange itself is only abandoned once every
+        client waiting on it gave up, or at the latest of their
+        deadlines. A query is only coalesced into one that is already
+        on the wire if it was sent with a later deadline.
+    """
+
+    def __init__(self, connection, fair=True, weights=None):
+        self.connection = connection
+        self.fair = fair
+        self.weights = {} if weights is None else dict(weights)
+        self.__cond = threading.Condition()
+        self.__queues = {}  # key = client, value = deque of Requests
+        self.__turns = deque()  # clients with queued requests, in serving order
+        self.__credit = 0  # requests left in the current client's turn
+        self.__pending = {}  # key = Request.key, value = queued or in-flight Request
+        self.__current = None  # the in-flight Request
+        self.__running = False
+        self.__thread = None
+        self.coalesced = 0  # number of requests answered by another client's exchange
+
+    @property
+    def running(self):
+        return self.__running
+
+    def start(self):
+        """ starts the worker thread """
+        if self.__thread is None:
+            self.__running = True
+            self.__thread = threading.Thread(target=self.run)
+            self.__thread.daemon = True
+            self.__thread.start()
+
+    def stop(self):
+        """
+            Stops the worker thread. Requests that weren't sent
+            yet are answered with empty responses.
+        """
+        if self.__thread is None:
+            return
+
+        with self.__cond:
+            self.__running = False
+            if self.__current is not None:
+                self.__current.cancel.cancel()  # abandon the in-flight query
+            self.__cond.notify_all()
+        self.__thread.join()
+        self.__thread = None
+
+        with self.__cond:
+            for q in self.__queues.values():
+                for request in q:
+                    self.__finish(request, OBDResponse())
+            self.__queues.clear()
+            self.__turns.clear()
+            self.__pending.clear()
+
+    def close(self):
+        """ stops the worker, and closes the shared connection """
+        self.stop()
+        self.connection.close()
+
+    def client(self, name):
+        """ returns a handle submitting requests under the given client name """
+        return MultiplexerClient(self, name)
+
+    def query(self, cmd, force=False, client=None, deadline=None, cancel=None):
+        """
+            Queues a query, and blocks until its response is available.
+            Same arguments and return value as OBD.query()
+        """
+        request = self.submit(self.connection.query, (cmd, force), (cmd, force), client,
+                              deadline, bounded=True, wait=False)
+        if not self.__wait(request, deadline, cancel):
+            return TimeoutResponse(cmd, cancel is not None and cancel.cancelled)
+        return request.result
+
+    def call(self, func, *args, **kwargs):
+        """
+            Runs any other OBD method (ie. mux.call(connection.read_dids, dids))
+            on the worker thread. These are never coalesced.
+        """
+        client = kwargs.pop("client", None)
+        return self.submit(func, args, None, client)
+
+    def submit(self, func, args, key=None, client=None, deadline=None, bounded=False, wait=True):
+        if not self.__running:
+            self.start()
+
+        with self.__cond:
+            request = self.__pending.get(key) if key is not None else None
+            if request is not None and request.sent and \
+               latest(request.deadline, deadline) != request.deadline:
+                request = None  # it would be abandoned too early, queue another one
+            if request is not None:
+                request.waiters += 1
+                if not request.sent:
+                    request.deadline = latest(request.deadline, deadline)
+                self.coalesced += 1
+            else:
+                request = Request(func, args, key, deadline, bounded)
+                if key is not None:
+                    self.__pending[key] = request
+                self.__enqueue(request, client if self.fair else None)
+                self.__cond.notify()
+
+        if not wait:
+            return request
+
+        request.event.wait()
+        return request.result
+
+    def __wait(self, request, deadline, cancel):
+        """
+            Waits for a request until the deadline or cancel token fires.
+            Returns False if this waiter gave up.
+        """
+
+        if deadline is None and cancel is None:
+            request.event.wait()
+            return True
+
+        # tokens can't be waited on together with the request, poll them
+        while not request.event.wait(0.05 if deadline is None else min(0.05, remaining(deadline))):
+            if not expired(deadline, cancel):
+                continue
+            with self.__cond:
+                if request.event.is_set():
+                    return True  # answered in the meantime
+                request.waiters -= 1
+                if request.waiters == 0:
+                    # nobody wants it anymore: skipped if still queued, abandoned if in flight
+                    request.cancel.cancel()
+                    if self.__pending.get(request.key) is request:
+                        del self.__pending[request.key]
+            return False
+
+        return True
+
+    def __enqueue(self, request, client):
+        q = self.__queues.get(client)
+        if q is None:
+            q = self.__queues[client] = deque()
+        if not q:
+            self.__turns.append(client)
+        q.append(request)
+
+    def __dequeue(self):
+        """ takes the next request, taking turns between clients """
+        client = self.__turns[0]
+        q = self.__queues[client]
+
+        if self.__credit <= 0:
+            self.__credit = self.weights.get(client, 1)
+
+        request = q.popleft()
+        self.__credit -= 1
+
+        # end of this client's turn
+        if not q or self.__credit <= 0:
+            self.__turns.popleft()
+            self.__credit = 0
+            if q:
+                self.__turns.append(client)
+            else:
+                del self.__queues[client]
+
+        return request
+
+    def __finish(self, request, result):
+        if request.key is not None and self.__pending.get(request.key) is request:
+            del self.__pending[request.key]
+        request.result = result
+        request.event.set()
+
+    def run(self):
+        """ Daemon thread """
+        while True:
+            with self.__cond:
+                while self.__running and not self.__turns:
+                    self.__cond.wait()
+                if not self.__running:
+                    break
+                request = self.__dequeue()
+                if request.cancel.cancelled:
+                    continue  # every waiter gave up while it was queued
+                self.__current = request
+                request.sent = True
+                deadline = request.deadline
+
+            # the request stays in __pending while in flight,
+            # so identical queries keep coalescing into it
+            try:
+                if request.bounded:
+                    result = request.func(*request.args, deadline=deadline, cancel=request.cancel)
+                else:
+                    result = request.func(*request.args)
+            except Exception as e:
+                logger.exception("Multiplexed request failed: %s" % e)
+                result = OBDResponse() if request.key is not None else None
+
+            with self.__cond:
+                self.__current = None
+                self.__finish(request, result)
+
+
+class MultiplexerClient:
+    """ a named handle on a Multiplexer, with the query API of OBD """
+
+    def __init__(self, multiplexer, name):
+        self.multiplexer = multiplexer
+        self.name = name
+
+    def query(self, cmd, force=False, deadline=None, cancel=None):
+        return self.multiplexer.query(cmd, force, self.name, deadline, cancel)
+
+    def call(self, func, *args):
+        return self.multiplexer.call(func, *args, client=self.name)
+
+    def supports(self, cmd):
+        return self.multiplexer.connection.supports(cmd)
+
+    def is_connected(self):
+        return self.multiplexer.connection.is_connected()
+
+    def status(self):
+        return self.multiplexer.connection.status()
@@ -32,13 +32,17 @@
 
 
 import logging
+import time
 
-from .OBDResponse import OBDResponse
+from . import agent, dtc_index, j1939, monitors, uds
+from .OBDResponse import OBDResponse, DTCReport, TimeoutResponse
 from .__version__ import __version__
+from .cancel import expired
 from .commands import commands
 from .elm327 import ELM327
-from .protocols import ECU_HEADER
-from .utils import scan_serial, OBDStatus
+from .protocols import ECU, ECU_HEADER
+from .timeouts import TimeoutLearner, elm_timeout
+from .utils import scan_serial, probe_serial, forget_port, OBDStatus
 
 logger = logging.getLogger(__name__)
 
@@ -49,54 +53,85 @@ class OBD(object):
         with it's assorted commands/sensors.
     """
 
+    def __new__(cls, portstr=None, *args, **kwargs):
+        # "obd+unix://" ports connect to a local agent sharing its adapter
+        if isinstance(portstr, str) and portstr.startswith(agent.URL_SCHEME):
+            return agent.AgentOBD(portstr)
+        return super(OBD, cls).__new__(cls)
+
     def __init__(self, portstr=None, baudrate=None, protocol=None, fast=True,
-                 timeout=0.1, check_voltage=True, start_low_power=False):
+                 timeout=0.1, check_voltage=True, start_low_power=False,
+                 adaptive_timeout=False, can_filter=False, baud_history=None):
         self.interface = None
         self.supported_commands = set(commands.base_commands())
         self.fast = fast  # global switch for disabling optimizations
         self.timeout = timeout
+        self.adaptive_timeout = adaptive_timeout  # set AT ST (or STPX t:) from learned response times
+        self.can_filter = can_filter  # address/filter OBD requests to the ECUs each command needs (CAN only)
+        self.response_times = TimeoutLearner()  # can be persisted with table() / load()
+        self.__last_timeout = elm_timeout(None)  # the current AT ST value
         self.__last_command = b""  # used for running the previous command with a CR
         self.__last_header = ECU_HEADER.ENGINE  # for comparing with the previously used header
-        self.__frame_counts = {}  # keeps track of the number of return frames for each command
+        self.__last_filter = False  # CAN IDs of the adapter's receive filter (None = automatic, False = unknown)
+        self.__header_sent = False  # until the first AT SH, the adapter uses its default (functional) header
+        self.__ecus = 0  # ECUs always addressed along with the command's own (see use_ecus())
+        self.__frame_counts = {}  # keeps track of the number of return frames for each command and addressing
+        self.__did_limits = {}  # max number of DIDs per 0x22 request, for headers that can't take the default
+        self.__mid_limits = {}  # max number of MIDs per mode 06 request, for headers that can't take the default
+        self.__monitors = None  # supported mode 06 test result commands, from the MIDS_* support map
+        self.__cache = {}  # key = OBDCommand, value = last OBDResponse (for commands with a TTL)
+        self.__ttls = {}  # key = OBDCommand, value = TTL overriding the command's default
+        self.cache_hits = 0
+        self.cache_misses = 0
 
         logger.info("======================= python-OBD (v%s) =======================" % __version__)
         self.__connect(portstr, baudrate, protocol,
-                       check_voltage, start_low_power)  # initialize by connecting and loading sensors
+                       check_voltage, start_low_power, baud_history)  # initialize by connecting and loading sensors
         self.__load_commands()  # try to load the car's supported commands
         logger.info("===================================================================")
 
     def __connect(self, portstr, baudrate, protocol, check_voltage,
-                  start_low_power):
+                  start_low_power, baud_history=None):
         """
             Attempts to instantiate an ELM327 connection object.
         """
 
         if portstr is None:
-            logger.info("Using scan_serial to select port")
-            port_names = scan_serial()
-            logger.info("Available ports: " + str(port_names))
-
-            if not port_names:
+            logger.info("Using probe_serial to select port")
+            port_bauds = probe_serial(bauds=None if baudrate is None else [baudrate],
+                                      wake=start_low_power)
+            logger.info("Available ports: " + str(list(port_bauds)))
+
+            if not port_bauds:
+                # the probe only tries the common baud rates, the others
+                # are found by the full auto-baud sweep of the ELM327 class
+                logger.info("No port answered the probe, trying every port that opens")
+                port_bauds = dict.fromkeys(scan_serial(), baudrate)
+
+            if not port_bauds:
                 logger.warning("No OBD-II adapters found")
                 return
 
-            for port in port_names:
+            for port, probed_baudrate in port_bauds.items():
                 logger.info("Attempting to use port: " + str(port))
                 print("Attempting to use port: " + str(port))
-                self.interface = ELM327(port, baudrate, protocol,
+                # the probe already found the ELM's baud rate (None runs the sweep)
+                self.interface = ELM327(port, baudrate or probed_baudrate, protocol,
                                         self.timeout, check_voltage,
-                                        start_low_power)
+                                        start_low_power, baud_history=baud_history)
 
                 print(self.interface.status())
                 if self.interface.status() == OBDStatus.CAR_CONNECTED:
                     break # success! stop searching for serial
                 else:
+                    if self.interface.status() == OBDStatus.NOT_CONNECTED:
+                        forget_port(port)  # not an ELM after all, probe again next time
                     continue # try other ports
         else:
             logger.info("Explicit port defined")
             self.interface = ELM327(portstr, baudrate, protocol,
                                     self.timeout, check_voltage,
-                                    start_low_power)
+                                    start_low_power, baud_history=baud_history)
 
         # if the connection failed, close it
         if self.interface.status() != OBDStatus.CAR_CONNECTED:
@@ -145,6 +180,53 @@ class OBD(object):
 
         logger.info("finished querying with %d commands supported" % len(self.supported_commands))
 
+    def use_ecus(self, ecus=0):
+        """
+            With can_filter, addresses the given ECUs (ECU flags) along
+            with the ones each command needs. Async uses the union of
+            its watched commands, so that the filter isn't reprogrammed
+            between them.
+        """
+        if ecus != self.__ecus:
+            self.__ecus = ecus
+            self.__frame_counts = {}  # other ECUs may answer now
+
+    def __addressing(self, cmd, all_ecus=False):
+        """
+            Returns the (header, CAN IDs to receive, filtered) of a
+            command. With can_filter, OBD requests (modes 01-0A) go to,
+            and are only received from, the ECUs that the command needs:
+            physically addressed if that's a single ECU.
+        """
+
+        if self.can_filter and cmd.header == ECU_HEADER.ENGINE and \
+           cmd.mode is not None and cmd.mode <= 0x0A:
+            ecu_map = self.interface.ecu_map()
+            ecus = ECU.ALL if all_ecus else (cmd.ecu | self.__ecus)
+            tx_ids = [tx_id for tx_id, ecu in ecu_map.items() if ecu & ecus]
+            if len(tx_ids) == len(ecu_map):
+                tx_ids = None  # everyone is needed, no filtering
+            addressing = self.interface.can_addressing(tx_ids)
+            if addressing is not None:
+                return addressing + (True,)
+
+        return (cmd.header, None, False)
+
+    def __set_addressing(self, cmd, all_ecus=False, addressing=None):
+        """ sets the header and CAN filter of a command (see __addressing()) """
+
+        header, can_ids, filtered = addressing or self.__addressing(cmd, all_ecus)
+        if filtered and not self.__header_sent:
+            self.__last_header = None  # the default header isn't ECU_HEADER.ENGINE
+
+        self.__set_header(header)
+
+        # the filter a previous session left behind is cleared by the first query
+        if can_ids != self.__last_filter and self.interface.can_addressing() is not None:
+            if self.interface.set_can_filter(can_ids):
+                self.__last_filter = can_ids
+            self.__last_command = b""  # a bare CR would now repeat an AT command
+
     def __set_header(self, header):
         if header == self.__last_header:
             return
@@ -156,6 +238,19 @@ class OBD(object):
             logger.info("Set Header ('AT SH %s') did not return 'OK'", header)
             return OBDResponse()
         self.__last_header = header
+        self.__header_sent = True
+        self.__last_command = b""  # a bare CR would now repeat the AT SH
+
+    def __set_timeout(self, timeout):
+        arg = elm_timeout(timeout)
+        if arg == self.__last_timeout:
+            return
+        r = self.interface.send_and_parse(b'AT ST ' + arg)
+        if not r or "\n".join([m.raw() for m in r]) != "OK":
+            logger.info("Set Timeout ('AT ST %s') did not return 'OK'", arg)
+            return
+        self.__last_timeout = arg
+        self.__last_command = b""  # a bare CR would now repeat the AT ST
 
     def close(self):
         """
@@ -163,13 +258,34 @@ class OBD(object):
         """
 
         self.supported_commands = set()
+        self.__monitors = None
+        self.__cache = {}
 
         if self.interface is not None:
             logger.info("Closing connection")
-            self.__set_header(ECU_HEADER.ENGINE)
+            self.__restore_addressing()
             self.interface.close()
             self.interface = None
 
+    def __restore_addressing(self):
+        """
+            Leaves the adapter with the functional header and the
+            automatic receive filter on CAN, so that the next session
+            (or another tool) reaches every ECU
+        """
+        if self.status() != OBDStatus.CAR_CONNECTED or self.interface.in_low_power():
+            return  # nothing to restore, or waking up restores the defaults anyway
+
+        addressing = self.interface.can_addressing()
+        if addressing is None:
+            self.__set_header(ECU_HEADER.ENGINE)
+            return
+
+        if self.__header_sent:
+            self.__set_header(addressing[0])
+        if self.__last_filter is not None:
+            self.interface.set_can_filter(None)
+
     def status(self):
         """ returns the OBD connection status """
         if self.interface is None:
@@ -189,7 +305,40 @@ class OBD(object):
         if self.interface is None:
             return OBDStatus.NOT_CONNECTED
         else:
-            return self.interface.normal_power()
+            lines = self.interface.normal_power()
+            # waking up is a warm start, the adapter is back to its defaults
+            self.__last_timeout = elm_timeout(None)
+            self.__last_command = b""
+            self.__last_header = ECU_HEADER.ENGINE
+            self.__last_filter = None
+            self.__header_sent = False
+            return lines
+
+    def ping(self, deadline=None):
+        """
+            Reads the adapter's voltage (AT RV), always from the adapter:
+            unlike query(ELM_VOLTAGE), this bypasses the response cache
+            (see Supervisor). Returns an OBDResponse, null when the
+            adapter didn't answer before the deadline.
+        """
+        if self.interface is None:
+            return OBDResponse()
+        messages = self.interface.send_and_parse(b"AT RV", deadline=deadline)
+        self.__last_command = b""  # a bare CR would now repeat the AT RV
+        if not messages:
+            return OBDResponse()
+        return commands.ELM_VOLTAGE(messages)
+
+    def in_low_power(self):
+        """ returns whether the adapter was put in low power mode """
+        return self.interface is not None and self.interface.in_low_power()
+
+    def power_stats(self):
+        """ returns the low power metrics of the adapter (see ELM327.power_stats()) """
+        if self.interface is None:
+            return {}
+        else:
+            return self.interface.power_stats()
 
     # not sure how useful this would be
 
@@ -221,6 +370,16 @@ class OBD(object):
         else:
             return ""
 
+    def last_activity(self):
+        """
+            Returns the time.time() at which the adapter last answered
+            anything (including NO DATA), or 0 if it never did
+        """
+        if self.interface is not None:
+            return self.interface.last_activity()
+        else:
+            return 0.0
+
     def is_connected(self):
         """
             Returns a boolean for whether a connection with the car was made.
@@ -250,6 +409,22 @@ class OBD(object):
             Returns a boolean for whether a command will
             be sent without using force=True.
         """
+        # UDS DIDs can't be listed by the car, only check the protocol
+        if cmd.mode == uds.SID_READ_DATA_BY_ID:
+            if self.interface.protocol_id() not in ["6", "7", "8", "9"]:
+                if warn:
+                    logger.warning("UDS DIDs are only supported over CAN protocols")
+                return False
+            return True
+
+        # J1939 parameter groups aren't listed by the car either
+        if isinstance(cmd, j1939.PGNCommand):
+            if self.interface.protocol_id() != "A":
+                if warn:
+                    logger.warning("PGN commands are only supported over SAE J1939")
+                return False
+            return True
+
         # test if the command is supported
         if not self.supports(cmd):
             if warn:
@@ -264,25 +439,385 @@ class OBD(object):
 
         return True
 
-    def query(self, cmd, force=False):
+    def query(self, cmd, force=False, deadline=None, cancel=None):
         """
             primary API function. Sends commands to the car, and
             protects against sending unsupported commands.
+
+            Responses of commands with a TTL are reused until they expire
+
+            A query still running at its deadline (a time.time() value),
+            or when the cancel token (see cancel.py) fires, is abandoned,
+            and a TimeoutResponse is returned.
+        """
+
+        r = self.__cached(cmd)
+        if r is not None:
+            return r
+
+        if expired(deadline, cancel):
+            return TimeoutResponse(cmd, cancel is not None and cancel.cancelled)
+
+        messages = self.__send_query(cmd, force, deadline=deadline, cancel=cancel)
+        return self.__response(cmd, messages, deadline, cancel)
+
+    def query_many(self, cmds, force=False, deadline=None, cancel=None):
+        """
+            Queries several commands, with the checks and caching of
+            query(). On STN adapters, the requests are pipelined (see
+            ELM327.send_and_parse_many()): each one is sent as soon as
+            the adapter finished the previous one.
+
+            Returns a dict of {OBDCommand: OBDResponse}
+        """
+
+        responses = {}
+        to_send = []
+        for cmd in cmds:
+            r = self.__cached(cmd)
+            if r is not None:
+                responses[cmd] = r
+            elif cmd not in to_send:
+                to_send.append(cmd)
+
+        received = self.__send_queries(to_send, force, deadline=deadline, cancel=cancel)
+        for cmd, messages in zip(to_send, received):
+            responses[cmd] = self.__response(cmd, messages, deadline, cancel)
+
+        return responses
+
+    def __cached(self, cmd):
+        """ returns the cached response of a command, if it's still valid """
+        ttl = self.__ttls.get(cmd, cmd.ttl)
+        if ttl is not None:
+            r = self.__cache.get(cmd)
+            if r is not None and time.time() - r.time < ttl:
+                self.cache_hits += 1
+                return r
+            self.cache_misses += 1
+        return None
+
+    def __response(self, cmd, messages, deadline=None, cancel=None):
+        """ decodes (and caches) the response of a command """
+
+        if not messages:
+            if expired(deadline, cancel):
+                return TimeoutResponse(cmd, cancel is not None and cancel.cancelled)
+            return OBDResponse()
+
+        r = cmd(messages)  # compute a response object
+
+        if cmd == commands.CLEAR_DTC:
+            # the status, DTC counters and freeze frames were all reset
+            self.invalidate()
+        elif self.__ttls.get(cmd, cmd.ttl) is not None and not r.is_null():
+            self.__cache[cmd] = r
+
+        if cmd == commands.VIN and not r.is_null():
+            # selects the manufacturer DTC descriptions, if any (see resources.py)
+            dtc_index.notify_vin(r.value)
+
+        return r
+
+    def set_ttl(self, cmd, ttl):
+        """
+            Overrides the cache lifetime (in seconds) of a command for
+            this connection. None disables caching of the command.
+        """
+        self.__ttls[cmd] = ttl
+        self.__cache.pop(cmd, None)
+
+    def invalidate(self, cmd=None):
+        """
+            Drops the cached response of a command. Without a command,
+            everything but the vehicle/adapter identification (mode 09
+            and AT commands) is dropped.
+        """
+        if cmd is not None:
+            self.__cache.pop(cmd, None)
+        else:
+            self.__cache = {c: r for c, r in self.__cache.items()
+                            if c.mode == 9 or c.command.startswith(b"AT")}
+
+    def cache_stats(self):
+        """ returns the cache counters, as a dict """
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "entries": len(self.__cache),
+        }
+
+    def query_all_ecus(self, cmd, force=False):
+        """
+            Sends a command once, and decodes the answer of every
+            ECU that responded to it, regardless of the command's
+            ECU filter.
+
+            Returns a dict of {tx_id: OBDResponse}, which is empty
+            when nothing was received.
+        """
+
+        messages = self.__send_query(cmd, force, all_ecus=True)
+
+        if not messages:
+            return {}
+
+        return cmd.decode_per_ecu(messages)
+
+    def read_dids(self, dids):
+        """
+            Reads several UDS DIDs (see uds.py), packing as many of
+            them as the ECU accepts into each 0x22 request.
+
+            Returns a dict of {DIDCommand: OBDResponse}
+        """
+
+        responses = {}
+
+        for batch in uds.batches(dids, self.__did_limits):
+
+            if len(batch) > 1:
+                cmd = uds.BatchDIDCommand(batch)
+                # only use the blocking OBD.query() (see __load_commands)
+                r = OBD.query(self, cmd)
+
+                if r.value is not None and len(r.value) == len(batch):
+                    for d in batch:
+                        response = OBDResponse(d, r.messages)
+                        response.value = r.value[d]
+                        responses[d] = response
+                    continue
+
+                # the ECU didn't take the batch, fall back to single reads
+                # and remember the length/format errors for this header
+                nrc = cmd.negative_response_code(r)
+                if nrc in uds.NRC_BATCH_REJECTED:
+                    logger.info("ECU %s rejected multi-DID request, reading DIDs one at a time" % batch[0].header)
+                    self.__did_limits[batch[0].header] = 1
+
+            for d in batch:
+                responses[d] = OBD.query(self, d)
+
+        return responses
+
+    def read_monitors(self, mids=None):
+        """
+            Reads the mode 06 test results of the given MID commands
+            (all the MIDs supported by the car by default), packing as
+            many of them as the ECU accepts into each request.
+
+            Unsupported MIDs are skipped, and results younger than
+            their TTL (see set_ttl()) are reused, which rate-limits
+            repeated sweeps.
+
+            Returns a dict of {OBDCommand: OBDResponse}
+        """
+
+        if self.__monitors is None:
+            # the MIDS_* support map is only read while connecting
+            self.__monitors = [c for c in commands.monitors() if c in self.supported_commands]
+
+        if mids is None:
+            mids = self.__monitors
+        else:
+            mids = [m for m in mids if m in self.__monitors]
+
+        if not mids or not self.test_cmd(mids[0]):
+            return {}
+
+        responses = {}
+        stale = []
+        now = time.time()
+        for m in mids:
+            ttl = self.__ttls.get(m, m.ttl)
+            r = self.__cache.get(m)
+            if ttl is not None and r is not None and now - r.time < ttl:
+                self.cache_hits += 1
+                responses[m] = r
+            else:
+                stale.append(m)
+
+        for batch in monitors.batches(stale, self.__mid_limits):
+
+            if len(batch) > 1:
+                cmd = monitors.BatchMonitorCommand(batch)
+                # the MIDs were checked above, only use the blocking OBD.query() (see __load_commands)
+                batch_responses = cmd.responses(OBD.query(self, cmd, force=True))
+
+                if batch_responses is not None:
+                    for m, r in batch_responses.items():
+                        self.cache_misses += 1
+                        if self.__ttls.get(m, m.ttl) is not None:
+                            self.__cache[m] = r
+                    responses.update(batch_responses)
+                    continue
+
+                # the ECU didn't answer every MID, read them one at a time from now on
+                logger.info("ECU %s ignored multi-MID request, reading MIDs one at a time" % batch[0].header)
+                self.__mid_limits[batch[0].header] = 1
+
+            for m in batch:
+                responses[m] = OBD.query(self, m)
+
+        return responses
+
+    def read_all_dtcs(self):
+        """
+            Reads the stored (mode 03), pending (mode 07) and permanent
+            (mode 0A) DTCs, and the DTC that triggered the freeze frame.
+
+            The requests are sent back-to-back, and the responses are
+            only decoded once everything was received.
+
+            Returns a dict of {tx_id: DTCReport}, for every ECU that
+            answered any of the requests
+        """
+
+        fields = [
+            (commands.GET_DTC, "stored"),
+            (commands.GET_CURRENT_DTC, "pending"),
+            (commands.GET_PERMANENT_DTC, "permanent"),
+            (commands.FREEZE_DTC, "freeze"),
+        ]
+
+        received = self.__send_queries([cmd for cmd, _ in fields], False)
+
+        reports = {}
+        for messages, (cmd, field) in zip(received, fields):
+            if not messages:
+                continue
+            for tx_id, r in cmd.decode_per_ecu(messages).items():
+                if r.value is None:
+                    continue
+                # P0000 is a freeze frame without a DTC
+                if field == "freeze" and r.value[0] == "P0000":
+                    continue
+                setattr(reports.setdefault(tx_id, DTCReport()), field, r.value)
+
+        return reports
+
+    def tester_present(self, header=ECU_HEADER.ENGINE):
         """
+            Sends a UDS TesterPresent, keeping a diagnostic
+            session of the given ECU alive.
+
+            Returns a boolean for whether the ECU acknowledged it
+        """
+        r = OBD.query(self, uds.tester_present(header), force=True)
+        return r.value is True
+
+    def ecu_map(self):
+        """
+            Returns a dict of {tx_id: ECU} for the ECUs discovered
+            while connecting (see protocols.ECU for the values)
+        """
+        if self.interface is None:
+            return {}
+        else:
+            return self.interface.ecu_map()
+
+    def __send_query(self, cmd, force, all_ecus=False, deadline=None, cancel=None):
+        """
+            Sends the command string for the given command, and
+            returns the list of parsed Messages (or None on failure,
+            or when abandoned at the deadline)
+        """
+
+        if not self.__ready(cmd, force):
+            return None
+
+        self.__set_addressing(cmd, all_ecus)
+
+        # STN adapters get the timeout along with the command instead
+        if self.adaptive_timeout and self.interface.stn_id() is None:
+            self.__set_timeout(self.response_times.timeout(cmd))
+
+        # without a known frame count, the ELM always waits for its
+        # timeout, so only those response times are worth learning
+        counted = self.fast and cmd.fast and (self.__frame_key(cmd) in self.__frame_counts)
+
+        logger.info("Sending command: %s" % str(cmd))
+        cmd_string = self.__build_command_string(cmd)
+        t = time.time()
+        messages = self.interface.send_and_parse(cmd_string, deadline, cancel)
+        return self.__received(cmd, cmd_string, messages, time.time() - t, counted)
+
+    def __send_queries(self, cmds, force, all_ecus=False, deadline=None, cancel=None):
+        """
+            Sends several commands, pipelined on STN adapters, and
+            returns their lists of parsed Messages, in order (None for
+            the ones that failed, or were abandoned at the deadline)
+
+            The header and CAN filter can only change between requests,
+            so commands sharing them are sent together.
+        """
+
+        if self.interface is None or self.interface.stn_id() is None:
+            return [None if expired(deadline, cancel) else
+                    self.__send_query(cmd, force, all_ecus, deadline, cancel) for cmd in cmds]
+
+        received = [None] * len(cmds)
+        group = []  # indices of the commands sharing the current addressing
+        addressing = None
+
+        for i, cmd in enumerate(cmds + [None]):
+            if cmd is not None:
+                if not self.__ready(cmd, force):
+                    continue
+                a = self.__addressing(cmd, all_ecus)
+                if not group or a == addressing:
+                    group.append(i)
+                    addressing = a
+                    continue
+
+            if group and not expired(deadline, cancel):
+                self.__set_addressing(cmds[group[0]], all_ecus, addressing)
+                sent = []
+                for j in group:
+                    c = cmds[j]
+                    counted = self.fast and c.fast and (self.__frame_key(c) in self.__frame_counts)
+                    logger.info("Sending command: %s" % str(c))
+                    cmd_string = self.__build_command_string(c)
+                    if cmd_string:
+                        self.__last_command = cmd_string
+                    sent.append((j, cmd_string, counted))
+
+                results = self.interface.send_and_parse_many([s for _, s, _ in sent], deadline, cancel)
+                for (j, cmd_string, counted), (messages, elapsed) in zip(sent, results):
+                    received[j] = self.__received(cmds[j], cmd_string, messages, elapsed, counted)
+
+            group = [] if cmd is None else [i]
+            addressing = None if cmd is None else a
+
+        return received
+
+    def __ready(self, cmd, force):
+        """ checks a command before sending it, and wakes the adapter up """
 
         if self.status() == OBDStatus.NOT_CONNECTED:
             logger.warning("Query failed, no connection available")
-            return OBDResponse()
+            return False
 
         # if the user forces, skip all checks
         if not force and not self.test_cmd(cmd):
-            return OBDResponse()
+            return False
 
-        self.__set_header(cmd.header)
+        # wake the adapter up first, so that its settings are sent again
+        if self.interface.in_low_power():
+            self.normal_power()
 
-        logger.info("Sending command: %s" % str(cmd))
-        cmd_string = self.__build_command_string(cmd)
-        messages = self.interface.send_and_parse(cmd_string)
+        return True
+
+    def __received(self, cmd, cmd_string, messages, elapsed, counted):
+        """
+            Keeps track of the frame counts and response times of a
+            command's answer. Returns its messages, or None on failure.
+        """
+
+        if messages is None:
+            logger.info("Command abandoned (or connection lost): %s" % str(cmd))
+            self.__last_command = b""  # the adapter was interrupted, don't repeat it
+            return None
 
         # if we're sending a new command, note it
         # first check that the current command WASN'T sent as an empty CR
@@ -292,14 +827,28 @@ class OBD(object):
 
         # if we don't already know how many frames this command returns,
         # log it, so we can specify it next time
-        if cmd not in self.__frame_counts:
-            self.__frame_counts[cmd] = sum([len(m.frames) for m in messages])
+        key = self.__frame_key(cmd)
+        if key not in self.__frame_counts:
+            self.__frame_counts[key] = sum([len(m.frames) for m in messages])
+
+        if any(m.parsed() for m in messages):
+            if counted:
+                self.response_times.record(cmd, elapsed)
+        elif any("NO DATA" in m.raw() for m in messages):
+            self.response_times.no_data(cmd)
 
         if not messages:
             logger.info("No valid OBD Messages returned")
-            return OBDResponse()
+            return None
+
+        return messages
 
-        return cmd(messages)  # compute a response object
+    def __frame_key(self, cmd):
+        """
+            Frame counts depend on the ECUs that answer, so they are kept
+            per header and CAN filter (as set by __set_addressing())
+        """
+        return (cmd, self.__last_header, self.__last_filter)
 
     def __build_command_string(self, cmd):
         """ assembles the appropriate command string """
@@ -308,8 +857,16 @@ class OBD(object):
         # if we know the number of frames that this command returns,
         # only wait for exactly that number. This avoids some harsh
         # timeouts from the ELM, thus speeding up queries.
-        if self.fast and cmd.fast and (cmd in self.__frame_counts):
-            cmd_string += str(self.__frame_counts[cmd]).encode()
+        # (STN adapters get an STPX command instead)
+        responses = None
+        if self.fast and cmd.fast:
+            responses = self.__frame_counts.get(self.__frame_key(cmd))
+
+        timeout = None
+        if self.adaptive_timeout and self.interface.stn_id() is not None:
+            timeout = self.response_times.timeout(cmd)
+
+        cmd_string = self.interface.format_command(cmd_string, responses, timeout)
 
         # if we sent this last time, just send a CR
         # (CR is added by the ELM327 class)
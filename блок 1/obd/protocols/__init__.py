@@ -44,4 +44,5 @@ from .protocol_can import ISO_15765_4_11bit_500k, \
                           ISO_15765_4_29bit_500k, \
                           ISO_15765_4_11bit_250k, \
                           ISO_15765_4_29bit_250k, \
-                          SAE_J1939
+                          SAE_J1939, \
+                          J1939Reassembler
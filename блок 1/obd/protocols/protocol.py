@@ -31,7 +31,7 @@
 ########################################################################
 
 import logging
-from binascii import hexlify
+from binascii import hexlify, unhexlify
 
 from obd.utils import isHex, BitArray
 
@@ -59,14 +59,31 @@ class ECU:
     UNKNOWN = 0b00000001  # unknowns get their own bit, since they need to be accepted by the ALL filter
     ENGINE = 0b00000010
     TRANSMISSION = 0b00000100
+    HYBRID = 0b00001000
+
+
+def _getstate(obj):
+    """ slot values, with the views copied out of the receive buffer """
+    return {k: v.tobytes() if isinstance(v, memoryview) else v
+            for k, v in ((k, getattr(obj, k)) for k in obj.__slots__)}
+
+
+def _setstate(obj, state, views):
+    for k, v in state.items():
+        setattr(obj, k, memoryview(v) if k in views and v is not None else v)
 
 
 class Frame(object):
     """ represents a single parsed line of OBD output """
 
-    def __init__(self, raw):
+    # one of these is made per line, keep them small
+    __slots__ = ("raw", "raw_bytes", "data", "priority", "addr_mode", "rx_id",
+                 "tx_id", "type", "seq_index", "data_len", "pgn")
+
+    def __init__(self, raw, raw_bytes=None):
         self.raw = raw
-        self.data = bytearray()
+        self.raw_bytes = raw_bytes  # memoryview of the whole line (see Protocol.frame_bytes())
+        self.data = memoryview(b"")
         self.priority = None
         self.addr_mode = None
         self.rx_id = None
@@ -74,17 +91,33 @@ class Frame(object):
         self.type = None
         self.seq_index = 0  # only used when type = CF
         self.data_len = None
+        self.pgn = None  # only used by J1939
+
+    def __getstate__(self):
+        return _getstate(self)
+
+    def __setstate__(self, state):
+        _setstate(self, state, ("raw_bytes", "data"))
 
 
 class Message(object):
     """ represents a fully parsed OBD message of one or more Frames (lines) """
 
+    __slots__ = ("frames", "ecu", "num_frames", "data", "can", "pgn")
+
     def __init__(self, frames):
         self.frames = frames
         self.ecu = ECU.UNKNOWN
         self.num_frames = 0
-        self.data = bytearray()
+        self.data = memoryview(b"")  # views into the receive buffer, never copied for single frames
         self.can = False
+        self.pgn = None  # only used by J1939
+
+    def __getstate__(self):
+        return _getstate(self)
+
+    def __setstate__(self, state):
+        _setstate(self, state, ("data",))
 
     @property
     def tx_id(self):
@@ -135,6 +168,7 @@ class Protocol(object):
     # the TX_IDs of known ECUs
     TX_ID_ENGINE = None
     TX_ID_TRANSMISSION = None
+    TX_ID_HYBRID = None
 
     def __init__(self, lines_0100):
         """
@@ -154,6 +188,9 @@ class Protocol(object):
         if (self.TX_ID_TRANSMISSION is not None):
             self.ecu_map[self.TX_ID_TRANSMISSION] = ECU.TRANSMISSION
 
+        if (self.TX_ID_HYBRID is not None):
+            self.ecu_map[self.TX_ID_HYBRID] = ECU.HYBRID
+
         # parse the 0100 data into messages
         # NOTE: at this point, their "ecu" property will be UNKNOWN
         messages = self(lines_0100)
@@ -194,11 +231,22 @@ class Protocol(object):
 
         # ---------------------- handle valid OBD lines ----------------------
 
+        # decode every line into a single receive buffer. Frames, and
+        # the Messages assembled from them, only hold views into it
+        padded_lines = [self.pad_frame(line) for line in obd_lines]
+        buffer = memoryview(unhexlify("".join([l for l in padded_lines if not len(l) & 1])))
+
         # parse each frame (each line)
         frames = []
-        for line in obd_lines:
+        start = 0
+        for line, padded_line in zip(obd_lines, padded_lines):
 
-            frame = Frame(line)
+            if len(padded_line) & 1:
+                frame = Frame(line)  # dropped by frame_bytes()
+            else:
+                end = start + len(padded_line) // 2
+                frame = Frame(line, buffer[start:end])
+                start = end
 
             # subclass function to parse the lines into Frames
             # drop frames that couldn't be parsed
@@ -237,6 +285,23 @@ class Protocol(object):
 
         return messages
 
+    def pad_frame(self, raw):
+        """ override to pad raw lines before they are decoded """
+        return raw
+
+    def frame_bytes(self, frame):
+        """
+            returns the bytes of a frame's line as a memoryview, or None
+            for lines of odd length. Frames built outside of __call__()
+            (ie. while monitoring) are decoded here.
+        """
+        if frame.raw_bytes is None:
+            raw = self.pad_frame(frame.raw)
+            if len(raw) & 1:
+                return None
+            frame.raw_bytes = memoryview(unhexlify(raw))
+        return frame.raw_bytes
+
     def populate_ecu_map(self, messages):
         """
             Given a list of messages from different ECUS,
@@ -273,6 +338,8 @@ class Protocol(object):
                     found_engine = True
                 elif m.tx_id == self.TX_ID_TRANSMISSION:
                     self.ecu_map[m.tx_id] = ECU.TRANSMISSION
+                elif m.tx_id == self.TX_ID_HYBRID:
+                    self.ecu_map[m.tx_id] = ECU.HYBRID
                 # TODO: program more of these when we figure out their constants
 
             if not found_engine:
@@ -31,7 +31,6 @@
 ########################################################################
 
 import logging
-from binascii import unhexlify
 
 from obd.utils import contiguous
 from .protocol import Protocol
@@ -42,6 +41,7 @@ logger = logging.getLogger(__name__)
 class CANProtocol(Protocol):
     TX_ID_ENGINE = 0
     TX_ID_TRANSMISSION = 1
+    TX_ID_HYBRID = 2
 
     FRAME_TYPE_SF = 0x00  # single frame
     FRAME_TYPE_FF = 0x10  # first frame of multi-frame message
@@ -54,10 +54,23 @@ class CANProtocol(Protocol):
         self.id_bits = id_bits
         Protocol.__init__(self, lines_0100)
 
-    def parse_frame(self, frame):
+    def functional_header(self):
+        """ header (AT SH) of requests to every ECU """
+        return b"7DF" if self.id_bits == 11 else b"DB33F1"
 
-        raw = frame.raw
+    def physical_header(self, tx_id):
+        """ header (AT SH) of requests to a single ECU """
+        if self.id_bits == 11:
+            return b"%03X" % (0x7E0 + tx_id)
+        return b"DA%02XF1" % tx_id
 
+    def response_id(self, tx_id):
+        """ CAN ID of the responses of an ECU """
+        if self.id_bits == 11:
+            return 0x7E8 + tx_id
+        return 0x18DAF100 + tx_id
+
+    def pad_frame(self, raw):
         # pad 11-bit CAN headers out to 32 bits for consistency,
         # since ELM already does this for 29-bit CAN headers
 
@@ -66,15 +79,18 @@ class CANProtocol(Protocol):
         # 00 00 07 E8 06 41 00 BE 7F B8 13
 
         if self.id_bits == 11:
-            raw = "00000" + raw
+            return "00000" + raw
+        return raw
+
+    def parse_frame(self, frame):
+
+        raw_bytes = self.frame_bytes(frame)
 
         # Handle odd size frames and drop
-        if len(raw) & 1:
+        if raw_bytes is None:
             logger.debug("Dropping frame for being odd")
             return False
 
-        raw_bytes = bytearray(unhexlify(raw))
-
         # check for valid size
 
         if len(raw_bytes) < 6:
@@ -131,7 +147,6 @@ class CANProtocol(Protocol):
                               self.FRAME_TYPE_CF,
                               self.FRAME_TYPE_FC]:
             logger.debug("Dropping frame carrying unknown PCI frame type")
-            print("Dropping frame carrying unknown PCI frame type")
             return False
 
         if frame.type == self.FRAME_TYPE_SF:
@@ -171,16 +186,13 @@ class CANProtocol(Protocol):
     def parse_message(self, message):
 
         frames = message.frames
-        print("How many frames? ", len(frames))
         message.num_frames = len(frames)
         message.can = True
         if (len(frames) >= 1) and (frames[0].type == self.FRAME_TYPE_SF):
             if len(frames) == 1:
                 frame = frames[0]
-                print("Frame type: ", frame.type)
                 if frame.type != self.FRAME_TYPE_SF:
                     logger.debug("Recieved lone frame not marked as single frame")
-                    print("Recieved lone frame not marked as single frame")
                     return False
 
                 # extract data, ignore PCI byte and anything after the marked length
@@ -192,12 +204,9 @@ class CANProtocol(Protocol):
 
 
             elif len(frames) > 1:
-                print("I AM HERE! DTC multiple frames!")
-                for frame in frames:
-                    print("Frame: " , frame.data)
-                    message.data += frame.data[2:8]
+                logger.debug("Joining multiple frames marked SF")
+                message.data = memoryview(b"".join([f.data[2:8] for f in frames]))
                 #message.data =message.data.rstrip(b'\x00\x00\x00\x00')
-                print ("Message data: ", message.data)
 
 
         else:
@@ -208,13 +217,11 @@ class CANProtocol(Protocol):
             counter = 0
             for f in frames:
 
-                print("Frame type: ", f.type)
                 if f.type == self.FRAME_TYPE_FF:
                     ff.append(f)
                 elif f.type == self.FRAME_TYPE_CF:
                     cf.append(f)
                 else:
-                    print("Dropping frame in multi-frame response not marked as FF or CF")
                     logger.debug("Dropping frame in multi-frame response not marked as FF or CF")
 
             # check that we captured only one first-frame
@@ -271,14 +278,12 @@ class CANProtocol(Protocol):
             # 49 04 01 35 36 30 32 38 39 34 39 41 43 00 00 00 00 00 00 31
 
             # on the first frame, skip PCI byte AND length code
-            message.data = ff[0].data[2:]
-
             # now that they're in order, load/accumulate the data from each CF frame
-            for f in cf:
-                message.data += f.data[1:]  # chop off the PCI byte
+            # (chopping off the PCI byte), in a single copy
+            data = b"".join([ff[0].data[2:]] + [f.data[1:] for f in cf])
 
             # chop to the correct size (as specified in the first frame)
-            message.data = message.data[:ff[0].data_len]
+            message.data = memoryview(data)[:ff[0].data_len]
 
         # trim DTC requests based on DTC count
         # this ISN'T in the decoder because the legacy protocols
@@ -336,8 +341,155 @@ class ISO_15765_4_29bit_250k(CANProtocol):
 
 
 class SAE_J1939(CANProtocol):
+    """
+        J1939 doesn't use ISO-TP framing. Each frame carries a
+        29-bit ID (priority, PGN, source address) followed by up to
+        8 data bytes, and longer payloads are sent with the J1939
+        transport protocol (TP.CM / TP.DT frames).
+
+        Requires the raw 29-bit IDs to be printed (AT JHF0).
+    """
+
     ELM_NAME = "SAE J1939 (CAN 29/250)"
     ELM_ID = "A"
 
+    TX_ID_ENGINE = 0x00  # source address of engine #1
+
     def __init__(self, lines_0100):
         CANProtocol.__init__(self, lines_0100, id_bits=29)
+
+    def parse_frame(self, frame):
+
+        raw_bytes = self.frame_bytes(frame)
+
+        # Handle odd size frames and drop
+        if raw_bytes is None:
+            logger.debug("Dropping frame for being odd")
+            return False
+
+        # 4 ID bytes, and at least one data byte
+        if len(raw_bytes) < 5:
+            logger.debug("Dropped frame for being too short")
+            return False
+
+        if len(raw_bytes) > 12:
+            logger.debug("Dropped frame for being too long")
+            return False
+
+        # Ex.
+        # [   ID    ] [        Data          ]
+        # 18 FE EE 00 8C 72 FF FF FF FF FF FF
+
+        can_id = (raw_bytes[0] << 24) | (raw_bytes[1] << 16) | (raw_bytes[2] << 8) | raw_bytes[3]
+
+        frame.priority = (can_id >> 26) & 0x07
+        frame.tx_id = can_id & 0xFF  # source address
+        frame.pgn, frame.rx_id = j1939_pgn(can_id)
+        frame.data = raw_bytes[4:]
+        frame.data_len = len(frame.data)
+
+        return True
+
+    def parse_message(self, message):
+
+        message.num_frames = len(message.frames)
+        message.can = True
+
+        reassembler = J1939Reassembler()
+        for frame in message.frames:
+            payload = reassembler.feed(frame)
+            if payload is not None:
+                message.pgn, message.data = payload
+                return True
+
+        # a lone broadcast/response frame
+        frames = [f for f in message.frames if not J1939Reassembler.is_transport(f)]
+        if frames:
+            message.pgn = frames[0].pgn
+            message.data = frames[0].data
+            return True
+
+        logger.debug("Incomplete J1939 transport session")
+        return False
+
+
+def j1939_pgn(can_id):
+    """
+        Splits a 29-bit J1939 ID into its PGN and destination address
+        (0xFF, the global address, for broadcast PGNs)
+    """
+
+    dp = (can_id >> 24) & 0x03  # extended data page + data page
+    pf = (can_id >> 16) & 0xFF  # PDU format
+    ps = (can_id >> 8) & 0xFF  # PDU specific
+
+    if pf < 240:
+        # PDU1, peer-to-peer: PS is the destination address
+        return (dp << 16) | (pf << 8), ps
+    else:
+        # PDU2, broadcast: PS is a group extension of the PGN
+        return (dp << 16) | (pf << 8) | ps, 0xFF
+
+
+class J1939Reassembler(object):
+    """
+        Reassembles multi-packet J1939 payloads (BAM and RTS/CTS
+        sessions) from TP.CM and TP.DT frames.
+
+        Frames are fed one at a time, so the same object serves
+        both complete responses and a continuous monitor stream.
+    """
+
+    PGN_TP_CM = 0xEC00  # connection management
+    PGN_TP_DT = 0xEB00  # data transfer
+
+    CM_RTS = 0x10  # request to send
+    CM_BAM = 0x20  # broadcast announce message
+
+    def __init__(self):
+        # key = (source address, destination address)
+        # value = [PGN, size, number of packets, {sequence number: data}]
+        self.sessions = {}
+
+    @classmethod
+    def is_transport(cls, frame):
+        return frame.pgn in (cls.PGN_TP_CM, cls.PGN_TP_DT)
+
+    def feed(self, frame):
+        """
+            Returns a (PGN, data) tuple when a payload is completed
+            by this frame, otherwise None.
+        """
+
+        key = (frame.tx_id, frame.rx_id)
+        d = frame.data
+
+        if frame.pgn == self.PGN_TP_CM and len(d) >= 8:
+            if d[0] in (self.CM_BAM, self.CM_RTS):
+                #  [] [size] [] []  [  PGN   ]
+                #  20 0E 00  02 FF  EC FE 00
+                size = d[1] | (d[2] << 8)
+                pgn = d[5] | (d[6] << 8) | (d[7] << 16)
+                self.sessions[key] = [pgn, size, d[3], {}]
+            return None
+
+        if frame.pgn == self.PGN_TP_DT and len(d) >= 2:
+            session = self.sessions.get(key)
+            if session is None:
+                logger.debug("Dropping TP.DT frame without an open session")
+                return None
+
+            pgn, size, packets, data = session
+            data[d[0]] = d[1:8]
+
+            if len(data) == packets:
+                del self.sessions[key]
+
+                if not contiguous(sorted(data.keys()), 1, packets):
+                    logger.debug("Recieved J1939 transport session with missing packets")
+                    return None
+
+                payload = b"".join([data[i] for i in range(1, packets + 1)])
+                return pgn, memoryview(payload)[:size]
+
+        return None
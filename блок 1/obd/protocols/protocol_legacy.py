@@ -31,7 +31,6 @@
 ########################################################################
 
 import logging
-from binascii import unhexlify
 
 from obd.utils import contiguous
 from .protocol import Protocol
@@ -47,15 +46,13 @@ class LegacyProtocol(Protocol):
 
     def parse_frame(self, frame):
 
-        raw = frame.raw
+        raw_bytes = self.frame_bytes(frame)
 
         # Handle odd size frames and drop
-        if len(raw) & 1:
+        if raw_bytes is None:
             logger.debug("Dropping frame for being odd")
             return False
 
-        raw_bytes = bytearray(unhexlify(raw))
-
         if len(raw_bytes) < 6:
             logger.debug("Dropped frame for being too short")
             return False
@@ -102,8 +99,8 @@ class LegacyProtocol(Protocol):
         #       fixing ugly inconsistencies between the two protocols here.
         # ~~~~
 
-        if mode == 0x43:
-            # GET_DTC requests return frames with no PID or order bytes
+        if mode in (0x43, 0x47, 0x4A):
+            # DTC requests (stored, pending, permanent) return frames with no PID or order bytes
             # accumulate all of the data, minus the Mode bytes of each frame
 
             # Ex.
@@ -114,9 +111,8 @@ class LegacyProtocol(Protocol):
             # 48 6B 10 43 03 04 00 00 00 00 ck
             #             [     Data      ]
 
-            message.data = bytearray([0x43, 0x00])  # forge the mode byte and CAN's DTC_count byte
-            for f in frames:
-                message.data += f.data[1:]
+            # forge the mode byte and CAN's DTC_count byte
+            message.data = memoryview(bytes([mode, 0x00]) + b"".join([f.data[1:] for f in frames]))
 
         else:
             if len(frames) == 1:
@@ -155,12 +151,10 @@ class LegacyProtocol(Protocol):
                 # now that they're in order, accumulate the data from each frame
 
                 # preserve the first frame's mode and PID bytes (for consistency with CAN)
-                frames[0].data.pop(2)  # remove the sequence byte
-                message.data = frames[0].data
-
-                # add the data from the remaining frames
-                for f in frames[1:]:
-                    message.data += f.data[3:]  # loose the mode/pid/seq bytes
+                # but remove its sequence byte, and add the data from the remaining frames
+                data = [frames[0].data[:2], frames[0].data[3:]]
+                data += [f.data[3:] for f in frames[1:]]  # loose the mode/pid/seq bytes
+                message.data = memoryview(b"".join(data))
 
         return True
 
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+
+########################################################################
+#                                                                      #
+# python-OBD: A python OBD-II serial module derived from pyobd         #
+#                                                                      #
+# Copyright 2004 Donour Sizemore (donour@uchicago.edu)                 #
+# Copyright 2009 Secons Ltd. (www.obdtester.com)                       #
+# Copyright 2009 Peter J. Creath                                       #
+# Copyright 2016 Brendan Whitfield (brendan-w.com)                     #
+#                                                                      #
+########################################################################
+#                                                                      #
+# resources.py                                                         #
+#                                                                      #
+# This file is part of python-OBD (a derivative of pyOBD)              #
+#                                                                      #
+# python-OBD is free software: you can redistribute it and/or modify   #
+# it under the terms of the GNU General Public License as published by #
+# the Free Software Foundation, either version 2 of the License, or    #
+# (at your option) any later version.                                  #
+#                                                                      #
+# python-OBD is distributed in the hope that it will be useful,        #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of       #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the        #
+# GNU General Public License for more details.                         #
+#                                                                      #
+# You should have received a copy of the GNU General Public License    #
+# along with python-OBD.  If not, see <http://www.gnu.org/licenses/>.  #
+#                                                                      #
+########################################################################
+
+
+import hashlib
+import io
+import json
+import logging
+import re
+import threading
+import zipfile
+from collections import OrderedDict
+
+from .dtc_index import DTCIndex, build_index
+
+logger = logging.getLogger(__name__)
+
+"""
+    Signed manufacturer DTC packages (.obdresource)
+
+    A package is a ZIP archive made by tools/data-migration/sign_package.py,
+    holding a manifest.json and one or more data/dtc_<NAME>.json files:
+
+        [{"code": "P1777", "description_en": "...", "description_ru": "...", "severity": ""}, ...]
+
+    and signed with Ed25519 in a detached <package>.sig file. Verifying
+    the signature needs the optional 'cryptography' package:
+
+        pip install pyobd2[resources]
+
+    Packages are read and verified once, but their data files stay
+    compressed until a VIN of the package's brand is seen. Parsed brands
+    are then kept as DTC indexes (see dtc_index.py), in a small LRU.
+
+        provider = ResourceProvider(["dtc.landrover.obdresource"], public_key="public_ed25519.pem")
+        obd.dtc_index.set_description_provider(provider)
+
+    OBD.query(obd.commands.VIN) selects the brand, and parse_dtc() then
+    uses the brand's descriptions, falling back to the generic ones.
+"""
+
+# World Manufacturer Identifiers (first 3 VIN characters) of the brands
+# with packages. A manifest can add its own, as a "wmi" list.
+WMI_BRANDS = {
+    "SAL": "landrover",
+    "SAJ": "jaguar",
+    "WVW": "volkswagen",
+    "WV1": "volkswagen",
+    "WV2": "volkswagen",
+    "WAU": "audi",
+    "WBA": "bmw",
+    "WBS": "bmw",
+    "WDB": "mercedes",
+    "WDD": "mercedes",
+    "VF1": "renault",
+    "VF3": "peugeot",
+    "VF7": "citroen",
+    "TMB": "skoda",
+    "VSS": "seat",
+    "JTD": "toyota",
+    "JT2": "toyota",
+    "JHM": "honda",
+    "KMH": "hyundai",
+    "KNA": "kia",
+    "XTA": "lada",
+}
+
+DTC_CODE = re.compile(r"^[PCBU][0-9A-F]{4}$")
+DATA_FILE = re.compile(r"^data/dtc_(.+)\.json$")
+
+
+def verify_signature(data, signature, public_key):
+    """
+        Checks an Ed25519 detached signature. `public_key` is the PEM (or
+        raw 32 byte) public key, or a path to it. Raises ValueError when
+        the signature doesn't match.
+    """
+    try:
+        from cryptography.exceptions import InvalidSignature
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+    except ImportError:
+        raise ImportError("Verifying .obdresource packages requires the 'cryptography' package "
+                          "(pip install pyobd2[resources])")
+
+    if isinstance(public_key, str):
+        with open(public_key, "rb") as f:
+            public_key = f.read()
+
+    if len(public_key) == 32:
+        key = Ed25519PublicKey.from_public_bytes(public_key)
+    else:
+        key = serialization.load_pem_public_key(public_key)
+        if not isinstance(key, Ed25519PublicKey):
+            raise ValueError("Not an Ed25519 public key")
+
+    try:
+        key.verify(signature, data)
+    except InvalidSignature:
+        raise ValueError("Invalid package signature")
+
+
+def parse_records(data, language="en"):
+    """
+        Turns the records of a data file into {code: description}. Rows
+        that aren't DTCs (ie. failure type sub-codes) are skipped.
+    """
+    descriptions = {}
+    for r in json.loads(data.decode("utf-8")):
+        code = r.get("code", "").strip().upper()
+        desc = r.get("description_" + language) or r.get("description_en") or ""
+        if DTC_CODE.match(code) and desc:
+            descriptions[code] = desc.strip()
+    return descriptions
+
+
+class ResourcePackage:
+    """
+        A verified .obdresource archive, held in memory. Its data files
+        are only decompressed by descriptions().
+    """
+
+    def __init__(self, path, public_key=None, signature=None, verify=True):
+        self.path = path
+
+        with open(path, "rb") as f:
+            self.__data = f.read()
+
+        if verify:
+            if public_key is None:
+                raise ValueError("A public key is needed to verify %s (or pass verify=False)" % path)
+            with open(signature or path + ".sig", "rb") as f:
+                verify_signature(self.__data, f.read(), public_key)
+        else:
+            logger.warning("Loading unverified package %s" % path)
+
+        self.__zip = zipfile.ZipFile(io.BytesIO(self.__data))
+        self.manifest = json.loads(self.__zip.read("manifest.json").decode("utf-8"))
+        self.package_id = self.manifest.get("packageId", "")
+        self.version = self.manifest.get("version", "")
+        self.sha256 = hashlib.sha256(self.__data).hexdigest()
+
+        # "dtc.landrover.2025.q4-dev" --> "landrover"
+        self.brand = self.manifest.get("brand") or (self.package_id.split(".") + [""])[1]
+        self.brand = self.brand.lower()
+        self.wmis = [w.upper() for w in self.manifest.get("wmi", [])]
+
+        # later files override earlier ones (ie. legacy codes, then the primary catalog)
+        self.data_files = sorted([n for n in self.__zip.namelist() if DATA_FILE.match(n)])
+
+        logger.info("opened %s %s (%s), %d data files" % (self.package_id, self.version,
+                                                          self.brand, len(self.data_files)))
+
+    def descriptions(self, language="en"):
+        """ decompresses and merges the data files, returns {code: description} """
+        descriptions = {}
+        for name in self.data_files:
+            descriptions.update(parse_records(self.__zip.read(name), language))
+        return descriptions
+
+    def __repr__(self):
+        return "ResourcePackage(%s, %s, brand=%s)" % (repr(self.package_id), repr(self.version), repr(self.brand))
+
+
+class ResourceProvider:
+    """
+        Description provider (see dtc_index.set_description_provider())
+        serving the codes of the brand of the last VIN seen.
+
+        Brands are parsed on first use, and the `cache_size` most
+        recently used ones are kept as DTC indexes.
+    """
+
+    def __init__(self, packages, public_key=None, cache_size=2, language="en", verify=True):
+        self.language = language
+        self.cache_size = cache_size
+        self.__packages = {}  # brand : ResourcePackage
+        self.__wmis = dict(WMI_BRANDS)
+        self.__cache = OrderedDict()  # brand : DTCIndex, least recently used first
+        self.__lock = threading.Lock()
+        self.brand = None
+
+        for p in packages:
+            if not isinstance(p, ResourcePackage):
+                p = ResourcePackage(p, public_key, verify=verify)
+            self.add_package(p)
+
+    def add_package(self, package):
+        with self.__lock:
+            self.__packages[package.brand] = package
+            self.__cache.pop(package.brand, None)  # a newer version
+            for w in package.wmis:
+                self.__wmis[w] = package.brand
+
+    def brands(self):
+        return list(self.__packages.keys())
+
+    def set_vin(self, vin):
+        """ selects the brand of a VIN, returns it (or None without a package) """
+        brand = self.__wmis.get(vin.strip().upper()[:3])
+        self.brand = brand if brand in self.__packages else None
+        if self.brand is None:
+            logger.info("No DTC package for VIN %s" % vin)
+        return self.brand
+
+    def index(self, brand):
+        """ returns the DTC index of a brand, parsing it if needed """
+        with self.__lock:
+            index = self.__cache.get(brand)
+            if index is not None:
+                self.__cache.move_to_end(brand)
+                return index
+
+            package = self.__packages.get(brand)
+            if package is None:
+                return None
+
+            descriptions = package.descriptions(self.language)
+            index = DTCIndex(build_index(descriptions), brand)
+            logger.info("loaded %d %s codes from %s" % (len(index), brand, package.package_id))
+
+            self.__cache[brand] = index
+            while len(self.__cache) > self.cache_size:
+                self.__cache.popitem(last=False)
+            return index
+
+    def loaded(self):
+        """ returns the brands currently parsed, least recently used first """
+        return list(self.__cache.keys())
+
+    def __call__(self, code):
+        if self.brand is None:
+            return None
+        index = self.index(self.brand)
+        if index is None:
+            return None
+        i = index.find(code)
+        return index.description(i) if i >= 0 else None
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+
+########################################################################
+#                                                                      #
+# python-OBD: A python OBD-II serial module derived from pyobd         #
+#                                                                      #
+# Copyright 2004 Donour Sizemore (donour@uchicago.edu)                 #
+# Copyright 2009 Secons Ltd. (www.obdtester.com)                       #
+# Copyright 2009 Peter J. Creath                                       #
+# Copyright 2016 Brendan Whitfield (brendan-w.com)                     #
+#                                                                      #
+########################################################################
+#                                                                      #
+# shm.py                                                               #
+#                                                                      #
+# This file is part of python-OBD (a derivative of pyOBD)              #
+#                                                                      #
+# python-OBD is free software: you can redistribute it and/or modify   #
+# it under the terms of the GNU General Public License as published by #
+# the Free Software Foundation, either version 2 of the License, or    #
+# (at your option) any later version.                                  #
+#                                                                      #
+# python-OBD is distributed in the hope that it will be useful,        #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of       #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the        #
+# GNU General Public License for more details.                         #
+#                                                                      #
+# You should have received a copy of the GNU General Public License    #
+# along with python-OBD.  If not, see <http://www.gnu.org/licenses/>.  #
+#                                                                      #
+########################################################################
+
+
+import logging
+import struct
+
+from .UnitsAndScaling import Unit
+
+logger = logging.getLogger(__name__)
+
+"""
+    Shared memory table of the latest values
+
+    An Async connection publishes the decoded value of each watched
+    command into a fixed slot of a multiprocessing.shared_memory block.
+    Readers in other processes map the block once, and then read values
+    without locks, sockets or syscalls.
+
+    Each slot is guarded by a sequence number (seqlock): the writer
+    makes it odd before writing, and even again afterwards. A reader
+    retries until it sees the same even number before and after
+    copying the slot.
+
+    Layout:
+        header: [ magic "OBDT" ] [ version (H) ] [ slot count (H) ]
+        slot:   [ seq (Q) ] [ time (d) ] [ value (d) ] [ kind (B) ]
+                [ unit (23s) ] [ text (64s) ] [ command name (32s) ]
+
+    Publisher (in the process running Async):
+
+        connection = obd.Async()
+        table = obd.shm.SharedTable("obd", [obd.commands.RPM, obd.commands.SPEED])
+        table.watch(connection)
+        connection.start()
+
+    Reader (any process):
+
+        reader = obd.shm.SharedTableReader("obd")
+        value, unit, t = reader.read("RPM")
+"""
+
+MAGIC = b"OBDT"
+VERSION = 1
+
+HEADER = struct.Struct("<4sHH")
+SEQ = struct.Struct("<Q")
+DATA = struct.Struct("<ddB23s64s")  # time, value, kind, unit, text
+NAME = struct.Struct("<32s")
+SLOT_SIZE = SEQ.size + DATA.size + NAME.size
+
+# value kinds
+KIND_NONE = 0
+KIND_NUMBER = 1
+KIND_TEXT = 2
+KIND_BOOL = 3
+
+
+# blocks created by this process, which its resource tracker owns
+_created = set()
+
+
+def _shared_memory(name, create=False, size=0):
+    try:
+        from multiprocessing import shared_memory
+    except ImportError:
+        raise ImportError("the shared memory table requires Python 3.8+")
+
+    if create:
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _created.add(shm._name)
+        return shm
+
+    try:
+        # don't let this process' resource tracker unlink the publisher's block
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # before Python 3.13
+        shm = shared_memory.SharedMemory(name=name)
+        if shm._name in _created:
+            return shm  # published by this process, which has to keep tracking it
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return shm
+
+
+def _slot_offset(i):
+    return HEADER.size + i * SLOT_SIZE
+
+
+def _encode(value):
+    """ returns (value, kind, unit, text) """
+    if value is None:
+        return 0.0, KIND_NONE, b"", b""
+    if isinstance(value, bool):
+        return float(value), KIND_BOOL, b"", b""
+    if Unit.loaded() and isinstance(value, Unit.Quantity):
+        unit = "{:~}".format(value.units).encode("utf-8")[:23]
+        return float(value.magnitude), KIND_NUMBER, unit, b""
+    if isinstance(value, (int, float)):
+        return float(value), KIND_NUMBER, b"", b""
+    if isinstance(value, (bytes, bytearray)):
+        return 0.0, KIND_TEXT, b"", bytes(value)[:64]
+    return 0.0, KIND_TEXT, b"", str(value).encode("utf-8")[:64]
+
+
+class SharedTable:
+    """
+        Publisher side of the table, one slot per command.
+
+        Only one process may publish into a table.
+    """
+
+    def __init__(self, name, commands):
+        self.name = name
+        self.commands = list(commands)
+        self.__slots = {c: i for i, c in enumerate(self.commands)}
+        self.__seqs = [0] * len(self.commands)
+
+        size = HEADER.size + len(self.commands) * SLOT_SIZE
+        self.__shm = _shared_memory(name, create=True, size=size)
+        self.__buf = self.__shm.buf
+
+        HEADER.pack_into(self.__buf, 0, MAGIC, VERSION, len(self.commands))
+        for c, i in self.__slots.items():
+            offset = _slot_offset(i)
+            SEQ.pack_into(self.__buf, offset, 0)
+            DATA.pack_into(self.__buf, offset + SEQ.size, 0.0, 0.0, KIND_NONE, b"", b"")
+            NAME.pack_into(self.__buf, offset + SEQ.size + DATA.size, c.name.encode("utf-8")[:32])
+
+    def publish(self, cmd, response):
+        """ writes a response into the command's slot """
+        i = self.__slots.get(cmd)
+        if i is None:
+            return
+
+        value, kind, unit, text = _encode(response.value)
+        offset = _slot_offset(i)
+
+        # odd while writing
+        seq = self.__seqs[i] + 1
+        SEQ.pack_into(self.__buf, offset, seq)
+        DATA.pack_into(self.__buf, offset + SEQ.size, response.time, value, kind, unit, text)
+        seq += 1
+        SEQ.pack_into(self.__buf, offset, seq)
+        self.__seqs[i] = seq
+
+    def watch(self, connection):
+        """
+            Watches every command of the table on an Async connection,
+            publishing each new response. Like Async.watch(), this has
+            to be called while the connection isn't running.
+        """
+        for c in self.commands:
+            connection.watch(c, callback=lambda r, c=c: self.publish(c, r))
+
+    def close(self):
+        """ releases, and removes the table """
+        self.__buf = None
+        self.__shm.close()
+        try:
+            self.__shm.unlink()
+        except FileNotFoundError:
+            pass
+        _created.discard(self.__shm._name)
+
+
+class SharedTableReader:
+    """
+        Reader side of the table. Reads are lock-free: a slot being
+        written is retried, never blocked on.
+    """
+
+    def __init__(self, name):
+        self.__shm = _shared_memory(name)
+        self.__buf = self.__shm.buf
+
+        magic, version, count = HEADER.unpack_from(self.__buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("'%s' is not a python-OBD table" % name)
+
+        self.__slots = {}
+        for i in range(count):
+            (name_,) = NAME.unpack_from(self.__buf, _slot_offset(i) + SEQ.size + DATA.size)
+            self.__slots[name_.rstrip(b"\x00").decode("utf-8")] = i
+
+    def names(self):
+        return list(self.__slots)
+
+    def read_raw(self, name, retries=100):
+        """
+            returns (seq, time, value, kind, unit, text) for a consistent
+            snapshot of the slot, or None if the writer kept it busy
+        """
+        offset = _slot_offset(self.__slots[name])
+        buf = self.__buf
+        for _ in range(retries):
+            (seq,) = SEQ.unpack_from(buf, offset)
+            if seq & 1:
+                continue  # being written
+            data = DATA.unpack_from(buf, offset + SEQ.size)
+            if SEQ.unpack_from(buf, offset)[0] == seq:
+                return (seq,) + data
+        return None
+
+    def read(self, name):
+        """
+            returns (value, unit, time) of the latest response, where
+            value is a float, bool, string or None. time is 0 until the
+            first response was published.
+        """
+        raw = self.read_raw(name)
+        if raw is None:
+            return None, "", 0.0
+
+        seq, t, value, kind, unit, text = raw
+        unit = unit.rstrip(b"\x00").decode("utf-8")
+        if kind == KIND_NUMBER:
+            return value, unit, t
+        elif kind == KIND_BOOL:
+            return bool(value), unit, t
+        elif kind == KIND_TEXT:
+            return text.rstrip(b"\x00").decode("utf-8", "replace"), unit, t
+        return None, unit, t
+
+    def seq(self, name):
+        """ the slot's sequence number, which changes on every publish """
+        return SEQ.unpack_from(self.__buf, _slot_offset(self.__slots[name]))[0]
+
+    def close(self):
+        self.__buf = None
+        self.__shm.close()
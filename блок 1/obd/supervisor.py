@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+
+########################################################################
+#                                                                      #
+# python-OBD: A python OBD-II serial module derived from pyobd         #
+#                                                                      #
+# Copyright 2004 Donour Sizemore (donour@uchicago.edu)                 #
+# Copyright 2009 Secons Ltd. (www.obdtester.com)                       #
+# Copyright 2009 Peter J. Creath                                       #
+# Copyright 2016 Brendan Whitfield (brendan-w.com)                     #
+#                                                                      #
+########################################################################
+#                                                                      #
+# supervisor.py                                                        #
+#                                                                      #
+# This file is part of python-OBD (a derivative of pyOBD)              #
+#                                                                      #
+# python-OBD is free software: you can redistribute it and/or modify   #
+# it under the terms of the GNU General Public License as published by #
+# the Free Software Foundation, either version 2 of the License, or    #
+# (at your option) any later version.                                  #
+#                                                                      #
+# python-OBD is distributed in the hope that it will be useful,        #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of       #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the        #
+# GNU General Public License for more details.                         #
+#                                                                      #
+# You should have received a copy of the GNU General Public License    #
+# along with python-OBD.  If not, see <http://www.gnu.org/licenses/>.  #
+#                                                                      #
+########################################################################
+
+
+
+import logging
+import random
+import threading
+import time
+
+from .OBDResponse import OBDResponse
+from .obd import OBD
+from .utils import OBDStatus
+
+logger = logging.getLogger(__name__)
+
+"""
+    Connection supervision
+
+    A Supervisor owns an OBD connection, and keeps it up: the link is
+    considered healthy as long as the adapter answers normal traffic.
+    Only after `idle` seconds without any answer is a cheap AT RV sent
+    as a keep-alive. A lost link is reconnected with jittered
+    exponential backoff, through the ELM's warm start (the adapter is
+    not reset when it still holds our settings).
+
+    With low_power_after, the adapter is put in low power mode (AT LP)
+    once no query was made for that many seconds, and woken up by the
+    next query. Keep-alives aren't sent while it sleeps.
+
+    Every state change is reported to the subscribed callbacks, so that
+    callers don't need to poll a PID as a heartbeat:
+
+        sup = obd.Supervisor("/dev/ttyUSB0", fast=False)
+        sup.subscribe(lambda state: print(state))
+        sup.start()
+        ...
+        r = sup.query(obd.commands.RPM)
+"""
+
+
+class LinkState:
+    """ Values for Supervisor.state """
+
+    CLOSED = "Closed"
+    CONNECTING = "Connecting"
+    CONNECTED = "Connected"
+    LOST = "Lost"
+
+
+def backoff(base=0.5, cap=30.0, jitter=0.5):
+    """
+        Yields reconnection delays (in seconds), doubling from `base`
+        up to `cap`. Each delay is shortened by a random part (up to
+        `jitter`) of itself, so that adapters dropped at the same
+        time don't retry in lockstep.
+    """
+    delay = base
+    while True:
+        yield delay * (1.0 - jitter * random.random())
+        delay = min(cap, delay * 2)
+
+
+class Supervisor:
+    """
+        Keeps an OBD connection up, with the query API of OBD.
+
+        Arguments other than the ones below are handed to the OBD
+        constructor, for every (re)connection.
+
+            idle          : seconds without traffic before a keep-alive
+            probe_timeout : deadline of a keep-alive
+            max_failures  : unanswered keep-alives before the link is lost
+            base_delay,
+            max_delay,
+            jitter        : reconnection backoff (see backoff())
+            low_power_after : seconds without queries before entering
+                            low power (None = never)
+    """
+
+    def __init__(self, portstr=None, idle=5.0, probe_timeout=1.0, max_failures=2,
+                 base_delay=0.5, max_delay=30.0, jitter=0.5, low_power_after=None,
+                 factory=OBD, **kwargs):
+        self.portstr = portstr
+        self.idle = idle
+        self.low_power_after = low_power_after
+        self.probe_timeout = probe_timeout
+        self.max_failures = max_failures
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.factory = factory  # builds the connections, OBD by default
+        self.kwargs = kwargs
+        self.connection = None
+        self.reconnects = 0  # successful connections after the first one
+        self.probes = 0  # keep-alives sent
+        self.__state = LinkState.CLOSED
+        self.__callbacks = []
+        self.__failures = 0  # consecutive unanswered keep-alives
+        self.__last_query = 0.0  # time of the last query (or call), for the low power policy
+        self.__lock = threading.RLock()  # serializes the use of the connection
+        self.__wake = threading.Event()  # interrupts the supervisor's wait
+        self.__running = False
+        self.__thread = None
+
+    @property
+    def state(self):
+        return self.__state
+
+    @property
+    def running(self):
+        return self.__running
+
+    def subscribe(self, callback):
+        """ callback(state) is called from the supervisor thread on every state change """
+        if callback not in self.__callbacks:
+            self.__callbacks.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self.__callbacks:
+            self.__callbacks.remove(callback)
+
+    def start(self):
+        """ starts the supervisor thread, which connects in the background """
+        if self.__thread is None:
+            self.__running = True
+            self.__wake.clear()
+            self.__thread = threading.Thread(target=self.run)
+            self.__thread.daemon = True
+            self.__thread.start()
+
+    def stop(self):
+        """ stops the supervisor thread, leaving the connection as it is """
+        if self.__thread is not None:
+            self.__running = False
+            self.__wake.set()
+            self.__thread.join()
+            self.__thread = None
+
+    def close(self):
+        """ stops supervising, and closes the connection """
+        self.stop()
+        with self.__lock:
+            self.__set_state(LinkState.CLOSED)
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+    def query(self, cmd, force=False, deadline=None, cancel=None):
+        """
+            Same as OBD.query(). Returns a null response while
+            the link is down.
+        """
+        with self.__lock:
+            if self.__state != LinkState.CONNECTED:
+                return OBDResponse()
+            self.__last_query = time.time()
+            # wakes the adapter up, if it was put in low power
+            r = self.connection.query(cmd, force, deadline=deadline, cancel=cancel)
+            self.__check()
+            return r
+
+    def call(self, func, *args):
+        """
+            Runs func(connection, *args) with the current connection,
+            ie. sup.call(obd.OBD.read_all_dtcs). Returns None while
+            the link is down.
+        """
+        with self.__lock:
+            if self.__state != LinkState.CONNECTED:
+                return None
+            self.__last_query = time.time()
+            result = func(self.connection, *args)
+            self.__check()
+            return result
+
+    def supports(self, cmd):
+        connection = self.connection
+        return connection is not None and connection.supports(cmd)
+
+    def is_connected(self):
+        return self.__state == LinkState.CONNECTED
+
+    def status(self):
+        connection = self.connection
+        if connection is None:
+            return OBDStatus.NOT_CONNECTED
+        return connection.status()
+
+    def power_stats(self):
+        """ returns the low power metrics of the current connection (see ELM327.power_stats()) """
+        connection = self.connection
+        if connection is None:
+            return {}
+        return connection.power_stats()
+
+    def __check(self):
+        """ notices a link that dropped during normal traffic """
+        if self.connection.status() != OBDStatus.CAR_CONNECTED:
+            self.__lost("adapter stopped answering")
+
+    def __set_state(self, state):
+        if state == self.__state:
+            return
+        logger.info("Link state: %s -> %s" % (self.__state, state))
+        self.__state = state
+        for callback in list(self.__callbacks):
+            try:
+                callback(state)
+            except Exception as e:
+                logger.exception("Link state callback failed: %s" % e)
+
+    def __lost(self, reason):
+        if self.__state != LinkState.CONNECTED:
+            return
+        logger.warning("Link lost: %s" % reason)
+        self.__set_state(LinkState.LOST)
+        self.__wake.set()  # reconnect right away
+
+    def __probe(self):
+        """ sends a keep-alive, unless the connection is busy (and thus alive) """
+        if not self.__lock.acquire(False):
+            return
+        try:
+            if self.__state != LinkState.CONNECTED:
+                return
+            self.probes += 1
+            # an AT RV, which has to reach the adapter (not the cache)
+            r = self.connection.ping(deadline=time.time() + self.probe_timeout)
+            if self.connection.status() != OBDStatus.CAR_CONNECTED:
+                self.__lost("adapter stopped answering")
+            elif r.is_null():
+                self.__failures += 1
+                if self.__failures >= self.max_failures:
+                    self.__lost("%d keep-alives unanswered" % self.__failures)
+            else:
+                self.__failures = 0
+        finally:
+            self.__lock.release()
+
+    def __low_power(self):
+        """ puts the adapter in low power, unless it's being used """
+        if not self.__lock.acquire(False):
+            return
+        try:
+            if self.__state != LinkState.CONNECTED or self.connection.in_low_power():
+                return
+            logger.info("No query for %.0f seconds, entering low power" % (time.time() - self.__last_query))
+            self.connection.low_power()
+            if not self.connection.in_low_power():
+                self.__last_query = time.time()  # try again after another idle period
+        finally:
+            self.__lock.release()
+
+    def __connect(self):
+        """ makes one connection attempt, returns whether it succeeded """
+
+        with self.__lock:
+            old = self.connection
+            if old is not None and old.interface is not None:
+                old.close()  # releases the port, the adapter keeps its settings
+
+        # queries aren't blocked while connecting, they get null responses
+        connection = self.factory(self.portstr, **self.kwargs)
+        if connection.status() != OBDStatus.CAR_CONNECTED:
+            connection.close()
+            return False
+
+        with self.__lock:
+            if old is not None:
+                # the learned response times still apply to the same car
+                connection.response_times = old.response_times
+                self.reconnects += 1
+            self.connection = connection
+            self.__failures = 0
+            self.__last_query = time.time()
+            self.__set_state(LinkState.CONNECTED)
+        return True
+
+    def run(self):
+        """ Daemon thread """
+
+        delays = None
+
+        while self.__running:
+
+            if self.__state != LinkState.CONNECTED:
+                self.__set_state(LinkState.CONNECTING)
+                if self.__connect():
+                    delays = None
+                    continue
+                if delays is None:
+                    delays = backoff(self.base_delay, self.max_delay, self.jitter)
+                wait = next(delays)
+                logger.info("Connection failed, retrying in %.1f seconds" % wait)
+            elif self.connection.in_low_power():
+                wait = self.idle  # the next query wakes it up, nothing to check meanwhile
+            elif self.low_power_after is not None and \
+                 time.time() - self.__last_query >= self.low_power_after:
+                self.__low_power()
+                continue
+            else:
+                # the adapter answered recently, no need for a keep-alive yet
+                wait = self.connection.last_activity() + self.idle - time.time()
+                if wait <= 0:
+                    self.__probe()
+                    wait = self.idle
+                if self.low_power_after is not None:
+                    wait = min(wait, self.__last_query + self.low_power_after - time.time())
+
+            self.__wake.wait(wait)
+            self.__wake.clear()
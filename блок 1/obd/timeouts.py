@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+########################################################################
+#                                                                      #
+# python-OBD: A python OBD-II serial module derived from pyobd         #
+#                                                                      #
+# Copyright 2004 Donour Sizemore (donour@uchicago.edu)                 #
+# Copyright 2009 Secons Ltd. (www.obdtester.com)                       #
+# Copyright 2009 Peter J. Creath                                       #
+# Copyright 2016 Brendan Whitfield (brendan-w.com)                     #
+#                                                                      #
+########################################################################
+#                                                                      #
+# timeouts.py                                                          #
+#                                                                      #
+# This file is part of python-OBD (a derivative of pyOBD)              #
+#                                                                      #
+# python-OBD is free software: you can redistribute it and/or modify   #
+# it under the terms of the GNU General Public License as published by #
+# the Free Software Foundation, either version 2 of the License, or    #
+# (at your option) any later version.                                  #
+#                                                                      #
+# python-OBD is distributed in the hope that it will be useful,        #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of       #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the        #
+# GNU General Public License for more details.                         #
+#                                                                      #
+# You should have received a copy of the GNU General Public License    #
+# along with python-OBD.  If not, see <http://www.gnu.org/licenses/>.  #
+#                                                                      #
+########################################################################
+
+
+import logging
+import math
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+"""
+    Adaptive response timeouts
+
+    The ELM waits ~200 ms (AT ST 32) for responses, which is far longer
+    than most ECUs need. TimeoutLearner keeps a window of response times
+    for each (header, command) pair, and proposes a timeout at a high
+    percentile of that distribution plus a margin.
+
+    A NO DATA answer after a learned timeout may simply be an ECU that
+    was slower than usual, so the timeout for that command is backed
+    off (doubled), and slowly brought back down by later responses.
+
+    The learned table is a plain dict, meant to be stored with the rest
+    of a connection profile, and handed back through load().
+"""
+
+# the ELM's AT ST unit, and its range
+ELM_TIMEOUT_STEP = 0.004096  # seconds
+ELM_DEFAULT_TIMEOUT = 0x32 * ELM_TIMEOUT_STEP  # ~205 ms
+MIN_TIMEOUT = 2 * ELM_TIMEOUT_STEP
+MAX_TIMEOUT = 0xFF * ELM_TIMEOUT_STEP
+
+
+class TimeoutLearner:
+    """
+        Learns per command (and per ECU header) response timeouts
+    """
+
+    def __init__(self, percentile=0.95, margin=1.5, min_samples=5, window=32):
+        self.percentile = percentile
+        self.margin = margin  # multiplier applied to the percentile
+        self.min_samples = min_samples  # below this, the default is used
+        self.window = window
+        self.__samples = {}  # key = "header:command", value = deque of seconds
+        self.__backoff = {}  # key = "header:command", value = multiplier >= 1
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def key(cmd):
+        return "%s:%s" % (cmd.header.decode(), cmd.command.decode())
+
+    def record(self, cmd, elapsed):
+        """ records the response time (in seconds) of a successful query """
+        k = self.key(cmd)
+        with self.__lock:
+            self.__samples.setdefault(k, deque(maxlen=self.window)).append(elapsed)
+            # every good response undoes half of the backoff
+            if k in self.__backoff:
+                b = self.__backoff[k] ** 0.5
+                if b < 1.05:
+                    del self.__backoff[k]
+                else:
+                    self.__backoff[k] = b
+
+    def no_data(self, cmd):
+        """ records a NO DATA answer, backing off the learned timeout """
+        k = self.key(cmd)
+        with self.__lock:
+            if len(self.__samples.get(k, [])) < self.min_samples:
+                return  # still using the default timeout, nothing to back off
+            self.__backoff[k] = min(self.__backoff.get(k, 1.0) * 2, 64.0)
+            logger.debug("NO DATA for %s, backing off to x%d" % (k, self.__backoff[k]))
+
+    def timeout(self, cmd):
+        """
+            Returns the learned timeout (in seconds) for the given
+            command, or None if not enough responses were seen.
+        """
+        k = self.key(cmd)
+        with self.__lock:
+            samples = self.__samples.get(k)
+            if samples is None or len(samples) < self.min_samples:
+                return None
+            samples = sorted(samples)
+            backoff = self.__backoff.get(k, 1.0)
+
+        i = min(len(samples) - 1, int(math.ceil(self.percentile * len(samples))) - 1)
+        t = samples[i] * self.margin * backoff
+        return min(max(t, MIN_TIMEOUT), MAX_TIMEOUT)
+
+    def table(self):
+        """
+            Returns the learned state as a JSON-friendly dict:
+            {"header:command": {"samples": [...], "backoff": float}}
+        """
+        with self.__lock:
+            return {k: {"samples": list(s), "backoff": self.__backoff.get(k, 1.0)}
+                    for k, s in self.__samples.items()}
+
+    def load(self, table):
+        """ restores a table previously returned by table() """
+        with self.__lock:
+            for k, v in table.items():
+                self.__samples[k] = deque(v.get("samples", []), maxlen=self.window)
+                if v.get("backoff", 1.0) > 1.0:
+                    self.__backoff[k] = v["backoff"]
+
+    def clear(self):
+        with self.__lock:
+            self.__samples.clear()
+            self.__backoff.clear()
+
+
+def elm_timeout(seconds):
+    """ converts a timeout into an AT ST argument (None restores the default) """
+    if seconds is None:
+        seconds = ELM_DEFAULT_TIMEOUT
+    return b"%02X" % min(0xFF, max(1, int(math.ceil(seconds / ELM_TIMEOUT_STEP))))
@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+
+########################################################################
+#                                                                      #
+# python-OBD: A python OBD-II serial module derived from pyobd         #
+#                                                                      #
+# Copyright 2004 Donour Sizemore (donour@uchicago.edu)                 #
+# Copyright 2009 Secons Ltd. (www.obdtester.com)                       #
+# Copyright 2009 Peter J. Creath                                       #
+# Copyright 2016 Brendan Whitfield (brendan-w.com)                     #
+#                                                                      #
+########################################################################
+#                                                                      #
+# uds.py                                                               #
+#                                                                      #
+# This file is part of python-OBD (a derivative of pyOBD)              #
+#                                                                      #
+# python-OBD is free software: you can redistribute it and/or modify   #
+# it under the terms of the GNU General Public License as published by #
+# the Free Software Foundation, either version 2 of the License, or    #
+# (at your option) any later version.                                  #
+#                                                                      #
+# python-OBD is distributed in the hope that it will be useful,        #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of       #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the        #
+# GNU General Public License for more details.                         #
+#                                                                      #
+# You should have received a copy of the GNU General Public License    #
+# along with python-OBD.  If not, see <http://www.gnu.org/licenses/>.  #
+#                                                                      #
+########################################################################
+
+
+
+import glob
+import json
+import logging
+import os
+
+from .OBDCommand import OBDCommand
+from .protocols import ECU, ECU_HEADER
+from .UnitsAndScaling import Unit
+from .utils import bytes_to_int, bytes_to_hex, twos_comp
+
+logger = logging.getLogger(__name__)
+
+"""
+    UDS (ISO 14229) ReadDataByIdentifier support
+
+    Manufacturer data (battery SOH, gearbox temperatures, injector
+    corrections, etc...) lives behind service 0x22 Data IDentifiers.
+    DIDs are described declaratively in JSON files, which are only
+    read when the DID table is first used:
+
+    {
+        "header": "7E0",
+        "dids": [
+            {"name": "VIN", "did": "F190", "desc": "...", "type": "ascii", "length": 17},
+            {"name": "SOH", "did": "0105", "desc": "...", "type": "uint", "length": 2,
+             "scale": 0.1, "offset": 0, "unit": "percent"}
+        ]
+    }
+
+    Supported types are: uint, int, ascii, hex and bytes. A missing
+    "length" marks a variable length DID, which takes the remainder
+    of the response.
+"""
+
+SID_READ_DATA_BY_ID = 0x22
+SID_TESTER_PRESENT = 0x3E
+SID_NEGATIVE_RESPONSE = 0x7F
+POSITIVE_RESPONSE_OFFSET = 0x40
+
+# NRCs telling that the ECU can't handle several DIDs per request
+# (incorrectMessageLengthOrInvalidFormat, responseTooLong)
+NRC_BATCH_REJECTED = [0x13, 0x14]
+
+# the ELM can only send single frame requests, which leaves
+# room for 3 DIDs (7 data bytes - 1 SID byte) per request
+MAX_DIDS_PER_REQUEST = 3
+
+# default folder of the bundled DID definition files
+DID_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dids")
+
+TESTER_PRESENT = b"3E00"
+
+
+class DIDDecoder:
+    """
+        Compiled form of a declarative DID definition.
+
+        Called with the data bytes following the DID in a positive
+        response, returns the decoded value.
+    """
+
+    TYPES = ["uint", "int", "ascii", "hex", "bytes"]
+
+    def __init__(self, type_="bytes", length=None, scale=1, offset=0, unit=None):
+        if type_ not in self.TYPES:
+            raise ValueError("Unknown DID type '%s'" % type_)
+        self.type = type_
+        self.length = length
+        self.scale = scale
+        self.offset = offset
+        self.unit = unit
+
+    def __call__(self, data):
+        if self.length is not None:
+            if len(data) < self.length:
+                logger.debug("DID data shorter than expected (%d<%d)" % (len(data), self.length))
+                return None
+            data = data[:self.length]
+
+        if self.type in ("uint", "int"):
+            v = bytes_to_int(data)
+            if self.type == "int":
+                v = twos_comp(v, len(data) * 8)
+            v = v * self.scale + self.offset
+            if self.unit is None:
+                return v
+            return Unit.Quantity(v, self.unit)
+        elif self.type == "ascii":
+            return bytes(data).strip(b"\x00 ").decode("ascii", "replace")
+        elif self.type == "hex":
+            return bytes_to_hex(data)
+        else:
+            return bytes(data)
+
+
+def split_response(data, dids):
+    """
+        Splits the data of a positive 0x22 response (including the SID
+        byte) into a dict of {did: data}, following the order and
+        lengths of the requested DIDs.
+
+        Returns None for negative or malformed responses.
+    """
+
+    if len(data) < 1 or data[0] != SID_READ_DATA_BY_ID + POSITIVE_RESPONSE_OFFSET:
+        return None
+
+    values = {}
+    i = 1
+    for n, did in enumerate(dids):
+        if bytes_to_int(data[i:i + 2]) != did.did:
+            logger.debug("Unexpected DID in response, expected %04X" % did.did)
+            return values
+        i += 2
+
+        length = did.decoder.length
+        if length is None:
+            # variable length DIDs are always requested last
+            length = len(data) - i
+
+        values[did] = data[i:i + length]
+        i += length
+
+    return values
+
+
+def negative_response_code(data):
+    """ returns the NRC of a negative response, or None """
+    if len(data) >= 3 and data[0] == SID_NEGATIVE_RESPONSE and data[1] == SID_READ_DATA_BY_ID:
+        return data[2]
+    return None
+
+
+class DIDCommand(OBDCommand):
+    """
+        An OBDCommand reading a single UDS Data IDentifier (service 0x22)
+    """
+
+    def __init__(self, name, desc, did, decoder, header=ECU_HEADER.ENGINE, ecu=ECU.ALL):
+        self.did = did
+        self.decoder = decoder
+        command = ("%02X%04X" % (SID_READ_DATA_BY_ID, did)).encode()
+        OBDCommand.__init__(self, name, desc, command, 0, self.__decode, ecu, False, header)
+
+    def clone(self, **overrides):
+        args = {
+            "name": self.name,
+            "desc": self.desc,
+            "did": self.did,
+            "decoder": self.decoder,
+            "header": self.header,
+            "ecu": self.ecu,
+        }
+        args.update(overrides)
+        return DIDCommand(**args)
+
+    def __decode(self, messages):
+        data = messages[0].data
+        values = split_response(data, [self])
+        if not values:
+            nrc = negative_response_code(data)
+            if nrc is not None:
+                logger.info("%s rejected with NRC 0x%02X" % (self.name, nrc))
+            return None
+        return self.decoder(values[self])
+
+    def __repr__(self):
+        return "DIDCommand(%s, %s, 0x%04X, header=%s)" % (repr(self.name), repr(self.desc),
+                                                         self.did, repr(self.header))
+
+
+class BatchDIDCommand(OBDCommand):
+    """
+        Reads several DIDs in a single 0x22 request.
+
+        The decoded value is a dict of {DIDCommand: value}
+    """
+
+    def __init__(self, dids):
+        self.dids = dids
+        command = ("%02X" % SID_READ_DATA_BY_ID).encode()
+        command += b"".join([("%04X" % d.did).encode() for d in dids])
+        OBDCommand.__init__(self, "DID_BATCH", "Read %d DIDs" % len(dids), command,
+                            0, self.__decode, dids[0].ecu, False, dids[0].header)
+
+    def __decode(self, messages):
+        values = split_response(messages[0].data, self.dids)
+        if values is None:
+            return None
+        return {d: d.decoder(data) for d, data in values.items()}
+
+    def negative_response_code(self, response):
+        """ returns the NRC carried by a response to this command, if any """
+        for m in response.messages:
+            nrc = negative_response_code(m.data)
+            if nrc is not None:
+                return nrc
+        return None
+
+
+def tester_present(header=ECU_HEADER.ENGINE):
+    """ builds a TesterPresent (0x3E) command for the given header """
+    return OBDCommand("TESTER_PRESENT", "UDS Tester Present", TESTER_PRESENT, 0,
+                      is_positive_response, ECU.ALL, False, header)
+
+
+def is_positive_response(messages):
+    """ decoder for commands whose only result is an acknowledgement """
+    return any([m.data[:1] == bytearray([SID_TESTER_PRESENT + POSITIVE_RESPONSE_OFFSET])
+                for m in messages])
+
+
+def batches(dids, limits=None):
+    """
+        Groups DIDs into requests sharing the same header, with at most
+        limits[header] DIDs each (MAX_DIDS_PER_REQUEST by default).
+        Variable length DIDs can only close a request, since their
+        length is taken from the end of the response.
+    """
+
+    limits = limits or {}
+    by_header = {}
+    for d in dids:
+        by_header.setdefault(d.header, []).append(d)
+
+    for header, header_dids in by_header.items():
+        size = limits.get(header, MAX_DIDS_PER_REQUEST)
+        # fixed length DIDs first, so that variable ones end up last
+        header_dids = sorted(header_dids, key=lambda d: d.decoder.length is None)
+        batch = []
+        for d in header_dids:
+            batch.append(d)
+            if len(batch) == size or d.decoder.length is None:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+class DIDs():
+    """
+        Lazily loaded table of DIDCommands, accessible by name or DID:
+
+            obd.dids.VIN
+            obd.dids["VIN"]
+            obd.dids[0xF190]
+    """
+
+    def __init__(self, paths=None):
+        self.__paths = [DID_PATH] if paths is None else list(paths)
+        self.__by_name = None
+        self.__by_did = None
+
+    def add_path(self, path):
+        """ adds a folder (or single file) of DID definitions """
+        self.__paths.append(path)
+        self.__by_name = None  # reload on next access
+        self.__by_did = None
+
+    def __load(self):
+        if self.__by_name is not None:
+            return
+
+        self.__by_name = {}
+        self.__by_did = {}
+
+        for path in self.__paths:
+            if os.path.isdir(path):
+                files = sorted(glob.glob(os.path.join(path, "*.json")))
+            else:
+                files = [path]
+
+            for filename in files:
+                try:
+                    self.__load_file(filename)
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning("Failed to load DID definitions from %s: %s" % (filename, e))
+
+        logger.info("loaded %d DID definitions" % len(self.__by_name))
+
+    def __load_file(self, filename):
+        with open(filename, "r", encoding="utf-8") as f:
+            table = json.load(f)
+
+        header = table.get("header", ECU_HEADER.ENGINE.decode()).encode()
+
+        for d in table["dids"]:
+            decoder = DIDDecoder(d.get("type", "bytes"),
+                                 d.get("length"),
+                                 d.get("scale", 1),
+                                 d.get("offset", 0),
+                                 d.get("unit"))
+            cmd = DIDCommand(d["name"],
+                             d.get("desc", d["name"]),
+                             int(d["did"], 16),
+                             decoder,
+                             d.get("header", header.decode()).encode())
+            self.__by_name[cmd.name] = cmd
+            self.__by_did[cmd.did] = cmd
+
+    def __getitem__(self, key):
+        self.__load()
+        if isinstance(key, int):
+            return self.__by_did[key]
+        return self.__by_name[key]
+
+    def __getattr__(self, name):
+        # only called for names that aren't regular attributes
+        if not name.isupper():
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __contains__(self, key):
+        self.__load()
+        return key in self.__by_name or key in self.__by_did
+
+    def __iter__(self):
+        self.__load()
+        return iter(list(self.__by_name.values()))
+
+    def __len__(self):
+        self.__load()
+        return len(self.__by_name)
+
+
+# export this object
+dids = DIDs()
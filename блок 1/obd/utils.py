@@ -33,8 +33,12 @@
 import errno
 import glob
 import logging
+import os
 import string
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import serial
 
@@ -162,9 +166,8 @@ def try_port(portStr):
     return False
 
 
-def scan_serial():
-    """scan for available ports. return a list of serial names"""
-    available = []
+def candidate_ports():
+    """ returns the platform's list of possible adapter ports """
 
     possible_ports = []
 
@@ -188,8 +191,148 @@ def scan_serial():
 
     # possible_ports += glob.glob('/dev/pts/[0-9]*') # for obdsim
 
-    for port in possible_ports:
-        if try_port(port):
-            available.append(port)
-    print('Available ports: '+str(available))
+    return possible_ports
+
+
+def scan_serial():
+    """scan for available ports. return a list of serial names"""
+
+    possible_ports = candidate_ports()
+
+    # opening a port can block for a while, so try them all at once
+    available = []
+    if possible_ports:
+        with ThreadPoolExecutor(max_workers=min(16, len(possible_ports))) as pool:
+            results = pool.map(try_port, possible_ports)
+        available = [port for port, ok in zip(possible_ports, results) if ok]
+
+    logger.info('Available ports: ' + str(available))
     return available
+
+
+# baud rates tried by the quick ELM handshake, most common first
+PROBE_BAUDS = [38400, 9600, 115200, 57600, 230400, 500000]
+PROBE_TTL_GOOD = 300.0  # seconds a responding port is remembered
+PROBE_TTL_DEAD = 30.0  # seconds a silent/missing port is skipped
+
+# key = (port name, baud rates tried), value = (baud or None, time of probe, device identity)
+_probe_cache = {}
+_probe_lock = threading.Lock()
+
+
+def _device_identity(portStr):
+    """
+        Identifies the device node behind a port name. Re-plugging
+        a device (or udev re-creating its node) changes the inode and
+        ctime. The mtime of a tty moves with every read and write, so
+        it can't be used here.
+    """
+    try:
+        st = os.stat(portStr)
+        return (st.st_ino, st.st_ctime)
+    except OSError:
+        return None  # COM ports, or missing nodes
+
+
+# seconds an ELM needs to come out of low power, after the wake up character
+PROBE_WAKE_DELAY = 1.0
+
+
+def probe_port(portStr, bauds=None, timeout=0.1, wake=False):
+    """
+        Quick ELM handshake: returns the baud rate at which the
+        port answers with a prompt, or None
+
+        With wake=True, a space is sent first, to bring an adapter
+        out of low power (any activity on its RX line wakes it up,
+        whatever the baud rate)
+    """
+
+    bauds = PROBE_BAUDS if bauds is None else bauds
+
+    try:
+        s = serial.serial_for_url(portStr, timeout=timeout, write_timeout=timeout)
+    except (serial.SerialException, OSError, ValueError):
+        return None
+
+    try:
+        if wake:
+            try:
+                s.write(b" ")
+                s.flush()
+            except (serial.SerialException, OSError):
+                return None
+            time.sleep(PROBE_WAKE_DELAY)
+
+        for baud in bauds:
+            try:
+                s.baudrate = baud
+                s.reset_input_buffer()
+                s.write(b"\x7F\x7F\r")  # ELM responds with "?", then its prompt
+                s.flush()
+
+                buffer = bytearray()
+                end = time.time() + timeout
+                while time.time() < end:
+                    buffer.extend(s.read(s.in_waiting or 1))
+                    if buffer.endswith(b">"):
+                        logger.debug("%s answered at %d baud" % (portStr, baud))
+                        return baud
+            except (serial.SerialException, OSError, ValueError):
+                continue  # baud not supported, or write timeout
+    finally:
+        s.close()
+
+    return None
+
+
+def probe_serial(ports=None, bauds=None, use_cache=True, wake=False):
+    """
+        Probes ports concurrently for an ELM adapter (see probe_port()).
+
+        Results are cached with a TTL, and dropped as soon as the
+        device behind the port changes.
+
+        Returns a dict of {port name: baud rate}, for the ports that
+        answered, in the order of `ports`
+    """
+
+    ports = candidate_ports() if ports is None else ports
+    bauds = tuple(PROBE_BAUDS if bauds is None else bauds)
+    now = time.time()
+    results = {}
+    to_probe = []
+
+    with _probe_lock:
+        for port in ports:
+            cached = _probe_cache.get((port, bauds))
+            if use_cache and cached is not None:
+                baud, t, identity = cached
+                ttl = PROBE_TTL_DEAD if baud is None else PROBE_TTL_GOOD
+                if now - t < ttl and identity == _device_identity(port):
+                    results[port] = baud
+                    continue
+            to_probe.append(port)
+
+    if to_probe:
+        with ThreadPoolExecutor(max_workers=min(16, len(to_probe))) as pool:
+            found = list(pool.map(lambda port: probe_port(port, bauds, wake=wake), to_probe))
+
+        with _probe_lock:
+            for port, baud in zip(to_probe, found):
+                _probe_cache[(port, bauds)] = (baud, now, _device_identity(port))
+                results[port] = baud
+
+    answered = {port: results[port] for port in ports if results[port] is not None}
+    logger.info('Ports answering as ELM: ' + str(answered))
+    return answered
+
+
+def forget_port(portStr=None):
+    """ drops the cached probe result of a port (or of all ports) """
+    with _probe_lock:
+        if portStr is None:
+            _probe_cache.clear()
+        else:
+            for key in [k for k in _probe_cache if k[0] == portStr]:
+                del _probe_cache[key]
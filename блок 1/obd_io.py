@@ -67,6 +67,7 @@ class OBDConnection:
             FAST = False
 
         counter = 0
+        delays = obd.supervisor.backoff()  # jittered, doubling from 0.5s
         while counter < RECONNATTEMPTS:
             counter = counter + 1
             wx.PostEvent(self._notify_window, DebugEvent([2, "Connection attempt:" + str(counter)]))
@@ -80,7 +81,7 @@ class OBDConnection:
                 break
             else:
                 self.connection.close()
-            time.sleep(1)
+            time.sleep(next(delays))
 
     def close(self):
         """ Resets device and closes all associated filehandles"""
@@ -65,7 +65,7 @@ import webbrowser  # open browser from python
 #from multiprocessing import Process
 #from multiprocessing import Queue
 
-from obd2_codes import pcodes
+from obd.codes import DTC  # the memory-mapped DTC index (see obd/dtc_index.py)
 #from obd2_codes import ptest
 
 from wx.lib.mixins.listctrl import ListCtrlAutoWidthMixin
@@ -826,54 +826,14 @@ class MyApp(wx.App):
                             else:
                                 wx.PostEvent(self._notify_window, TestEvent([14, 2, "Incomplete"]))
 
-                        response = self.connection.connection.query(obd.commands.MONITOR_MISFIRE_CYLINDER_1)
-                        if response.value != None:
-                            result = response.value.MISFIRE_COUNT
-                            wx.PostEvent(self._notify_window, TestEvent([15, 2, str(result)]))
-                        response = self.connection.connection.query(obd.commands.MONITOR_MISFIRE_CYLINDER_2)
-                        if response.value != None:
-                            result = response.value.MISFIRE_COUNT
-                            wx.PostEvent(self._notify_window, TestEvent([16, 2, str(result)]))
-                        response = self.connection.connection.query(obd.commands.MONITOR_MISFIRE_CYLINDER_3)
-                        if response.value != None:
-                            result = response.value.MISFIRE_COUNT
-                            wx.PostEvent(self._notify_window, TestEvent([17, 2, str(result)]))
-                        response = self.connection.connection.query(obd.commands.MONITOR_MISFIRE_CYLINDER_4)
-                        if response.value != None:
-                            result = response.value.MISFIRE_COUNT
-                            wx.PostEvent(self._notify_window, TestEvent([18, 2, str(result)]))
-                        response = self.connection.connection.query(obd.commands.MONITOR_MISFIRE_CYLINDER_5)
-                        if response.value != None:
-                            result = response.value.MISFIRE_COUNT
-                            wx.PostEvent(self._notify_window, TestEvent([19, 2, str(result)]))
-                        response = self.connection.connection.query(obd.commands.MONITOR_MISFIRE_CYLINDER_6)
-                        if response.value != None:
-                            result = response.value.MISFIRE_COUNT
-                            wx.PostEvent(self._notify_window, TestEvent([20, 2, str(result)]))
-                        response = self.connection.connection.query(obd.commands.MONITOR_MISFIRE_CYLINDER_7)
-                        if response.value != None:
-                            result = response.value.MISFIRE_COUNT
-                            wx.PostEvent(self._notify_window, TestEvent([21, 2, str(result)]))
-                        response = self.connection.connection.query(obd.commands.MONITOR_MISFIRE_CYLINDER_8)
-                        if response.value != None:
-                            result = response.value.MISFIRE_COUNT
-                            wx.PostEvent(self._notify_window, TestEvent([22, 2, str(result)]))
-                        response = self.connection.connection.query(obd.commands.MONITOR_MISFIRE_CYLINDER_9)
-                        if response.value != None:
-                            result = response.value.MISFIRE_COUNT
-                            wx.PostEvent(self._notify_window, TestEvent([23, 2, str(result)]))
-                        response = self.connection.connection.query(obd.commands.MONITOR_MISFIRE_CYLINDER_10)
-                        if response.value != None:
-                            result = response.value.MISFIRE_COUNT
-                            wx.PostEvent(self._notify_window, TestEvent([24, 2, str(result)]))
-                        response = self.connection.connection.query(obd.commands.MONITOR_MISFIRE_CYLINDER_11)
-                        if response.value != None:
-                            result = response.value.MISFIRE_COUNT
-                            wx.PostEvent(self._notify_window, TestEvent([25, 2, str(result)]))
-                        response = self.connection.connection.query(obd.commands.MONITOR_MISFIRE_CYLINDER_12)
-                        if response.value != None:
-                            result = response.value.MISFIRE_COUNT
-                            wx.PostEvent(self._notify_window, TestEvent([26, 2, str(result)]))
+                        # one sweep over the supported misfire MIDs, instead of a query per cylinder
+                        misfire = [obd.commands["MONITOR_MISFIRE_CYLINDER_%d" % n] for n in range(1, 13)]
+                        monitors = self.connection.connection.read_monitors(misfire)
+                        for n, cmd in enumerate(misfire):
+                            response = monitors.get(cmd)
+                            if response is not None and response.value != None:
+                                result = response.value.MISFIRE_COUNT
+                                wx.PostEvent(self._notify_window, TestEvent([15 + n, 2, str(result)]))
 
                     except:
                         traceback.print_exc()
@@ -990,18 +950,15 @@ class MyApp(wx.App):
                     if prevstate != 3:
 
                         wx.PostEvent(self._notify_window, DTCEvent(0))  # clear list
-                        r = self.connection.connection.query(obd.commands.GET_DTC)
                         DTCCODES = []
-                        print ("DTCCODES:",r.value)
-                        if r.value != None:
-                            for dtccode in r.value:
-                                DTCCODES.append((dtccode[0], "Active", dtccode[1]))
-                        r = self.connection.connection.query(obd.commands.FREEZE_DTC)
-                        print ("FREEZECODES:",r.value)
-                        if r.value != None:
-                            dtccode = r.value
-                            if "P0000" not in dtccode:
-                                DTCCODES.append((dtccode[0], "Passive", dtccode[1]))
+                        # stored, pending and permanent DTCs, and the freeze frame DTC, of every ECU
+                        for report in self.connection.connection.read_all_dtcs().values():
+                            for status, codes in (("Active", report.stored), ("Pending", report.pending), ("Permanent", report.permanent)):
+                                for dtccode in codes:
+                                    if (dtccode[0], status, dtccode[1]) not in DTCCODES:
+                                        DTCCODES.append((dtccode[0], status, dtccode[1]))
+                            if report.freeze is not None:
+                                DTCCODES.append((report.freeze[0], "Passive", report.freeze[1]))
 
                         print ("DTCcodes and FREEZEcodes:", DTCCODES)
                         if len(DTCCODES) > 0:
@@ -3315,15 +3272,14 @@ the Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  0211
 
         root = tree.AddRoot("Code Reference")
         proot = root;  # tree.AppendItem(root,"Powertrain (P) Codes")
-        codes = pcodes.keys()
-        codes = sorted(codes)
+        # every code, sorted, from the shared DTC index
         group = ""
-        for c in codes:
+        for c, desc in DTC.prefix(""):
             if c[:3] != group:
                 group_root = tree.AppendItem(proot, c[:3] + "XX")
                 group = c[:3]
             leaf = tree.AppendItem(group_root, c)
-            tree.AppendItem(leaf, pcodes[c])
+            tree.AppendItem(leaf, desc)
 
         diag.SetSize((400, 500))
         diag.Show(True)
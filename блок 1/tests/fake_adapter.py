@@ -0,0 +1,360 @@
+# -*- coding: utf-8 -*-
+
+########################################################################
+#                                                                      #
+# python-OBD: A python OBD-II serial module derived from pyobd         #
+#                                                                      #
+# Copyright 2016 Brendan Whitfield (brendan-w.com)                     #
+#                                                                      #
+########################################################################
+#                                                                      #
+# tests/fake_adapter.py                                                #
+#                                                                      #
+# This file is part of python-OBD (a derivative of pyOBD)              #
+#                                                                      #
+# python-OBD is free software: you can redistribute it and/or modify   #
+# it under the terms of the GNU General Public License as published by #
+# the Free Software Foundation, either version 2 of the License, or    #
+# (at your option) any later version.                                  #
+#                                                                      #
+# python-OBD is distributed in the hope that it will be useful,        #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of       #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the        #
+# GNU General Public License for more details.                         #
+#                                                                      #
+# You should have received a copy of the GNU General Public License    #
+# along with python-OBD.  If not, see <http://www.gnu.org/licenses/>.  #
+#                                                                      #
+########################################################################
+
+"""
+    A simulated ELM327 on 11-bit CAN (protocol 6), with an engine (7E8),
+    a transmission (7E9) and a third ECU (7EA), for testing without
+    hardware.
+
+    Setting FakeAdapter.stn turns the adapters opened next into STN
+    chips, taking STPX commands.
+
+    The adapter keeps the state the library relies on: echo, headers,
+    the header of the requests (AT SH), the receive filter (AT CRA,
+    AT CF/AT CM), low power, and the AT D/ATZ defaults. Answers can be
+    delayed, and are interrupted by any character, like on the chip.
+
+        class MyTest(AdapterTestCase):
+            def test_rpm(self):
+                connection = self.connect()
+                ...
+                self.adapter.log  # the commands it received
+"""
+
+import contextlib
+import io
+import logging
+import threading
+import time
+import unittest
+
+import serial
+from unittest import mock
+
+import obd
+
+
+# request (hex, no spaces) : response frames, with their CAN ID
+ANSWERS = {
+    "0100": ["7E8 06 41 00 BE 3F B8 13", "7E9 06 41 00 80 00 00 01", "7EA 06 41 00 98 18 00 01"],
+    "0120": ["7E8 06 41 20 80 01 A0 01"],
+    "0140": ["7E8 06 41 40 40 00 00 00"],
+    "0101": ["7E8 06 41 01 81 07 65 04"],
+    "0102": ["7E8 04 41 02 01 33"],
+    "0104": ["7E8 03 41 04 80"],
+    "0105": ["7E8 03 41 05 7B"],
+    "010C": ["7E8 04 41 0C 1A F8", "7E9 04 41 0C 1A F0", "7EA 04 41 0C 00 10"],
+    "0902": ["7E8 10 14 49 02 01 31 44 34", "7E8 21 47 50 30 30 52 35 35", "7E8 22 42 31 32 33 34 35 36"],
+    "03": ["7E8 05 43 01 33 00 00", "7E9 02 43 00"],
+    "07": ["7E8 02 47 00"],
+    "0A": ["7E8 02 4A 00"],
+    "04": ["7E8 01 44", "7E9 01 44"],
+}
+
+IDENTIFICATION = "ELM327 v1.5"
+PROTOCOL = "6"  # the protocol stored in the adapter (ATDPN answers "A6")
+
+# ECU response IDs, by the header that addresses them physically
+PHYSICAL = {"7E0": 0x7E8, "7E1": 0x7E9, "7E2": 0x7EA}
+FUNCTIONAL = "7DF"
+
+_real_sleep = time.sleep
+
+
+def fast_sleep(seconds):
+    """ replaces time.sleep, cutting the library's fixed delays short """
+    _real_sleep(min(seconds, 0.001))
+
+
+class FakeAdapter(object):
+    """ stands in for the serial.Serial returned by serial.serial_for_url() """
+
+    instances = []
+    stn = None  # STI answer of the adapters to open, None for an ELM327
+    rate = None  # baud rate of the adapters to open, None to answer at any rate
+    wake_delay = 0.0  # seconds it takes to come out of low power
+
+    def __init__(self, portstr, **kwargs):
+        self.portstr = portstr
+        self.baudrate = 38400
+        self.timeout = kwargs.get("timeout", 10)
+        self.write_timeout = None
+        self.answers = dict(ANSWERS)
+        self.delays = {}  # request : seconds before it's answered
+        self.log = []  # every command received, as sent
+        self.interrupts = 0
+        self.misses = 0  # writes at the wrong baud rate
+        self.is_open = True
+        self.__lock = threading.Lock()
+        self.__data = threading.Condition(self.__lock)
+        self.__out = bytearray()
+        self.__pending = None  # (time due, bytes) of a delayed answer
+        self.__awake = 0.0  # time at which a wake up completes
+        self.__last = ""
+        self.low_power = False
+        self.defaults()
+
+        # the chip stays powered between connections, and keeps its settings
+        for previous in FakeAdapter.instances:
+            if previous.portstr == portstr:
+                self.answers = previous.answers
+                self.delays = previous.delays
+                self.low_power = previous.low_power
+                self.echo, self.headers = previous.echo, previous.headers
+                self.header, self.filter = previous.header, previous.filter
+                self.timeout_setting = previous.timeout_setting
+        FakeAdapter.instances.append(self)
+
+    @classmethod
+    @contextlib.contextmanager
+    def installed(cls):
+        """ makes serial.serial_for_url() open fake adapters, and yields them """
+        cls.instances = []
+        cls.stn = None
+        cls.rate = None
+        cls.wake_delay = 0.0
+        with mock.patch.object(serial, "serial_for_url", cls), \
+             mock.patch.object(time, "sleep", fast_sleep):
+            yield cls.instances
+
+    def defaults(self):
+        """ the power up settings (AT D) """
+        self.echo = True
+        self.headers = False
+        self.header = None  # None = default, functional
+        self.filter = None  # (id, mask), None = automatic
+        self.timeout_setting = 0x32
+
+    # ---------------------------- serial API ----------------------------
+
+    @property
+    def in_waiting(self):
+        with self.__lock:
+            self.__due()
+            return len(self.__out)
+
+    def read(self, n=1):
+        end = time.time() + (self.timeout if self.timeout is not None else 10)
+        with self.__data:
+            while True:
+                self.__due()
+                if self.__out or time.time() >= end:
+                    break
+                wait = end - time.time()
+                if self.__pending is not None:
+                    wait = min(wait, self.__pending[0] - time.time())
+                self.__data.wait(max(0.0005, wait))
+            data = bytes(self.__out[:n])
+            del self.__out[:n]
+            if not self.__in_tune():
+                data = data.replace(b">", b"\xfe")  # garbage, at the wrong rate
+            return data
+
+    def write(self, data):
+        text = data.decode(errors="ignore")
+        with self.__data:
+            if time.time() < self.__awake:
+                pass  # still waking up, the characters are lost
+            elif self.low_power:
+                # any character wakes it up (and is lost), with its defaults
+                self.low_power = False
+                self.defaults()
+                self.__awake = time.time() + self.wake_delay
+                self.__pending = (self.__awake, ("\r" + IDENTIFICATION + "\r\r>").encode())
+            elif self.__pending is not None:
+                # any character stops the ELM
+                self.__pending = None
+                self.interrupts += 1
+                self.__out += b"STOPPED\r\r>"
+            elif not self.__in_tune():
+                self.misses += 1
+                self.__out += b"?\r\r>"
+            elif text.strip("\r") == " ":
+                pass  # a space after the prompt is ignored
+            else:
+                self.__command(text.strip("\r").strip())
+            self.__data.notify_all()
+        return len(data)
+
+    def flushInput(self):
+        with self.__lock:
+            self.__out = bytearray()
+
+    reset_input_buffer = flushInput
+
+    def flushOutput(self):
+        pass
+
+    reset_output_buffer = flushOutput
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.is_open = False
+
+    # ----------------------------- the chip -----------------------------
+
+    def __in_tune(self):
+        return self.rate is None or self.baudrate == self.rate
+
+    def __due(self):
+        if self.__pending is not None and time.time() >= self.__pending[0]:
+            self.__out += self.__pending[1]
+            self.__pending = None
+
+    def __command(self, text):
+        self.log.append(text)
+        key = text.replace(" ", "").upper()
+        if key == "":
+            key = self.__last  # a CR repeats the previous command
+        self.__last = key
+
+        echo = (text + "\r") if self.echo else ""
+        lines = self.__answer(key)
+        body = (echo + "\r".join(lines) + "\r\r>").encode()
+
+        delay = self.delays.get(self.request_of(key), 0)
+        if delay:
+            self.__pending = (time.time() + delay, body)
+        else:
+            self.__out += body
+
+    def __answer(self, key):
+        if key.startswith("\x7f"):
+            return ["?"]
+        if key.startswith("AT"):
+            return self.__at(key[2:])
+        if key.startswith("ST"):
+            return self.__st(key[2:])
+        return self.__request(key)
+
+    def __st(self, cmd):
+        if self.stn is None:
+            return ["?"]  # an ELM327, or a clone
+        if cmd == "I":
+            return [self.stn]
+        if cmd == "DI":
+            return ["OBDLink SX r4.2"]
+        if cmd.startswith("PX"):
+            # STPX D:010C,R:1,T:100
+            params = dict(p.split(":", 1) for p in cmd[2:].split(","))
+            return self.__request(params["D"])
+        return ["OK"]
+
+    @staticmethod
+    def request_of(key):
+        """ the request carried by a command (ie. 010C for 010C1, or an STPX) """
+        if key.startswith("STPX"):
+            return dict(p.split(":", 1) for p in key[4:].split(","))["D"]
+        if len(key) % 2 and not key.startswith("AT"):
+            return key[:-1]
+        return key
+
+    def __at(self, cmd):
+        if cmd == "Z":
+            self.defaults()
+            return ["", IDENTIFICATION]
+        if cmd == "I":
+            return [IDENTIFICATION]
+        if cmd == "D":
+            self.defaults()
+        elif cmd in ("E0", "E1"):
+            self.echo = cmd == "E1"
+        elif cmd in ("H0", "H1"):
+            self.headers = cmd == "H1"
+        elif cmd.startswith("SH"):
+            self.header = cmd[2:]
+        elif cmd == "CRA":
+            self.filter = None
+        elif cmd.startswith("CRA"):
+            self.filter = (int(cmd[3:], 16), 0x7FF)
+        elif cmd.startswith("CF"):
+            self.filter = (int(cmd[2:], 16), (self.filter or (0, 0x7FF))[1])
+        elif cmd.startswith("CM"):
+            self.filter = ((self.filter or (0, 0))[0], int(cmd[2:], 16))
+        elif cmd.startswith("ST"):
+            self.timeout_setting = int(cmd[2:], 16)
+        elif cmd == "DPN":
+            return ["A" + PROTOCOL]
+        elif cmd == "RV":
+            return ["12.6V"]
+        elif cmd == "LP":
+            self.low_power = True
+        return ["OK"]
+
+    def __request(self, key):
+        # drop the response count of the ELM (ie. 010C1)
+        if len(key) % 2 and key[:-1] in self.answers:
+            key = key[:-1]
+
+        frames = [f for f in self.answers.get(key, []) if self.__receives(int(f.split()[0], 16))]
+        if not frames:
+            return ["NO DATA"]
+        if not self.headers:
+            frames = [f.split(" ", 1)[1] for f in frames]
+        return frames
+
+    def __receives(self, can_id):
+        """ whether a response frame makes it to the serial line """
+        if self.header not in (None, FUNCTIONAL) and PHYSICAL.get(self.header) != can_id:
+            return False  # physically addressed to another ECU
+        if self.filter is not None:
+            id_, mask = self.filter
+            return (can_id & mask) == (id_ & mask)
+        return True
+
+
+class AdapterTestCase(unittest.TestCase):
+    """ opens the connections of a test on fake adapters, quietly """
+
+    def setUp(self):
+        patches = FakeAdapter.installed()
+        self.adapters = patches.__enter__()
+        self.addCleanup(patches.__exit__, None, None, None)
+        # the library prints every command it writes, and logs the
+        # unsupported commands that tests send on purpose
+        quiet = contextlib.redirect_stdout(io.StringIO())
+        quiet.__enter__()
+        self.addCleanup(quiet.__exit__, None, None, None)
+        logger = logging.getLogger("obd")
+        self.addCleanup(logger.setLevel, logger.level)
+        logger.setLevel(logging.ERROR)
+
+    @property
+    def adapter(self):
+        """ the adapter of the last connection """
+        return self.adapters[-1]
+
+    def connect(self, **kwargs):
+        kwargs.setdefault("fast", False)
+        connection = obd.OBD("fake", **kwargs)
+        self.addCleanup(connection.close)
+        self.assertEqual(connection.status(), obd.OBDStatus.CAR_CONNECTED)
+        return connection
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+import obd
+from obd import agent
+from obd.utils import OBDStatus
+
+from . import fake_adapter
+from .fake_adapter import AdapterTestCase, _real_sleep
+
+
+# MIDs 01 and 02, one test each
+MONITOR_ANSWERS = {
+    "0600": ["7E8 06 46 00 C0 00 00 00"],
+    "060102": ["7E8 10 13 46 01 01 01 0B B0", "7E8 21 0B 00 0C 00 02 01 01",
+               "7E8 22 00 10 00 00 00 20"],
+}
+
+
+class AgentTest(AdapterTestCase):
+
+    def setUp(self):
+        super(AgentTest, self).setUp()
+        answers = mock.patch.dict(fake_adapter.ANSWERS, MONITOR_ANSWERS)
+        answers.start()
+        self.addCleanup(answers.stop)
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.connection = self.connect()
+        self.agent = agent.Agent(self.connection, os.path.join(directory, "obd.sock"))
+        self.agent.start()
+        self.addCleanup(self.agent.stop)
+
+    def client(self, cls=agent.AgentOBD):
+        client = cls(agent.URL_SCHEME + self.agent.path)
+        self.addCleanup(client.close)
+        return client
+
+    def test_query(self):
+        client = self.client()
+        self.assertEqual(client.status(), OBDStatus.CAR_CONNECTED)
+        self.assertEqual(client.query(obd.commands.RPM).value.magnitude, 1726.0)
+
+    def test_commands_keep_their_fast_flag(self):
+        self.connection.fast = True
+        self.connection.set_ttl(obd.commands.ELM_VOLTAGE, None)
+        client = self.client()
+        del self.adapter.log[:]
+        for _ in range(2):
+            client.query(obd.commands.ELM_VOLTAGE)
+            client.query(obd.commands.GET_DTC)
+        # neither command takes a response count
+        self.assertEqual(self.adapter.log, ["ATRV", "03", "ATRV", "03"])
+
+    def test_known_commands_keep_their_ttl(self):
+        client = self.client()
+        del self.adapter.log[:]
+        self.assertEqual(client.query(obd.commands.ELM_VOLTAGE).value.magnitude, 12.6)
+        self.assertEqual(client.query(obd.commands.ELM_VOLTAGE).value.magnitude, 12.6)
+        self.assertEqual(self.adapter.log, ["ATRV"])
+
+    def test_vin_selects_the_dtc_descriptions(self):
+        with mock.patch.object(obd.dtc_index, "notify_vin") as notify_vin:
+            vin = self.client().query(obd.commands.VIN, force=True).value
+        notify_vin.assert_called_once_with(vin)
+
+    def test_query_all_ecus(self):
+        responses = self.client().query_all_ecus(obd.commands.RPM)
+        expected = self.connection.query_all_ecus(obd.commands.RPM)
+        self.assertEqual(len(responses), 3)
+        self.assertEqual({e: r.value for e, r in responses.items()},
+                         {e: r.value for e, r in expected.items()})
+
+    def test_read_all_dtcs(self):
+        reports = self.client().read_all_dtcs()
+        expected = self.connection.read_all_dtcs()
+        self.assertEqual({e: str(r) for e, r in reports.items()},
+                         {e: str(r) for e, r in expected.items()})
+        self.assertEqual([c for c, _ in reports[0].stored], ["P0133"])
+
+    def test_read_dids(self):
+        self.adapter.answers["22F190F186"] = ["7E8 10 18 62 F1 90 31 44 34", "7E8 21 47 50 30 30 52 35 35",
+                                              "7E8 22 42 31 32 33 34 35 36", "7E8 23 F1 86 02 00 00 00"]
+        responses = self.client().read_dids([obd.dids.VIN, obd.dids.ACTIVE_DIAGNOSTIC_SESSION])
+        self.assertEqual(responses[obd.dids.VIN].value, "1D4GP00R55B123456")
+        self.assertEqual(responses[obd.dids.ACTIVE_DIAGNOSTIC_SESSION].value, 2)
+
+    def test_read_monitors(self):
+        responses = self.client().read_monitors()
+        self.assertEqual(len(responses), 2)
+        self.assertIn("060102", self.adapter.log)
+
+    def test_polling_backs_off_while_disconnected(self):
+        with mock.patch.object(self.connection, "status", lambda: OBDStatus.ELM_CONNECTED):
+            client = self.client(agent.AgentAsync)
+            client.watch(obd.commands.RPM, force=True)
+            del self.adapter.log[:]
+            client.start()
+            _real_sleep(0.4)
+            self.assertNotIn("010C", self.adapter.log)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from obd.elm327 import ELM327
+
+from .fake_adapter import AdapterTestCase, FakeAdapter
+
+
+class AutoBaudTest(AdapterTestCase):
+
+    def setUp(self):
+        super(AutoBaudTest, self).setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.history = os.path.join(directory, "bauds.json")
+        FakeAdapter.rate = 115200
+
+    def test_history_is_opt_in(self):
+        self.assertIsNone(ELM327.BAUD_HISTORY)
+        connection = self.connect()
+        self.assertEqual(connection.interface.baudrate(), 115200)
+
+    def test_history(self):
+        self.connect(baud_history=self.history)
+        self.assertGreater(self.adapter.misses, 0)  # 38400 and 9600 are tried first
+        with open(self.history) as f:
+            self.assertEqual(json.load(f), {"fake": {"115200": 1}})
+        self.assertEqual(os.listdir(os.path.dirname(self.history)), ["bauds.json"])
+
+        # the rate that worked is tried first
+        connection = self.connect(baud_history=self.history)
+        self.assertEqual(connection.interface.baudrate(), 115200)
+        self.assertEqual(self.adapter.misses, 0)
+        with open(self.history) as f:
+            self.assertEqual(json.load(f), {"fake": {"115200": 2}})
+
+    def test_unwritable_history(self):
+        missing = os.path.join(self.history, "missing", "bauds.json")
+        connection = self.connect(baud_history=missing)
+        self.assertEqual(connection.interface.baudrate(), 115200)
+
+    def test_wireless_attempt_timeout(self):
+        FakeAdapter.rate = 9600  # after a failed attempt at 38400
+        start = time.time()
+        ELM327("/dev/rfcomm0", None, None, 0.1).close()
+        self.assertGreaterEqual(time.time() - start, ELM327._WIRELESS_BAUD_ATTEMPT_TIMEOUT)
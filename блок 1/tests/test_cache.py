@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+import obd
+
+from .fake_adapter import AdapterTestCase, _real_sleep
+
+
+class CacheTest(AdapterTestCase):
+
+    def sent(self, request):
+        return self.adapter.log.count(request)
+
+    def test_commands_with_a_ttl_are_cached(self):
+        connection = self.connect()
+        del self.adapter.log[:]
+        hits = connection.cache_hits
+        first = connection.query(obd.commands.STATUS)
+        second = connection.query(obd.commands.STATUS)
+        self.assertIs(first, second)
+        self.assertEqual(self.sent("0101"), 1)
+        self.assertEqual(connection.cache_hits, hits + 1)
+
+    def test_commands_without_a_ttl_always_go_to_the_bus(self):
+        connection = self.connect()
+        del self.adapter.log[:]
+        connection.query(obd.commands.RPM)
+        connection.query(obd.commands.RPM)
+        self.assertEqual(self.sent("010C"), 2)
+
+    def test_null_responses_are_not_cached(self):
+        connection = self.connect()
+        del self.adapter.log[:]
+        self.assertTrue(connection.query(obd.commands.FUEL_LEVEL, force=True).is_null())
+        connection.query(obd.commands.FUEL_LEVEL, force=True)
+        self.assertEqual(self.sent("012F"), 2)
+
+    def test_set_ttl(self):
+        connection = self.connect()
+        connection.set_ttl(obd.commands.STATUS, None)
+        connection.set_ttl(obd.commands.RPM, 60)
+        del self.adapter.log[:]
+        for _ in range(2):
+            connection.query(obd.commands.STATUS)
+            connection.query(obd.commands.RPM)
+        self.assertEqual(self.sent("0101"), 2)
+        self.assertEqual(self.sent("010C"), 1)
+
+    def test_expiry(self):
+        connection = self.connect()
+        connection.set_ttl(obd.commands.RPM, 0.05)
+        del self.adapter.log[:]
+        connection.query(obd.commands.RPM)
+        _real_sleep(0.1)
+        connection.query(obd.commands.RPM)
+        self.assertEqual(self.sent("010C"), 2)
+
+    def test_clear_dtc_invalidates(self):
+        connection = self.connect()
+        connection.query(obd.commands.STATUS)
+        connection.query(obd.commands.ELM_VERSION)
+        connection.query(obd.commands.CLEAR_DTC)
+        del self.adapter.log[:]
+        connection.query(obd.commands.STATUS)
+        connection.query(obd.commands.ELM_VERSION)
+        self.assertEqual(self.adapter.log, ["0101"])  # the adapter didn't change
+
+    def test_invalidate(self):
+        connection = self.connect()
+        connection.query(obd.commands.STATUS)
+        connection.query(obd.commands.ELM_VERSION)
+        entries = connection.cache_stats()["entries"]
+        connection.invalidate(obd.commands.ELM_VERSION)
+        self.assertEqual(connection.cache_stats()["entries"], entries - 1)
+        del self.adapter.log[:]
+        connection.query(obd.commands.STATUS)
+        connection.query(obd.commands.ELM_VERSION)
+        self.assertEqual(self.adapter.log, ["ATI"])
+        self.assertEqual(connection.cache_stats()["entries"], entries)
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+import obd
+
+from .fake_adapter import AdapterTestCase
+
+
+class CANFilterTest(AdapterTestCase):
+
+    def test_single_ecu_is_addressed_physically(self):
+        connection = self.connect(can_filter=True)
+        del self.adapter.log[:]
+        self.assertEqual(connection.query(obd.commands.RPM).value.magnitude, 1726.0)
+        self.assertEqual(self.adapter.log[:2], ["AT SH 7E0", "AT CRA 7E8"])
+        self.assertEqual(len(connection.query(obd.commands.RPM).messages), 1)
+
+    def test_every_ecu_is_addressed_functionally(self):
+        connection = self.connect(can_filter=True)
+        connection.query(obd.commands.RPM)
+        self.assertEqual(sorted(connection.query_all_ecus(obd.commands.RPM)), [0, 1, 2])
+        self.assertEqual((self.adapter.header, self.adapter.filter), ("7DF", None))
+
+    def test_frame_counts_follow_the_addressing(self):
+        connection = self.connect(can_filter=True, fast=True)
+        connection.query(obd.commands.RPM)
+        del self.adapter.log[:]
+        self.assertEqual(sorted(connection.query_all_ecus(obd.commands.RPM)), [0, 1, 2])
+        self.assertEqual(self.adapter.log[-1], "010C")
+        connection.query(obd.commands.RPM)
+        self.assertEqual(self.adapter.log[-1], "010C1")
+
+    def test_close_restores_the_addressing(self):
+        connection = self.connect(can_filter=True)
+        connection.query(obd.commands.RPM)
+        self.assertEqual((self.adapter.header, self.adapter.filter), ("7E0", (0x7E8, 0x7FF)))
+        connection.close()
+        self.assertEqual((self.adapter.header, self.adapter.filter), ("7DF", None))
+
+    def test_close_restores_a_custom_header(self):
+        connection = self.connect()
+        self.adapter.answers["3E00"] = ["7E9 02 7E 00"]
+        connection.tester_present(b"7E1")
+        connection.close()
+        self.assertEqual(self.adapter.header, "7DF")
+
+    def test_first_query_clears_a_stale_filter(self):
+        self.connect()
+        # sent before the first query of the OBD class (the adapter
+        # already sent its own 0100 while resuming the protocol)
+        log = self.adapter.log
+        self.assertIn("AT CRA", log)
+        self.assertEqual(log[log.index("AT CRA") + 1], "0100")
+
+    def test_untouched_adapter_is_left_alone(self):
+        connection = self.connect()
+        connection.query(obd.commands.RPM)
+        del self.adapter.log[:]
+        connection.close()
+        self.assertEqual(self.adapter.log, [])
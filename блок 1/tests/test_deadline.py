@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+
+import obd
+
+from .fake_adapter import AdapterTestCase
+
+
+class DeadlineTest(AdapterTestCase):
+
+    def test_answer_before_the_deadline(self):
+        connection = self.connect()
+        self.adapter.delays["010C"] = 0.05
+        r = connection.query(obd.commands.RPM, deadline=time.time() + 2.0)
+        self.assertNotIsInstance(r, obd.TimeoutResponse)
+        self.assertEqual(r.value.magnitude, 1726.0)
+        self.assertEqual(self.adapter.interrupts, 0)
+
+    def test_deadline_interrupts_the_adapter(self):
+        connection = self.connect()
+        self.adapter.delays["010C"] = 5.0
+        start = time.time()
+        r = connection.query(obd.commands.RPM, deadline=time.time() + 0.2)
+        self.assertIsInstance(r, obd.TimeoutResponse)
+        self.assertFalse(r.cancelled)
+        self.assertTrue(r.is_null())
+        self.assertEqual(str(r), "Timed out")
+        self.assertLess(time.time() - start, 2.0)
+        self.assertEqual(self.adapter.interrupts, 1)
+
+        # the adapter is back at its prompt, and the next query works
+        del self.adapter.delays["010C"]
+        self.assertEqual(connection.query(obd.commands.RPM).value.magnitude, 1726.0)
+
+    def test_expired_deadline(self):
+        connection = self.connect()
+        del self.adapter.log[:]
+        r = connection.query(obd.commands.RPM, deadline=time.time() - 1)
+        self.assertIsInstance(r, obd.TimeoutResponse)
+        self.assertEqual(self.adapter.log, [])
+
+    def test_cancel_from_another_thread(self):
+        connection = self.connect()
+        self.adapter.delays["010C"] = 5.0
+        token = obd.CancelToken()
+        threading.Timer(0.2, token.cancel).start()
+        start = time.time()
+        r = connection.query(obd.commands.RPM, cancel=token)
+        self.assertIsInstance(r, obd.TimeoutResponse)
+        self.assertTrue(r.cancelled)
+        self.assertEqual(str(r), "Cancelled")
+        self.assertLess(time.time() - start, 2.0)
+
+        # a cancelled token stays cancelled
+        del self.adapter.delays["010C"]
+        self.assertTrue(connection.query(obd.commands.RPM, cancel=token).cancelled)
+        self.assertEqual(connection.query(obd.commands.RPM).value.magnitude, 1726.0)
+
+    def test_cached_responses_ignore_the_deadline(self):
+        connection = self.connect()
+        r = connection.query(obd.commands.STATUS)
+        self.assertIs(connection.query(obd.commands.STATUS, deadline=time.time() - 1), r)
+
+
+class AsyncDeadlineTest(AdapterTestCase):
+
+    def test_query_timeout(self):
+        connection = obd.Async("fake", fast=False, query_timeout=0.2)
+        self.addCleanup(connection.close)
+        self.adapter.delays["010C"] = 5.0
+        responses = []
+        connection.watch(obd.commands.RPM, callback=responses.append)
+        connection.start()
+        deadline = time.time() + 3.0
+        while not responses and time.time() < deadline:
+            time.sleep(0.01)
+        connection.stop()
+        self.assertIsInstance(responses[0], obd.TimeoutResponse)
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from obd import dtc_index
+from obd.dtc_index import DTCIndex, DTCTable, build_index
+
+
+GENERIC = {
+    "P0133": "O2 Sensor Circuit Slow Response",
+    "P0300": "Random/Multiple Cylinder Misfire Detected",
+    "P0301": "Cylinder 1 Misfire Detected",
+    "P0302": "Cylinder 2 Misfire Detected",
+    "U0100": "Lost Communication With ECM/PCM",
+}
+
+BRAND = {
+    "P0301": "Zylinder 1 Fehlzündung",
+    "P1234": "Manufacturer specific",
+}
+
+
+class DTCIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = DTCIndex(build_index(GENERIC), "test")
+
+    def test_lookup(self):
+        self.assertEqual(len(self.index), 5)
+        self.assertEqual(self.index["P0133"], GENERIC["P0133"])
+        self.assertEqual(dict(self.index), GENERIC)
+        self.assertEqual(list(self.index), sorted(GENERIC))
+        self.assertNotIn("P0134", self.index)
+        self.assertNotIn("P013", self.index)
+        self.assertNotIn("P01333", self.index)  # longer than the codes
+        self.assertNotIn("Pé133", self.index)
+        self.assertIsNone(self.index.get("B0001"))
+        with self.assertRaises(KeyError):
+            self.index["C0000"]
+
+    def test_prefix(self):
+        self.assertEqual([c for c, _ in self.index.prefix("P030")], ["P0300", "P0301", "P0302"])
+        self.assertEqual(self.index.prefix("P03"), self.index.prefix("P030"))
+        self.assertEqual(self.index.prefix("B"), [])
+        self.assertEqual(len(self.index.prefix("")), 5)
+
+    def test_unicode_descriptions(self):
+        index = DTCIndex(build_index(BRAND))
+        self.assertEqual(index["P0301"], BRAND["P0301"])
+
+    def test_empty(self):
+        index = DTCIndex(build_index({}))
+        self.assertEqual(len(index), 0)
+        self.assertNotIn("P0133", index)
+
+    def test_invalid(self):
+        for data in [b"", b"OBDDTC", b"NOTDTC" + build_index(GENERIC)[6:], build_index(GENERIC)[:40]]:
+            with self.assertRaises(ValueError):
+                DTCIndex(data)
+
+    def test_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "brand.idx")
+        build_index(BRAND, path)
+        self.assertEqual(os.listdir(directory), ["brand.idx"])
+
+        index = DTCIndex(path)
+        self.addCleanup(index.close)
+        self.assertEqual(index.name, "brand")
+        self.assertEqual(dict(index), BRAND)
+
+
+class DTCTableTest(unittest.TestCase):
+
+    def setUp(self):
+        self.table = DTCTable(DTCIndex(build_index(GENERIC)))
+        self.brand = DTCIndex(build_index(BRAND), "brand")
+
+    def test_overlays(self):
+        self.assertEqual(self.table["P0301"], GENERIC["P0301"])
+        self.table.add_overlay(self.brand)
+        self.assertEqual(self.table["P0301"], BRAND["P0301"])
+        self.assertEqual(self.table["P1234"], BRAND["P1234"])
+        self.assertEqual(self.table["P0300"], GENERIC["P0300"])
+        self.assertEqual(len(self.table), 6)
+
+        latest = DTCIndex(build_index({"P0301": "latest"}))
+        self.table.add_overlay(latest)
+        self.table.add_overlay(self.brand)  # moves it back in front
+        self.assertEqual(self.table.overlays(), [self.brand, latest])
+        self.assertEqual(self.table["P0301"], BRAND["P0301"])
+
+        self.table.remove_overlay(self.brand)
+        self.table.remove_overlay(latest)
+        self.assertNotIn("P1234", self.table)
+        self.assertEqual(self.table.get("P1234", ""), "")
+
+    def test_prefix(self):
+        self.table.add_overlay(self.brand)
+        self.assertEqual(self.table.prefix("P030"), [
+            ("P0300", GENERIC["P0300"]),
+            ("P0301", BRAND["P0301"]),
+            ("P0302", GENERIC["P0302"]),
+        ])
+
+
+class GenericIndexTest(unittest.TestCase):
+
+    def test_bundled_index_matches_its_source(self):
+        with open(dtc_index.GENERIC_SOURCE, "r", encoding="utf-8") as f:
+            source = json.load(f)
+        index = dtc_index.load_generic()
+        self.addCleanup(index.close)
+        self.assertEqual(len(index), len(source))
+        for code in list(source)[::97]:
+            self.assertEqual(index[code], source[code])
+
+    def test_describe(self):
+        self.assertEqual(dtc_index.describe("P0133"), "O2 Sensor Circuit Slow Response")
+        self.assertEqual(dtc_index.describe("P0000"), "")
+
+        dtc_index.set_description_provider(lambda code: "provided" if code == "P0133" else None)
+        self.addCleanup(dtc_index.set_description_provider, None)
+        self.assertEqual(dtc_index.describe("P0133"), "provided")
+        self.assertEqual(dtc_index.describe("P0300"), dtc_index.dtc_table()["P0300"])
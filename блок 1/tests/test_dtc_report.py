@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from obd.OBDResponse import DTCReport
+
+from .fake_adapter import AdapterTestCase
+
+
+class DTCReportTest(unittest.TestCase):
+
+    def test_empty(self):
+        report = DTCReport()
+        self.assertEqual(len(report), 0)
+        self.assertEqual(str(report), "No DTCs to report")
+
+    def test_codes_are_counted_once(self):
+        report = DTCReport()
+        report.stored = [("P0133", "O2 Sensor Circuit Slow Response")]
+        report.pending = [("P0133", "O2 Sensor Circuit Slow Response"), ("P0300", "Misfire")]
+        report.freeze = ("P0300", "Misfire")
+        self.assertEqual(len(report), 2)
+        self.assertEqual(str(report).splitlines(), [
+            "P0133 (stored): O2 Sensor Circuit Slow Response",
+            "P0133 (pending): O2 Sensor Circuit Slow Response",
+            "P0300 (pending): Misfire",
+            "P0300 (freeze frame): Misfire",
+        ])
+
+
+class ReadAllDTCsTest(AdapterTestCase):
+
+    def test_reports_per_ecu(self):
+        connection = self.connect()
+        self.adapter.answers["07"] = ["7E8 02 47 00", "7E9 04 47 03 00 00"]
+        self.adapter.answers["0A"] = ["7E8 04 4A 01 33 00"]
+        reports = connection.read_all_dtcs()
+
+        self.assertEqual(sorted(reports), [0, 1])
+        engine, transmission = reports[0], reports[1]
+        self.assertEqual([c for c, _ in engine.stored], ["P0133"])
+        self.assertEqual([c for c, _ in engine.permanent], ["P0133"])
+        self.assertEqual(engine.pending, [])
+        self.assertEqual(len(engine), 1)
+        self.assertEqual(transmission.stored, [])
+        self.assertEqual([c for c, _ in transmission.pending], ["P0300"])
+        self.assertIsNone(transmission.freeze)  # FREEZE_DTC isn't supported
+
+    def test_no_answer(self):
+        connection = self.connect()
+        for request in ("03", "07", "0A"):
+            self.adapter.answers[request] = []
+        self.assertEqual(connection.read_all_dtcs(), {})
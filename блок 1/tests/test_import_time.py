@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# microseconds, cumulative. Loading the unit registry and the DTC
+# tables up front took ~1 s, a lazy import takes well under 0.1 s.
+BUDGET = 400000
+
+# only loaded by the first query that needs them
+LAZY = ["pint", "numpy", "obd.code_tables"]
+
+
+class ImportTimeTest(unittest.TestCase):
+
+    def test_import_obd(self):
+        script = "import sys, obd; print(' '.join(m for m in %r if m in sys.modules))" % LAZY
+        p = subprocess.run([sys.executable, "-X", "importtime", "-c", script], cwd=ROOT,
+                           stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        self.assertEqual(p.returncode, 0, p.stderr)
+        self.assertEqual(p.stdout.split(), [])
+
+        # import time:  self [us] | cumulative | imported package
+        total = re.search(r"^import time:\s+\d+ \|\s+(\d+) \| obd$", p.stderr, re.M)
+        self.assertIsNotNone(total, p.stderr)
+        self.assertLess(int(total.group(1)), BUDGET)
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+import obd
+from obd.j1939 import not_available
+from obd.protocols import SAE_J1939
+
+
+VIN_BAM = [
+    "18ECFF00 20 12 00 03 FF EC FE 00",
+    "18EBFF00 01 31 48 47 42 48 34 31",
+    "18EBFF00 02 4A 58 4D 4E 31 30 39",
+    "18EBFF00 03 31 38 36 2A FF FF FF",
+]
+
+DM1_BAM = [
+    "18ECFF00 20 0A 00 02 FF CA FE 00",
+    "18EBFF00 01 04 FF 6E 00 04 01 BE",
+    "18EBFF00 02 00 03 05 FF FF FF FF",
+]
+
+
+class PGNDecodingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.protocol = SAE_J1939([])
+
+    def decode(self, cmd, lines):
+        return cmd(self.protocol(lines)).value
+
+    def test_single_frame(self):
+        value = self.decode(obd.pgns.EEC1, ["0CF00400 F0 7D 7D A0 1A FF FF FF"])
+        self.assertEqual(value["ENGINE_SPEED"].magnitude, 852.0)
+        self.assertEqual(value["ACTUAL_ENGINE_TORQUE"].magnitude, 0)
+
+    def test_not_available_parameters(self):
+        value = self.decode(obd.pgns.ET1, ["18FEEE00 8C 72 40 23 FF FF FF FF"])
+        self.assertEqual(value["COOLANT_TEMP"].magnitude, 100)
+        self.assertEqual(value["FUEL_TEMP"].magnitude, 74)
+
+    def test_bam_reassembly(self):
+        self.assertEqual(self.decode(obd.pgns.VI, VIN_BAM), {"VIN": "1HGBH41JXMN109186"})
+
+    def test_missing_packet(self):
+        self.assertIsNone(self.decode(obd.pgns.VI, VIN_BAM[:2] + VIN_BAM[3:]))
+
+    def test_not_available(self):
+        self.assertTrue(not_available(0xFF, 8))
+        self.assertFalse(not_available(0xFA, 8))
+        self.assertFalse(not_available(0xFAFF, 16))
+        self.assertTrue(not_available(0xFB00, 16))
+        self.assertTrue(not_available(0b11, 2))
+        self.assertFalse(not_available(0b01, 2))
+
+    def test_lookup(self):
+        self.assertIs(obd.pgns[61444], obd.pgns.EEC1)
+        self.assertIs(obd.pgns["EEC1"], obd.pgns.EEC1)
+        self.assertIn(65226, obd.pgns)
+
+
+class FakeInterface(object):
+    """ plays monitored lines back, like ELM327.monitor() """
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.cmd = None
+
+    def monitor(self, cmd, callback, running):
+        self.cmd = cmd
+        for line in self.lines:
+            if not running():
+                break
+            callback(line)
+
+
+class FakeConnection(object):
+
+    def __init__(self, lines):
+        self.interface = FakeInterface(lines)
+
+    def protocol_id(self):
+        return "A"
+
+
+class PGNMonitorTest(unittest.TestCase):
+
+    def monitor(self, cmds, lines):
+        connection = FakeConnection(lines)
+        received = []
+        monitor = obd.PGNMonitor(connection, cmds)
+        monitor.start(lambda *args: received.append(args))
+        monitor.stop()
+        return connection.interface.cmd, received
+
+    def test_reassembles_and_filters(self):
+        lines = ["0CF00400 F0 7D 7D A0 1A FF FF FF", "18FEEE00 8C 72 40 23 FF FF FF FF"] + DM1_BAM + ["BUFFER FULL"]
+        cmd, received = self.monitor([obd.pgns.EEC1, obd.pgns.DM1], lines)
+        self.assertEqual(cmd, b"ATMA")
+        self.assertEqual([(c, sa) for c, sa, _ in received], [(obd.pgns.EEC1, 0), (obd.pgns.DM1, 0)])
+        self.assertEqual(received[0][2]["ENGINE_SPEED"].magnitude, 852.0)
+        self.assertEqual(received[1][2], {"ACTIVE_DTCS": [(110, 4, 1), (190, 3, 5)]})
+
+    def test_single_pgn_is_filtered_by_the_adapter(self):
+        cmd, received = self.monitor([obd.pgns.EEC1], ["0CF00400 F0 7D 7D A0 1A FF FF FF"])
+        self.assertEqual(cmd, b"ATMPF004")
+        self.assertEqual(len(received), 1)
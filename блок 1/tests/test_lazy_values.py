@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+import copy
+import pickle
+import unittest
+
+import obd
+from obd.OBDResponse import Status, Monitor, MonitorTest, StatusTest
+from obd.protocols import ISO_15765_4_11bit_500k
+
+# MIL on, 1 DTC, spark ignition
+SPARK = 0x81076504
+# compression ignition
+COMPRESSION = 0x000F3A12
+
+# MID 01: TIDs 01 and 05
+MID_01 = bytes.fromhex("01 01 01 0BB0 0B00 0C00"
+                       "01 05 10 0010 0000 0020".replace(" ", ""))
+
+COPIES = [
+    ("copy", copy.copy),
+    ("deepcopy", copy.deepcopy),
+    ("pickle", lambda value: pickle.loads(pickle.dumps(value))),
+]
+
+
+def _states_of(status, names):
+    return [(getattr(status, n).available, getattr(status, n).complete) for n in names]
+
+
+class StatusValueTest(unittest.TestCase):
+
+    NAMES = ["MISFIRE_MONITORING", "CATALYST_MONITORING", "HEATED_CATALYST_MONITORING",
+             "EVAPORATIVE_SYSTEM_MONITORING", "EGR_VVT_SYSTEM_MONITORING",
+             "NMHC_CATALYST_MONITORING", "BOOST_PRESSURE_MONITORING"]
+
+    def test_spark(self):
+        s = Status(SPARK)
+        self.assertTrue(s.MIL)
+        self.assertEqual(s.DTC_count, 1)
+        self.assertEqual(s.ignition_type, "spark")
+        self.assertEqual(_states_of(s, self.NAMES), [(True, True), (True, True), (False, True), (True, False),
+                                                     (False, True), (False, False), (False, False)])
+        self.assertEqual(s.CATALYST_MONITORING.name, "CATALYST_MONITORING")
+
+    def test_compression(self):
+        s = Status(COMPRESSION)
+        self.assertFalse(s.MIL)
+        self.assertEqual(s.ignition_type, "compression")
+        self.assertEqual(_states_of(s, self.NAMES), [(True, True), (False, False), (False, False), (False, False),
+                                                     (False, True), (False, True), (True, True)])
+
+    def test_null(self):
+        s = Status()
+        self.assertFalse(s.MIL)
+        self.assertEqual(s.DTC_count, 0)
+        self.assertEqual(s.ignition_type, "")
+        self.assertIsInstance(s.CATALYST_MONITORING, StatusTest)
+        self.assertFalse(s.CATALYST_MONITORING.available)
+        with self.assertRaises(AttributeError):
+            s.NOT_A_TEST
+
+    def test_copies(self):
+        for word in (SPARK, COMPRESSION, None):
+            for how, copier in COPIES:
+                s = copier(Status(word))
+                self.assertEqual((s.MIL, s.DTC_count, s.ignition_type),
+                                 (Status(word).MIL, Status(word).DTC_count, Status(word).ignition_type), how)
+                self.assertEqual(_states_of(s, self.NAMES), _states_of(Status(word), self.NAMES), how)
+
+    def test_parsed_response_copies(self):
+        # the frames and messages hold views over the receive buffer
+        protocol = ISO_15765_4_11bit_500k(["7E8 06 41 00 BE 3F B8 13"])
+        messages = protocol(["7E8 06 41 01 81 07 65 04"])
+        for how, copier in COPIES:
+            r = copier(obd.commands.STATUS(messages))
+            self.assertEqual(r.value.DTC_count, 1, how)
+            self.assertEqual(r.messages[0].data, messages[0].data, how)
+            self.assertEqual(r.messages[0].frames[0].raw_bytes, messages[0].frames[0].raw_bytes, how)
+            self.assertEqual(_states_of(r.value, self.NAMES), _states_of(Status(SPARK), self.NAMES), how)
+
+    def test_protocol_lookups_raise_attribute_error(self):
+        s = Status(SPARK)
+        for name in ("__getstate__x", "__deepcopy__", "_Status__missing"):
+            self.assertFalse(hasattr(s, name), name)
+
+
+class MonitorValueTest(unittest.TestCase):
+
+    def check(self, monitor):
+        self.assertEqual(len(monitor), 2)
+        self.assertEqual(monitor[1].value.magnitude, 0x0BB0)
+        self.assertTrue(monitor[1].passed)
+        self.assertEqual(str(monitor[5].value), "16.0 millisecond")
+        self.assertIs(monitor.RTL_THRESHOLD_VOLTAGE, monitor[1])
+
+    def test_decoding(self):
+        self.check(Monitor(MID_01))
+
+    def test_null(self):
+        m = Monitor()
+        self.assertEqual(len(m), 0)
+        self.assertEqual(str(m), "No tests to report")
+        self.assertTrue(m.RTL_THRESHOLD_VOLTAGE.is_null())
+        self.assertIsInstance(m[0x42], MonitorTest)
+        self.assertTrue(m["NOT_A_TEST"].is_null())
+        with self.assertRaises(AttributeError):
+            m.NOT_A_TEST
+
+    def test_copies(self):
+        for how, copier in COPIES:
+            self.check(copier(Monitor(MID_01)))  # before the blocks are decoded
+            loaded = Monitor(MID_01)
+            len(loaded)
+            self.check(copier(loaded))
+            self.assertEqual(len(copier(Monitor())), 0, how)
+
+    def test_parsed_monitor_copies(self):
+        # the data of parsed messages are views over the receive buffer
+        protocol = ISO_15765_4_11bit_500k(["7E8 06 41 00 BE 3F B8 13"])
+        messages = protocol(["7E8 10 13 46 01 01 01 0B B0", "7E8 21 0B 00 0C 00 01 05 10",
+                             "7E8 22 00 10 00 00 00 20"])
+        for how, copier in COPIES:
+            monitor = obd.commands.MONITOR_O2_B1S1(messages).value
+            self.check(copier(monitor))
+
+    def test_protocol_lookups_raise_attribute_error(self):
+        m = Monitor(MID_01)
+        for name in ("__getstate__x", "__deepcopy__", "_Monitor__missing"):
+            self.assertFalse(hasattr(m, name), name)
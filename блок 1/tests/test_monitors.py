@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+import copy
+import pickle
+import unittest
+from unittest import mock
+
+import obd
+from obd import monitors
+
+from . import fake_adapter
+from .fake_adapter import AdapterTestCase
+
+
+# MIDs 01 and 02 supported
+MIDS = {"0600": ["7E8 06 46 00 C0 00 00 00"]}
+
+# MID 01 TID 01, MID 02 TID 01
+BATCH = ["7E8 10 13 46 01 01 01 0B B0", "7E8 21 0B 00 0C 00 02 01 01", "7E8 22 00 10 00 00 00 20"]
+MID_01 = ["7E8 10 0A 46 01 01 01 0B B0", "7E8 21 0B 00 0C 00 00 00 00"]
+MID_02 = ["7E8 10 0A 46 02 01 01 00 10", "7E8 21 00 00 00 20 00 00 00"]
+
+
+def block(mid, tid):
+    return bytes([mid, tid, 0x01, 0, tid, 0, 0, 0, 0xFF])
+
+
+class SplitResponseTest(unittest.TestCase):
+
+    def test_contiguous_blocks_are_views(self):
+        data = memoryview(b"\x46" + block(1, 1) + block(1, 2) + block(2, 1))
+        values = monitors.split_response(data, {1, 2})
+        self.assertEqual(bytes(values[1]), block(1, 1) + block(1, 2))
+        self.assertEqual(bytes(values[2]), block(2, 1))
+        self.assertIs(values[1].obj, data.obj)
+        self.assertIs(values[2].obj, data.obj)
+
+    def test_interleaved_blocks(self):
+        data = memoryview(b"\x46" + block(1, 1) + block(2, 1) + block(1, 2))
+        values = monitors.split_response(data, {1, 2})
+        self.assertEqual(bytes(values[1]), block(1, 1) + block(1, 2))
+        self.assertEqual(bytes(values[2]), block(2, 1))
+
+    def test_unrequested_mids_are_skipped(self):
+        data = b"\x46" + block(1, 1) + block(3, 1)
+        self.assertEqual(list(monitors.split_response(data, {1, 2})), [1])
+
+    def test_batches(self):
+        mids = [obd.commands[6][pid] for pid in range(1, 9)]
+        self.assertEqual([len(b) for b in monitors.batches(mids)], [6, 2])
+        self.assertEqual([len(b) for b in monitors.batches(mids, {mids[0].header: 3})], [3, 3, 2])
+
+
+class ReadMonitorsTest(AdapterTestCase):
+
+    def setUp(self):
+        super(ReadMonitorsTest, self).setUp()
+        answers = mock.patch.dict(fake_adapter.ANSWERS, MIDS)
+        answers.start()
+        self.addCleanup(answers.stop)
+
+    def requests(self):
+        return [c for c in self.adapter.log if c.startswith("06") and c != "0600"]
+
+    def test_batched_read(self):
+        connection = self.connect()
+        self.adapter.answers["060102"] = BATCH
+        responses = connection.read_monitors()
+        self.assertEqual(self.requests(), ["060102"])
+        self.assertEqual(sorted(m.pid for m in responses), [1, 2])
+        self.assertEqual(responses[obd.commands.MONITOR_O2_B1S1].value[1].value.magnitude, 0x0BB0)
+
+        # the results are reused until their TTL runs out
+        connection.read_monitors()
+        self.assertEqual(self.requests(), ["060102"])
+
+    def test_batched_results_can_be_copied(self):
+        connection = self.connect()
+        self.adapter.answers["060102"] = BATCH
+        responses = connection.read_monitors()
+        # copied before the blocks are decoded
+        copies = [(r.value, copy.deepcopy(r.value),
+                   pickle.loads(pickle.dumps(r.value)))
+                  for r in responses.values()]
+        for monitor, deep, pickled in copies:
+            self.assertEqual(str(deep[1].value), str(monitor[1].value))
+            self.assertEqual(str(pickled[1].value), str(monitor[1].value))
+
+    def test_missing_mid_falls_back_to_single_reads(self):
+        connection = self.connect()
+        self.adapter.answers["060102"] = MID_01
+        self.adapter.answers["0601"] = MID_01
+        self.adapter.answers["0602"] = MID_02
+        responses = connection.read_monitors()
+        self.assertEqual(self.requests(), ["060102", "0601", "0602"])
+        self.assertEqual(len(responses), 2)
+
+        # the ECU's limit is remembered
+        del self.adapter.log[:]
+        for m in responses:
+            connection.invalidate(m)
+        connection.read_monitors()
+        self.assertEqual(self.requests(), ["0601", "0602"])
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+import time
+
+import obd
+
+from .fake_adapter import AdapterTestCase, FakeAdapter
+
+
+COMMANDS = [obd.commands.RPM, obd.commands.COOLANT_TEMP, obd.commands.ENGINE_LOAD]
+
+
+class PipelineTest(AdapterTestCase):
+
+    def setUp(self):
+        super(PipelineTest, self).setUp()
+        FakeAdapter.stn = "STN1110 r4.2.0"
+
+    def test_stn_detection(self):
+        connection = self.connect()
+        self.assertEqual(connection.interface.stn_id(), "STN1110 r4.2.0")
+
+    def test_query_many(self):
+        connection = self.connect(fast=True)
+        expected = {c: str(connection.query(c).value) for c in COMMANDS}
+        del self.adapter.log[:]
+
+        responses = connection.query_many(COMMANDS)
+        self.assertEqual({c: str(r.value) for c, r in responses.items()}, expected)
+        # the response counts learned by the first queries are passed along
+        self.assertEqual(self.adapter.log, ["STPX d:010C, r:3", "STPX d:0105, r:1", "STPX d:0104, r:1"])
+
+    def test_query_many_uses_the_cache(self):
+        connection = self.connect()
+        connection.query(obd.commands.STATUS)
+        del self.adapter.log[:]
+        responses = connection.query_many(COMMANDS + [obd.commands.STATUS])
+        self.assertEqual(self.adapter.log, ["010C", "0105", "0104"])
+        self.assertEqual(responses[obd.commands.STATUS].value.DTC_count, 1)
+
+    def test_header_changes_between_groups(self):
+        connection = self.connect(can_filter=True)
+        del self.adapter.log[:]
+        responses = connection.query_many(COMMANDS + [obd.commands.GET_DTC])
+        self.assertEqual(self.adapter.log, ["AT SH 7E0", "AT CRA 7E8", "010C", "0105", "0104",
+                                            "AT SH 7DF", "AT CRA", "03"])
+        self.assertEqual(responses[obd.commands.RPM].value.magnitude, 1726.0)
+
+    def test_deadline_abandons_the_rest(self):
+        connection = self.connect()
+        self.adapter.delays["0105"] = 5.0
+        del self.adapter.log[:]
+
+        t = time.time()
+        responses = connection.query_many(COMMANDS, deadline=time.time() + 0.3)
+        self.assertLess(time.time() - t, 2.0)
+        self.assertEqual(responses[obd.commands.RPM].value.magnitude, 1726.0)
+        self.assertIsInstance(responses[obd.commands.COOLANT_TEMP], obd.TimeoutResponse)
+        self.assertIsInstance(responses[obd.commands.ENGINE_LOAD], obd.TimeoutResponse)
+        self.assertNotIn("0104", self.adapter.log)
+
+        # the adapter was resynchronized
+        self.assertEqual(connection.query(obd.commands.STATUS).value.DTC_count, 1)
+
+    def test_read_all_dtcs_is_pipelined(self):
+        connection = self.connect()
+        del self.adapter.log[:]
+        reports = connection.read_all_dtcs()
+        self.assertEqual(self.adapter.log, ["03", "07", "0A"])
+        self.assertEqual([code for code, _ in reports[0].stored], ["P0133"])
+
+
+class ELMFallbackTest(AdapterTestCase):
+
+    def test_query_many_on_an_elm327(self):
+        connection = self.connect()
+        self.assertIsNone(connection.interface.stn_id())
+        del self.adapter.log[:]
+        responses = connection.query_many(COMMANDS)
+        self.assertEqual(self.adapter.log, ["010C", "0105", "0104"])
+        self.assertEqual(responses[obd.commands.COOLANT_TEMP].value.magnitude, 83)
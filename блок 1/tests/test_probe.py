@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+import time
+from unittest import mock
+
+import obd
+from obd import utils
+
+from .fake_adapter import AdapterTestCase, FakeAdapter, _real_sleep
+
+
+class ProbeTest(AdapterTestCase):
+
+    def setUp(self):
+        super(ProbeTest, self).setUp()
+        utils.forget_port()
+        self.addCleanup(utils.forget_port)
+        patches = [
+            mock.patch.object(utils, "candidate_ports", lambda: ["fake"]),
+            mock.patch.object(utils, "try_port", lambda port: True),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_probe_finds_the_rate(self):
+        FakeAdapter.rate = 9600
+        self.assertEqual(utils.probe_serial(), {"fake": 9600})
+
+    def test_probe_is_cached(self):
+        utils.probe_serial()
+        opened = len(self.adapters)
+        self.assertEqual(utils.probe_serial(), {"fake": 38400})
+        self.assertEqual(len(self.adapters), opened)
+        utils.forget_port("fake")
+        utils.probe_serial()
+        self.assertEqual(len(self.adapters), opened + 1)
+
+    def test_connect_with_a_probed_port(self):
+        FakeAdapter.rate = 115200
+        connection = obd.OBD(fast=False)
+        self.addCleanup(connection.close)
+        self.assertEqual(connection.status(), obd.OBDStatus.CAR_CONNECTED)
+        self.assertEqual(connection.interface.baudrate(), 115200)
+
+    def test_uncommon_rate_falls_back_to_the_sweep(self):
+        FakeAdapter.rate = 14400  # not a PROBE_BAUDS rate
+        self.assertEqual(utils.probe_serial(), {})
+        connection = obd.OBD(fast=False)
+        self.addCleanup(connection.close)
+        self.assertEqual(connection.status(), obd.OBDStatus.CAR_CONNECTED)
+        self.assertEqual(connection.interface.baudrate(), 14400)
+
+    def test_no_adapter(self):
+        with mock.patch.object(utils, "try_port", lambda port: False):
+            FakeAdapter.rate = 1  # never answers
+            connection = obd.OBD(fast=False)
+        self.assertEqual(connection.status(), obd.OBDStatus.NOT_CONNECTED)
+
+    def test_wake_before_probing(self):
+        asleep = FakeAdapter("fake")
+        asleep.low_power = True
+        FakeAdapter.rate = 38400
+        FakeAdapter.wake_delay = 0.3
+        with mock.patch.object(time, "sleep", _real_sleep), \
+             mock.patch.object(utils, "PROBE_WAKE_DELAY", 0.4):
+            # the first characters wake it up, and are lost
+            self.assertEqual(utils.probe_serial(use_cache=False), {})
+            self.adapters[-1].low_power = True
+            self.assertEqual(utils.probe_serial(use_cache=False, wake=True), {"fake": 38400})
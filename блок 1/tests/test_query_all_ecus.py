@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+
+import obd
+from obd.protocols import ECU
+
+from .fake_adapter import AdapterTestCase
+
+
+class QueryAllECUsTest(AdapterTestCase):
+
+    def test_every_ecu_is_decoded(self):
+        connection = self.connect()
+        responses = connection.query_all_ecus(obd.commands.RPM)
+        self.assertEqual(sorted(responses), [0, 1, 2])
+        rpm = {tx_id: r.value.magnitude for tx_id, r in responses.items()}
+        self.assertEqual(rpm, {0: 1726.0, 1: 1724.0, 2: 4.0})
+
+    def test_query_keeps_the_engine_filter(self):
+        connection = self.connect()
+        self.assertEqual(connection.query(obd.commands.RPM).value.magnitude, 1726.0)
+
+    def test_ecu_map(self):
+        connection = self.connect()
+        ecu_map = connection.ecu_map()
+        self.assertEqual(ecu_map[0], ECU.ENGINE)
+        self.assertEqual(ecu_map[1], ECU.TRANSMISSION)
+        self.assertEqual(len(ecu_map), 3)
+
+    def test_no_answer(self):
+        connection = self.connect()
+        self.adapter.answers.pop("010C")
+        self.assertEqual(connection.query_all_ecus(obd.commands.RPM), {})
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+import unittest
+
+import obd
+from obd import shm
+from obd.OBDResponse import OBDResponse
+from obd.UnitsAndScaling import Unit
+
+COMMANDS = [obd.commands.RPM, obd.commands.VIN, obd.commands.STATUS, obd.commands.SPEED]
+
+
+def response(value, t=1.0):
+    r = OBDResponse()
+    r.value = value
+    r.time = t
+    return r
+
+
+class SharedTableTest(unittest.TestCase):
+
+    def setUp(self):
+        name = "obd_test_%d_%s" % (os.getpid(), self.id().rsplit(".", 1)[-1])
+        self.table = shm.SharedTable(name, COMMANDS)
+        self.addCleanup(self.table.close)
+        self.reader = shm.SharedTableReader(name)
+        self.addCleanup(self.reader.close)
+
+    def test_round_trip(self):
+        self.assertEqual(self.reader.names(), [c.name for c in COMMANDS])
+        self.assertEqual(self.reader.read("RPM"), (None, "", 0.0))
+
+        self.table.publish(obd.commands.RPM, response(Unit.Quantity(1726.0, Unit.rpm), 2.0))
+        self.table.publish(obd.commands.VIN, response("1D4GP00R55B123456"))
+        self.table.publish(obd.commands.SPEED, response(True))
+        self.assertEqual(self.reader.read("RPM"), (1726.0, "rpm", 2.0))
+        self.assertEqual(self.reader.read("VIN"), ("1D4GP00R55B123456", "", 1.0))
+        self.assertEqual(self.reader.read("SPEED"), (True, "", 1.0))
+
+        seq = self.reader.seq("RPM")
+        self.table.publish(obd.commands.RPM, response(None, 3.0))
+        self.assertEqual(self.reader.seq("RPM"), seq + 2)
+        self.assertEqual(self.reader.read("RPM"), (None, "", 3.0))
+
+    def test_unknown_commands_are_ignored(self):
+        self.table.publish(obd.commands.COOLANT_TEMP, response(90))
+        self.assertNotIn("COOLANT_TEMP", self.reader.names())
+
+    def test_slot_being_written(self):
+        self.table.publish(obd.commands.RPM, response(1.0))
+        # a writer stopped between its two sequence updates
+        writer = shm._shared_memory(self.table.name)
+        self.addCleanup(writer.close)
+        offset = shm._slot_offset(0)
+        shm.SEQ.pack_into(writer.buf, offset, self.reader.seq("RPM") + 1)
+        self.assertIsNone(self.reader.read_raw("RPM", retries=10))
+        self.assertEqual(self.reader.read("RPM"), (None, "", 0.0))
+
+    def test_concurrent_reads_are_consistent(self):
+        stop = threading.Event()
+
+        def publish():
+            i = 0
+            while not stop.is_set():
+                i += 1
+                # the time and the value are the same, in every snapshot
+                self.table.publish(obd.commands.RPM, response(float(i), float(i)))
+
+        writer = threading.Thread(target=publish)
+        writer.start()
+        try:
+            for _ in range(20000):
+                raw = self.reader.read_raw("RPM")
+                if raw is not None:
+                    seq, t, value = raw[:3]
+                    self.assertEqual(seq % 2, 0)
+                    self.assertEqual(t, value)
+        finally:
+            stop.set()
+            writer.join()
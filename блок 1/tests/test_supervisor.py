@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+import itertools
+import threading
+import time
+import unittest
+
+import obd
+from obd.supervisor import Supervisor, LinkState, backoff
+from obd.utils import OBDStatus
+
+from .fake_adapter import AdapterTestCase
+
+
+def wait_for(condition, timeout=3.0):
+    end = time.time() + timeout
+    while not condition() and time.time() < end:
+        threading.Event().wait(0.01)
+    return condition()
+
+
+class BackoffTest(unittest.TestCase):
+
+    def test_doubles_up_to_the_cap(self):
+        delays = list(itertools.islice(backoff(0.5, 4.0, jitter=0), 6))
+        self.assertEqual(delays, [0.5, 1.0, 2.0, 4.0, 4.0, 4.0])
+
+    def test_jitter_shortens(self):
+        for delay in itertools.islice(backoff(1.0, 1.0, jitter=0.5), 50):
+            self.assertTrue(0.5 <= delay <= 1.0)
+
+
+class PingTest(AdapterTestCase):
+
+    def test_ping_bypasses_the_cache(self):
+        connection = self.connect()
+        connection.set_ttl(obd.commands.ELM_VOLTAGE, 60)
+        connection.query(obd.commands.ELM_VOLTAGE)
+        del self.adapter.log[:]
+        connection.query(obd.commands.ELM_VOLTAGE)
+        self.assertEqual(self.adapter.log, [])  # cached
+
+        for _ in range(2):
+            self.assertEqual(connection.ping().value.magnitude, 12.6)
+        self.assertEqual(self.adapter.log, ["AT RV", "AT RV"])
+
+    def test_ping_timeout(self):
+        connection = self.connect()
+        self.adapter.delays["ATRV"] = 5.0
+        self.assertTrue(connection.ping(deadline=time.time() + 0.1).is_null())
+        self.assertEqual(connection.status(), OBDStatus.CAR_CONNECTED)
+
+
+class SupervisorTest(AdapterTestCase):
+
+    def supervisor(self, **kwargs):
+        kwargs.setdefault("fast", False)
+        kwargs.setdefault("check_voltage", False)
+        sup = Supervisor("fake", **kwargs)
+        self.addCleanup(sup.close)
+        self.states = []
+        sup.subscribe(self.states.append)
+        sup.start()
+        self.assertTrue(wait_for(lambda: sup.state == LinkState.CONNECTED))
+        return sup
+
+    def test_keep_alives_reach_the_adapter(self):
+        sup = self.supervisor(idle=0.05)
+        # the voltage is cached from now on, but not for the keep-alives
+        sup.call(obd.OBD.set_ttl, obd.commands.ELM_VOLTAGE, 60)
+        sup.query(obd.commands.ELM_VOLTAGE)
+        self.assertTrue(wait_for(lambda: sup.probes >= 2))
+        self.assertGreaterEqual(self.adapter.log.count("AT RV"), 2)
+        self.assertEqual(sup.state, LinkState.CONNECTED)
+
+    def test_traffic_delays_keep_alives(self):
+        sup = self.supervisor(idle=0.5)
+        end = time.time() + 0.8
+        while time.time() < end:
+            sup.query(obd.commands.RPM)
+            threading.Event().wait(0.05)
+        self.assertEqual(sup.probes, 0)
+
+    def test_unanswered_keep_alives_reconnect(self):
+        sup = self.supervisor(idle=0.05, probe_timeout=0.05, max_failures=2, base_delay=0.05)
+        first = self.adapter
+        first.delays["ATRV"] = 5.0
+        self.assertTrue(wait_for(lambda: LinkState.LOST in self.states))
+        del first.delays["ATRV"]
+        self.assertTrue(wait_for(lambda: sup.reconnects == 1 and sup.state == LinkState.CONNECTED))
+        self.assertEqual(self.states[:4], [LinkState.CONNECTING, LinkState.CONNECTED,
+                                           LinkState.LOST, LinkState.CONNECTING])
+        self.assertEqual(sup.query(obd.commands.RPM).value.magnitude, 1726.0)
+
+    def test_failed_connections_back_off(self):
+        attempts = []
+
+        class Unplugged(object):
+            def __init__(self, portstr, **kwargs):
+                attempts.append(time.time())
+
+            def status(self):
+                return OBDStatus.NOT_CONNECTED
+
+            def close(self):
+                pass
+
+        sup = Supervisor("fake", factory=Unplugged, base_delay=0.05, max_delay=0.2, jitter=0)
+        self.addCleanup(sup.close)
+        sup.start()
+        self.assertTrue(wait_for(lambda: len(attempts) >= 4))
+        sup.stop()
+        gaps = [b - a for a, b in zip(attempts, attempts[1:])]
+        self.assertGreaterEqual(gaps[1], 0.09)
+        self.assertGreaterEqual(gaps[2], 0.19)
+        self.assertEqual(sup.state, LinkState.CONNECTING)
+        self.assertTrue(sup.query(obd.commands.RPM).is_null())
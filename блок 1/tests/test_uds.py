@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+import obd
+from obd import uds
+
+from .fake_adapter import AdapterTestCase
+
+
+# VIN, ACTIVE_DIAGNOSTIC_SESSION and ECU_SERIAL_NUMBER, in a single answer
+BATCH_ANSWER = [
+    "7E8 10 1B 62 F1 90 31 44 34",
+    "7E8 21 47 50 30 30 52 35 35",
+    "7E8 22 42 31 32 33 34 35 36",
+    "7E8 23 F1 86 01 F1 8C 41 42",
+]
+
+
+class BatchesTest(unittest.TestCase):
+
+    def test_variable_length_dids_close_a_batch(self):
+        dids = [obd.dids.ECU_SERIAL_NUMBER, obd.dids.VIN, obd.dids.ACTIVE_DIAGNOSTIC_SESSION]
+        batches = list(uds.batches(dids))
+        self.assertEqual(batches, [[obd.dids.VIN, obd.dids.ACTIVE_DIAGNOSTIC_SESSION, obd.dids.ECU_SERIAL_NUMBER]])
+
+    def test_batches_are_split_by_size_and_length(self):
+        fixed = [obd.dids.VIN, obd.dids.ACTIVE_DIAGNOSTIC_SESSION, obd.dids.ECU_MANUFACTURING_DATE]
+        variable = [obd.dids.ECU_SERIAL_NUMBER, obd.dids.SYSTEM_NAME]
+        batches = list(uds.batches(variable + fixed))
+        self.assertEqual(batches, [fixed, [variable[0]], [variable[1]]])
+
+    def test_limits_are_per_header(self):
+        dids = [obd.dids.VIN, obd.dids.ACTIVE_DIAGNOSTIC_SESSION]
+        other = obd.dids.VIN.clone(header=b"7E1")
+        batches = list(uds.batches(dids + [other], {b"7E0": 1}))
+        self.assertEqual(batches, [[dids[0]], [dids[1]], [other]])
+
+    def test_split_response(self):
+        dids = [obd.dids.ACTIVE_DIAGNOSTIC_SESSION, obd.dids.ECU_SERIAL_NUMBER]
+        data = bytearray.fromhex("62 F186 03 F18C 41 42 43")
+        values = uds.split_response(data, dids)
+        self.assertEqual(values[dids[0]], b"\x03")
+        self.assertEqual(values[dids[1]], b"ABC")
+        self.assertIsNone(uds.split_response(bytearray.fromhex("7F 22 13"), dids))
+        self.assertEqual(uds.negative_response_code(bytearray.fromhex("7F 22 13")), 0x13)
+
+
+class ReadDIDsTest(AdapterTestCase):
+
+    DIDS = [obd.dids.VIN, obd.dids.ECU_SERIAL_NUMBER, obd.dids.ACTIVE_DIAGNOSTIC_SESSION]
+
+    def test_batched_read(self):
+        connection = self.connect()
+        self.adapter.answers["22F190F186F18C"] = BATCH_ANSWER
+        responses = connection.read_dids(self.DIDS)
+        self.assertEqual(responses[obd.dids.VIN].value, "1D4GP00R55B123456")
+        self.assertEqual(responses[obd.dids.ACTIVE_DIAGNOSTIC_SESSION].value, 1)
+        self.assertEqual(responses[obd.dids.ECU_SERIAL_NUMBER].value, "AB")
+        self.assertEqual([c for c in self.adapter.log if c.startswith("22")], ["22F190F186F18C"])
+
+    def test_rejected_batch_falls_back_to_single_reads(self):
+        connection = self.connect()
+        self.adapter.answers["22F190F186F18C"] = ["7E8 03 7F 22 13"]
+        self.adapter.answers["22F190"] = ["7E8 10 14 62 F1 90 31 44 34", "7E8 21 47 50 30 30 52 35 35",
+                                          "7E8 22 42 31 32 33 34 35 36"]
+        self.adapter.answers["22F186"] = ["7E8 04 62 F1 86 03"]
+        self.adapter.answers["22F18C"] = ["7E8 07 62 F1 8C 41 42 43 44"]
+
+        responses = connection.read_dids(self.DIDS)
+        self.assertEqual(responses[obd.dids.VIN].value, "1D4GP00R55B123456")
+        self.assertEqual(responses[obd.dids.ACTIVE_DIAGNOSTIC_SESSION].value, 3)
+        self.assertEqual(responses[obd.dids.ECU_SERIAL_NUMBER].value, "ABCD")
+
+        # the ECU's limit is remembered, no batch is tried again
+        del self.adapter.log[:]
+        connection.read_dids(self.DIDS)
+        self.assertEqual([c for c in self.adapter.log if c.startswith("22")], ["22F190", "22F186", "22F18C"])
+
+    def test_tester_present(self):
+        connection = self.connect()
+        self.adapter.answers["3E00"] = ["7E8 02 7E 00"]
+        self.assertTrue(connection.tester_present())
+        self.adapter.answers["3E00"] = ["7E8 03 7F 3E 11"]
+        self.assertFalse(connection.tester_present())
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+import obd
+
+from .fake_adapter import AdapterTestCase
+
+
+class WarmStartTest(AdapterTestCase):
+
+    def test_warm_start_skips_the_reset(self):
+        self.connect().close()
+        self.connect()
+        self.assertNotIn("ATZ", self.adapter.log)
+        self.assertNotIn("ATSP0", self.adapter.log)
+
+    def test_warm_start_restores_the_defaults(self):
+        first = self.connect()
+        self.adapter.header, self.adapter.filter = "7E0", (0x7E8, 0x7FF)
+        self.adapter.timeout_setting = 0x01
+        first.interface.close()  # the settings survive the session
+
+        second = self.connect()
+        self.assertIn("ATD", self.adapter.log)
+        self.assertEqual((self.adapter.header, self.adapter.filter), (None, None))
+        self.assertEqual(sorted(second.query_all_ecus(obd.commands.RPM)), [0, 1, 2])
+
+    def test_session_addressing_one_ecu(self):
+        first = self.connect()
+        self.adapter.answers["3E00"] = ["7E9 02 7E 00"]
+        self.assertTrue(first.tester_present(b"7E1"))
+        first.close()
+
+        second = self.connect()
+        self.assertEqual(sorted(second.query_all_ecus(obd.commands.RPM)), [0, 1, 2])
+        self.assertEqual(len(second.ecu_map()), 3)
+
+    def test_no_warm_start(self):
+        self.connect()
+        obd.elm327.ELM327("fake", 38400, None, 0.1, warm_start=False).close()
+        self.assertIn("ATZ", self.adapter.log)